@@ -0,0 +1,159 @@
+"""
+임베딩 빌드 저널 - 완료된 배치의 (청크 ID, 벡터)를 추가 전용(append-only) 파일에 기록
+
+빌드가 중단(크래시, 할당량 소진)되어도 이미 계산한 임베딩은 저널에 남아 있으므로,
+재시작한 빌드는 저널에 없는 청크만 임베딩하고 최종 인덱스는 저널로부터 조립한다.
+
+파일 형식 (JSON Lines, 한 줄에 청크 하나):
+    {"id": "<sha1>", "dim": 3072, "v": "<float32 little-endian base64>"}
+"""
+import base64
+import hashlib
+import json
+import logging
+import os
+import sys
+import threading
+from array import array
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+def chunk_id(doc):
+    """
+    청크 내용과 메타데이터로부터 결정적인 ID 생성 (재시작해도 동일)
+    """
+    payload = json.dumps(
+        {"text": doc.page_content, "metadata": doc.metadata},
+        ensure_ascii=False, sort_keys=True, default=str
+    )
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def _encode_vector(vector):
+    values = array("f", (float(v) for v in vector))
+    if sys.byteorder != "little":
+        values.byteswap()
+    return base64.b64encode(values.tobytes()).decode("ascii")
+
+
+def _decode_vector(encoded):
+    values = array("f")
+    values.frombytes(base64.b64decode(encoded))
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values.tolist()
+
+
+class EmbeddingJournal:
+    """
+    추가 전용 임베딩 저널
+    """
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._vectors = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        """
+        저널 파일 로드 - 중단으로 잘린 마지막 줄은 버리고 파일을 정상 위치까지 자름
+        """
+        if self._vectors is not None:
+            return self._vectors
+
+        self._vectors = {}
+        if not self.path.exists():
+            return self._vectors
+
+        valid_offset = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                try:
+                    record = json.loads(line.decode("utf-8"))
+                    vector = _decode_vector(record["v"])
+                    if len(vector) != record["dim"] or not line.endswith(b"\n"):
+                        raise ValueError("불완전한 레코드")
+                except Exception:
+                    logger.warning(f"저널의 손상된 레코드 이후를 버립니다 (오프셋 {valid_offset})")
+                    break
+                self._vectors[record["id"]] = vector
+                valid_offset += len(line)
+
+        if valid_offset != self.path.stat().st_size:
+            with open(self.path, "r+b") as f:
+                f.truncate(valid_offset)
+
+        logger.info(f"저널 로드 완료: {len(self._vectors)}개 임베딩 ({self.path})")
+        return self._vectors
+
+    def __len__(self):
+        return len(self._load())
+
+    def __contains__(self, item_id):
+        return item_id in self._load()
+
+    def pending(self, chunks):
+        """
+        아직 저널에 없는 청크만 반환 (같은 ID는 한 번만)
+        """
+        vectors = self._load()
+        seen = set()
+        pending = []
+        for doc in chunks:
+            doc_id = chunk_id(doc)
+            if doc_id in vectors or doc_id in seen:
+                continue
+            seen.add(doc_id)
+            pending.append(doc)
+        return pending
+
+    def append(self, chunk_ids, embeddings):
+        """
+        완료된 배치를 저널에 기록하고 디스크에 동기화
+        """
+        if len(chunk_ids) != len(embeddings):
+            raise ValueError(f"청크 ID 수({len(chunk_ids)})와 임베딩 수({len(embeddings)})가 다릅니다.")
+
+        lines = []
+        for item_id, vector in zip(chunk_ids, embeddings):
+            record = {"id": item_id, "dim": len(vector), "v": _encode_vector(vector)}
+            lines.append(json.dumps(record) + "\n")
+
+        with self._lock:
+            vectors = self._load()
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("".join(lines))
+                f.flush()
+                os.fsync(f.fileno())
+            for item_id, vector in zip(chunk_ids, embeddings):
+                vectors[item_id] = list(vector)
+
+    def append_documents(self, docs, embeddings):
+        """청크(Document) 배치와 임베딩을 기록"""
+        self.append([chunk_id(doc) for doc in docs], embeddings)
+
+    def assemble(self, chunks):
+        """
+        저널로부터 청크 순서대로 (text, vector) 쌍과 메타데이터 조립
+
+        Returns:
+            (text_embeddings, metadatas) - FAISS.from_embeddings 입력 형식
+        """
+        vectors = self._load()
+        text_embeddings = []
+        metadatas = []
+        missing = 0
+        for doc in chunks:
+            vector = vectors.get(chunk_id(doc))
+            if vector is None:
+                missing += 1
+                continue
+            text_embeddings.append((doc.page_content, vector))
+            metadatas.append(doc.metadata)
+
+        if missing:
+            raise RuntimeError(f"저널에 없는 청크가 {missing}개 있습니다. 빌드를 다시 실행하여 이어서 진행하세요.")
+
+        return text_embeddings, metadatas
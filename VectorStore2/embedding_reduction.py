@@ -0,0 +1,264 @@
+"""
+고차원 Gemini 임베딩(3072차원)의 차원 축소
+
+- PCAReducer: 코퍼스 벡터로 학습한 PCA 투영
+- PrefixTruncationReducer: 앞쪽 d개 차원만 남기고 다시 정규화 (Matryoshka 방식)
+
+축소기는 벡터 스토어 디렉토리에 reducer.npz로 함께 저장되며, 로드 시 쿼리 임베딩에도
+같은 변환이 적용된다. recall_vs_dimension_report로 차원별 재현율/검색 속도를 비교할 수 있다.
+
+사용 예 (기존 스토어에 대한 리포트):
+    python embedding_reduction.py ../GeminiVectorStore/medical_vector_store --dims 256 384 512 768
+"""
+import argparse
+import json
+import logging
+import time
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+REDUCER_FILENAME = "reducer.npz"
+
+
+def _normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class PrefixTruncationReducer:
+    """
+    앞쪽 dim개 차원만 사용하고 L2 정규화
+    """
+    kind = "prefix"
+
+    def __init__(self, dim):
+        self.dim = int(dim)
+
+    def fit(self, vectors):
+        vectors = np.asarray(vectors)
+        if vectors.shape[1] < self.dim:
+            raise ValueError(f"입력 차원({vectors.shape[1]})이 목표 차원({self.dim})보다 작습니다.")
+        return self
+
+    def transform(self, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        return _normalize(vectors[:, :self.dim]).astype(np.float32)
+
+    def _state(self):
+        return {}
+
+
+class PCAReducer:
+    """
+    코퍼스로 학습한 PCA 투영 (투영 후 L2 정규화)
+
+    검색은 내적(코사인) 순위만 보존하면 되므로 평균을 빼지 않은 2차 모멘트 행렬의
+    주성분을 사용한다 (평균 중심화 PCA보다 같은 차원에서 재현율이 높음).
+    """
+    kind = "pca"
+
+    def __init__(self, dim, components=None, explained_variance_ratio=None):
+        self.dim = int(dim)
+        self.components = components
+        self.explained_variance_ratio = explained_variance_ratio
+
+    def fit(self, vectors):
+        vectors = np.asarray(vectors, dtype=np.float64)
+        n, d = vectors.shape
+        if self.dim > min(n, d):
+            raise ValueError(f"PCA 목표 차원({self.dim})은 벡터 수와 입력 차원({n}, {d})보다 클 수 없습니다.")
+
+        # 2차 모멘트 행렬(d x d) 고유분해 - 벡터 수가 많아도 메모리는 입력 차원에만 비례
+        second_moment = vectors.T @ vectors / n
+        eigenvalues, eigenvectors = np.linalg.eigh(second_moment)
+        order = np.argsort(eigenvalues)[::-1][:self.dim]
+
+        self.components = eigenvectors[:, order].T.astype(np.float32)
+        total = eigenvalues.clip(min=0).sum()
+        self.explained_variance_ratio = float(eigenvalues[order].clip(min=0).sum() / total) if total > 0 else 0.0
+
+        logger.info(f"PCA 학습 완료: {d} -> {self.dim}차원, 설명 분산 비율 {self.explained_variance_ratio:.3f}")
+        return self
+
+    def transform(self, vectors):
+        if self.components is None:
+            raise RuntimeError("PCA가 학습되지 않았습니다. fit()을 먼저 호출하세요.")
+        vectors = np.asarray(vectors, dtype=np.float32)
+        return _normalize(vectors @ self.components.T).astype(np.float32)
+
+    def _state(self):
+        return {
+            "components": self.components,
+            "explained_variance_ratio": np.float64(self.explained_variance_ratio),
+        }
+
+
+REDUCERS = {
+    PCAReducer.kind: PCAReducer,
+    PrefixTruncationReducer.kind: PrefixTruncationReducer,
+}
+
+
+def create_reducer(method, dim):
+    """method('pca' 또는 'prefix')에 맞는 축소기 생성"""
+    if method not in REDUCERS:
+        raise ValueError(f"지원하지 않는 차원 축소 방식입니다: {method} (가능: {list(REDUCERS)})")
+    return REDUCERS[method](dim)
+
+
+def save_reducer(reducer, store_path):
+    """축소기를 벡터 스토어 디렉토리에 저장"""
+    path = Path(store_path) / REDUCER_FILENAME
+    np.savez(path, kind=np.array(reducer.kind), dim=np.int64(reducer.dim), **reducer._state())
+    logger.info(f"차원 축소기 저장 완료: {path}")
+    return path
+
+
+def load_reducer(store_path):
+    """
+    벡터 스토어 디렉토리에 저장된 축소기 로드 (없으면 None)
+    """
+    path = Path(store_path) / REDUCER_FILENAME
+    if not path.exists():
+        return None
+
+    with np.load(path) as data:
+        kind = str(data["kind"])
+        dim = int(data["dim"])
+        if kind == PCAReducer.kind:
+            reducer = PCAReducer(
+                dim,
+                components=data["components"],
+                explained_variance_ratio=float(data["explained_variance_ratio"])
+            )
+        else:
+            reducer = REDUCERS[kind](dim)
+
+    logger.info(f"차원 축소기 로드 완료: {kind}, {dim}차원")
+    return reducer
+
+
+class ReducedEmbeddings:
+    """
+    임베딩 객체를 감싸 결과에 차원 축소를 적용 (LangChain 호환)
+    """
+    def __init__(self, base_embeddings, reducer):
+        self.base_embeddings = base_embeddings
+        self.reducer = reducer
+
+    def embed_documents(self, texts):
+        vectors = self.base_embeddings.embed_documents(texts)
+        return self.reducer.transform(vectors).tolist()
+
+    def embed_query(self, text):
+        vector = self.base_embeddings.embed_query(text)
+        return self.reducer.transform([vector])[0].tolist()
+
+    def __call__(self, text):
+        return self.embed_query(text)
+
+
+def _exact_top_k(corpus, queries, k):
+    scores = queries @ corpus.T
+    top = np.argpartition(-scores, kth=min(k, scores.shape[1] - 1), axis=1)[:, :k]
+    return np.take_along_axis(top, np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1), axis=1)
+
+
+def recall_vs_dimension_report(vectors, dims=(256, 384, 512, 768), method="pca", k=10,
+                               num_queries=200, seed=0, output_path=None):
+    """
+    차원별 재현율@k와 검색 시간 비교 리포트
+
+    코퍼스에서 뽑은 쿼리 벡터로 전체 차원의 정확한 top-k를 정답으로 두고,
+    축소된 벡터의 top-k가 이를 얼마나 재현하는지 측정한다.
+    """
+    vectors = _normalize(np.asarray(vectors, dtype=np.float32))
+    n, full_dim = vectors.shape
+    k = min(k, n - 1)
+
+    rng = np.random.default_rng(seed)
+    query_idx = rng.choice(n, size=min(num_queries, n), replace=False)
+
+    def timed_search(corpus, queries):
+        start = time.perf_counter()
+        result = _exact_top_k(corpus, queries, k + 1)
+        return result, (time.perf_counter() - start) / len(queries) * 1000
+
+    truth, full_ms = timed_search(vectors, vectors[query_idx])
+    # 자기 자신은 정답에서 제외
+    truth_sets = [set(row[row != q][:k]) for row, q in zip(truth, query_idx)]
+
+    report = {
+        "method": method,
+        "num_vectors": n,
+        "full_dim": full_dim,
+        "k": k,
+        "num_queries": len(query_idx),
+        "full_dim_ms_per_query": round(full_ms, 4),
+        "results": [],
+    }
+
+    for dim in sorted(set(dims)):
+        if dim >= full_dim:
+            continue
+        if method == PCAReducer.kind and dim > n:
+            logger.warning(f"벡터 수({n})가 {dim}차원 PCA 학습에 부족하여 건너뜁니다.")
+            continue
+        reducer = create_reducer(method, dim).fit(vectors)
+        reduced = reducer.transform(vectors)
+        found, ms = timed_search(reduced, reduced[query_idx])
+
+        recall = np.mean([
+            len(truth_set & set(row[row != q][:k])) / k
+            for truth_set, row, q in zip(truth_sets, found, query_idx)
+        ])
+
+        entry = {
+            "dim": dim,
+            f"recall@{k}": round(float(recall), 4),
+            "ms_per_query": round(ms, 4),
+            "speedup": round(full_ms / ms, 2) if ms > 0 else None,
+            "memory_ratio": round(dim / full_dim, 4),
+        }
+        if method == PCAReducer.kind:
+            entry["explained_variance_ratio"] = round(reducer.explained_variance_ratio, 4)
+        report["results"].append(entry)
+        logger.info(f"{dim}차원: 재현율@{k}={entry[f'recall@{k}']}, 속도 향상 x{entry['speedup']}")
+
+    if output_path:
+        with open(output_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        logger.info(f"리포트 저장 완료: {output_path}")
+
+    return report
+
+
+def load_store_vectors(store_path):
+    """저장된 FAISS 인덱스(index.faiss)에서 전체 벡터 복원"""
+    import faiss
+
+    index = faiss.read_index(str(Path(store_path) / "index.faiss"))
+    return index.reconstruct_n(0, index.ntotal)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="차원별 재현율 리포트 생성")
+    parser.add_argument("store_path", help="index.faiss가 있는 벡터 스토어 디렉토리")
+    parser.add_argument("--dims", type=int, nargs="+", default=[256, 384, 512, 768])
+    parser.add_argument("--method", choices=list(REDUCERS), default="pca")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    result = recall_vs_dimension_report(
+        load_store_vectors(args.store_path), dims=args.dims, method=args.method,
+        k=args.k, num_queries=args.queries,
+        output_path=args.output or str(Path(args.store_path) / f"reduction_report_{args.method}.json")
+    )
+    print(json.dumps(result, ensure_ascii=False, indent=2))
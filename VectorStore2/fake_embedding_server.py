@@ -0,0 +1,157 @@
+"""
+로컬 가짜 임베딩 서버 - API 키별 분당/일일 제한을 흉내내어
+AsyncEmbeddingScheduler를 실제 API 호출 없이 시험할 수 있게 한다.
+
+사용 예:
+    python fake_embedding_server.py --port 8765 --rpm 4 --latency 0.5
+"""
+import argparse
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+
+def fake_embedding(text, dim):
+    """텍스트 해시로부터 결정적인 단위 벡터 생성"""
+    values = []
+    counter = 0
+    while len(values) < dim:
+        digest = hashlib.sha256(f"{counter}:{text}".encode("utf-8")).digest()
+        values.extend((b - 127.5) / 127.5 for b in digest)
+        counter += 1
+    values = values[:dim]
+    norm = sum(v * v for v in values) ** 0.5 or 1.0
+    return [v / norm for v in values]
+
+
+class FakeEmbeddingServer:
+    """
+    스레드에서 동작하는 가짜 임베딩 서버
+    """
+    def __init__(self, host="127.0.0.1", port=0, dim=64, requests_per_minute=4,
+                 requests_per_day=None, latency=0.0):
+        self.dim = dim
+        self.requests_per_minute = requests_per_minute
+        self.requests_per_day = requests_per_day
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.request_log = defaultdict(deque)
+        self.day_counts = defaultdict(int)
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.rejected = 0
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+            def _send(self, status, payload=None, headers=None):
+                body = json.dumps(payload or {}).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                if self.path != "/embed":
+                    self._send(404, {"error": "not found"})
+                    return
+
+                api_key = self.headers.get("X-Api-Key", "")
+                length = int(self.headers.get("Content-Length", 0))
+                texts = json.loads(self.rfile.read(length).decode("utf-8")).get("texts", [])
+
+                status, retry_after = server._admit(api_key)
+                if status == 429:
+                    self._send(429, {"error": "rate limited"}, {"Retry-After": f"{retry_after:.2f}"})
+                    return
+                if status == 403:
+                    self._send(403, {"error": "quota exhausted"})
+                    return
+
+                try:
+                    if server.latency:
+                        time.sleep(server.latency)
+                    embeddings = [fake_embedding(text, server.dim) for text in texts]
+                finally:
+                    with server.lock:
+                        server.in_flight -= 1
+                self._send(200, {"embeddings": embeddings})
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.thread = None
+
+    def _admit(self, api_key):
+        """요청 허용 여부 판단 - (status, retry_after)"""
+        now = time.monotonic()
+        with self.lock:
+            if self.requests_per_day is not None and self.day_counts[api_key] >= self.requests_per_day:
+                self.rejected += 1
+                return 403, None
+
+            log = self.request_log[api_key]
+            while log and now - log[0] >= 60:
+                log.popleft()
+            if len(log) >= self.requests_per_minute:
+                self.rejected += 1
+                return 429, 60 - (now - log[0])
+
+            log.append(now)
+            self.day_counts[api_key] += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            return 200, None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        logger.info(f"가짜 임베딩 서버 시작: {self.url}")
+        return self.url
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self.thread:
+            self.thread.join()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="가짜 임베딩 서버")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--dim", type=int, default=64)
+    parser.add_argument("--rpm", type=int, default=4)
+    parser.add_argument("--rpd", type=int, default=None)
+    parser.add_argument("--latency", type=float, default=0.0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    server = FakeEmbeddingServer(port=args.port, dim=args.dim, requests_per_minute=args.rpm,
+                                 requests_per_day=args.rpd, latency=args.latency)
+    server.start()
+    try:
+        server.thread.join()
+    except KeyboardInterrupt:
+        server.stop()
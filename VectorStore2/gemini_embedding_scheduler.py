@@ -0,0 +1,352 @@
+"""
+Gemini 임베딩 API용 비동기 스케줄러
+
+여러 API 키마다 토큰 버킷(분당/일일 할당량)을 두고, 배치를 키에 분산해
+동시에 임베딩한다. 속도 제한 응답(429)의 Retry-After 값을 존중하고,
+일일 할당량이 소진된 키는 자동으로 제외한다.
+"""
+import asyncio
+import concurrent.futures
+import json
+import logging
+import random
+import re
+import time
+import urllib.error
+import urllib.request
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "models/gemini-embedding-exp-03-07"
+
+
+class RateLimitError(Exception):
+    """
+    속도 제한 응답 - retry_after 초 후 같은 키로 다시 시도할 수 있음
+    """
+    def __init__(self, message="", retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class QuotaExhaustedError(Exception):
+    """
+    할당량 소진 - 해당 키(또는 모든 키)로 더 이상 요청할 수 없음
+    """
+
+
+class TokenBucket:
+    """
+    토큰 버킷 - capacity 만큼 누적되고 초당 refill_rate 만큼 채워짐
+    """
+    def __init__(self, capacity, refill_rate, clock=time.monotonic):
+        self.capacity = float(capacity)
+        self.refill_rate = float(refill_rate)
+        self.clock = clock
+        self.tokens = float(capacity)
+        self.updated_at = clock()
+
+    def _refill(self, now):
+        elapsed = max(now - self.updated_at, 0.0)
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.refill_rate)
+        self.updated_at = now
+
+    def wait_time(self, now=None):
+        """토큰 하나를 얻기까지 남은 시간(초)"""
+        now = self.clock() if now is None else now
+        self._refill(now)
+        if self.tokens >= 1.0:
+            return 0.0
+        return (1.0 - self.tokens) / self.refill_rate
+
+    def consume(self, now=None):
+        now = self.clock() if now is None else now
+        self._refill(now)
+        self.tokens -= 1.0
+
+
+class ApiKeyLimiter:
+    """
+    API 키 하나의 속도 제한 상태 (분당 버킷, 일일 카운터, 동시 요청 수, Retry-After)
+    """
+    def __init__(self, api_key, requests_per_minute, requests_per_day=None,
+                 max_in_flight=2, clock=time.monotonic):
+        self.api_key = api_key
+        self.clock = clock
+        self.minute_bucket = TokenBucket(requests_per_minute, requests_per_minute / 60.0, clock)
+        self.requests_per_day = requests_per_day
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self.day_count = 0
+        self.day_reset_at = clock() + 86400
+        self.blocked_until = 0.0
+        self.exhausted = False
+        self.total_requests = 0
+
+    @property
+    def label(self):
+        return f"{self.api_key[:8]}..."
+
+    def wait_time(self, now):
+        """
+        요청 가능까지 남은 시간(초). 사용할 수 없는 키면 None, 동시 요청이 가득 찼으면 inf
+        """
+        if self.exhausted:
+            return None
+
+        if now >= self.day_reset_at:
+            self.day_count = 0
+            self.day_reset_at = now + 86400
+
+        waits = [self.minute_bucket.wait_time(now), self.blocked_until - now]
+        if self.requests_per_day is not None and self.day_count >= self.requests_per_day:
+            waits.append(self.day_reset_at - now)
+        wait = max(max(waits), 0.0)
+
+        if wait == 0.0 and self.in_flight >= self.max_in_flight:
+            return float("inf")
+        return wait
+
+    def acquire(self, now):
+        self.minute_bucket.consume(now)
+        self.day_count += 1
+        self.total_requests += 1
+        self.in_flight += 1
+
+    def release(self):
+        self.in_flight -= 1
+
+
+class AsyncEmbeddingScheduler:
+    """
+    여러 API 키에 배치를 분산하는 비동기 임베딩 스케줄러
+
+    embed_fn은 `async def embed_fn(api_key, texts) -> list[list[float]]` 형태이며,
+    속도 제한 시 RateLimitError, 할당량 소진 시 QuotaExhaustedError를 던져야 한다.
+    """
+    def __init__(self, api_keys, embed_fn, requests_per_minute=4, requests_per_day=100,
+                 max_in_flight_per_key=2, max_retries=5, retry_delay=10, max_wait=600,
+                 clock=time.monotonic):
+        if not api_keys:
+            raise ValueError("적어도 하나 이상의 API 키가 필요합니다.")
+
+        if isinstance(api_keys, str):
+            api_keys = [api_keys]
+
+        self.embed_fn = embed_fn
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.max_wait = max_wait
+        self.clock = clock
+        self.limiters = [
+            ApiKeyLimiter(key, requests_per_minute, requests_per_day, max_in_flight_per_key, clock)
+            for key in api_keys
+        ]
+        self._cond = None
+
+    @property
+    def concurrency(self):
+        return sum(limiter.max_in_flight for limiter in self.limiters)
+
+    async def _acquire(self):
+        """
+        가장 빨리 요청할 수 있는 키를 골라 토큰을 획득
+        """
+        async with self._cond:
+            while True:
+                now = self.clock()
+                best, best_wait = None, None
+                for limiter in self.limiters:
+                    wait = limiter.wait_time(now)
+                    if wait is None:
+                        continue
+                    if best_wait is None or wait < best_wait:
+                        best, best_wait = limiter, wait
+
+                if best is None:
+                    raise QuotaExhaustedError("모든 API 키의 할당량이 소진되었습니다. 추가 API 키를 제공하세요.")
+
+                if best_wait == 0.0:
+                    best.acquire(now)
+                    return best
+
+                if best_wait == float("inf"):
+                    await self._cond.wait()
+                    continue
+
+                if best_wait > self.max_wait:
+                    raise QuotaExhaustedError(
+                        f"모든 API 키가 {best_wait:.0f}초 이상 대기해야 합니다. 추가 API 키를 제공하세요."
+                    )
+
+                try:
+                    await asyncio.wait_for(self._cond.wait(), timeout=best_wait)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def _release(self, limiter):
+        async with self._cond:
+            limiter.release()
+            self._cond.notify_all()
+
+    async def _embed_batch(self, texts):
+        """
+        배치 하나를 임베딩 (속도 제한/할당량 오류는 다른 키로 재시도)
+        """
+        retries = 0
+        while True:
+            limiter = await self._acquire()
+            try:
+                logger.info(f"임베딩 API 호출 (키: {limiter.label}, 배치 크기: {len(texts)}, "
+                            f"진행 중: {limiter.in_flight}/{limiter.max_in_flight})")
+                return await self.embed_fn(limiter.api_key, texts)
+            except RateLimitError as e:
+                retry_after = e.retry_after if e.retry_after is not None else self.retry_delay
+                limiter.blocked_until = max(limiter.blocked_until, self.clock() + retry_after)
+                logger.warning(f"API 키 [{limiter.label}] 속도 제한: {retry_after:.1f}초 후 재시도")
+            except QuotaExhaustedError as e:
+                limiter.exhausted = True
+                logger.warning(f"API 키 [{limiter.label}] 할당량 소진: {e}")
+            except Exception as e:
+                retries += 1
+                if retries >= self.max_retries:
+                    logger.error(f"최대 재시도 횟수 초과. 실패: {e}")
+                    raise
+                wait_time = self.retry_delay * (2 ** (retries - 1)) + random.uniform(0, 1)
+                logger.warning(f"임베딩 생성 중 오류 발생 (시도 {retries}/{self.max_retries}): {e}. "
+                               f"{wait_time:.1f}초 후 재시도합니다...")
+                limiter.blocked_until = max(limiter.blocked_until, self.clock() + wait_time)
+            finally:
+                await self._release(limiter)
+
+    async def embed_batches(self, batches, on_batch_done=None):
+        """
+        여러 배치를 동시에 임베딩하고 입력 순서대로 결과 반환
+
+        Args:
+            batches: 텍스트 리스트의 리스트
+            on_batch_done: 배치가 끝날 때마다 (batch_index, embeddings)로 호출되는 콜백
+        """
+        self._cond = asyncio.Condition()
+        results = [None] * len(batches)
+        queue = asyncio.Queue()
+        for idx, texts in enumerate(batches):
+            queue.put_nowait((idx, texts))
+
+        async def worker():
+            while True:
+                try:
+                    idx, texts = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                embeddings = await self._embed_batch(texts)
+                results[idx] = embeddings
+                if on_batch_done is not None:
+                    on_batch_done(idx, embeddings)
+
+        workers = [asyncio.create_task(worker()) for _ in range(min(self.concurrency, len(batches)))]
+        try:
+            await asyncio.gather(*workers)
+        except BaseException:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            raise
+
+        return results
+
+    def stats(self):
+        """키별 사용량 요약"""
+        return {
+            limiter.label: {
+                "requests": limiter.total_requests,
+                "today": limiter.day_count,
+                "exhausted": limiter.exhausted,
+            }
+            for limiter in self.limiters
+        }
+
+
+def run_sync(coro):
+    """
+    코루틴을 동기적으로 실행 (Jupyter처럼 이벤트 루프가 이미 돌고 있으면 별도 스레드에서 실행)
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coro).result()
+
+
+def _parse_retry_delay(message):
+    """오류 메시지의 retryDelay('30s') 값을 초 단위로 추출"""
+    match = re.search(r"retry[_ ]?delay['\"]?\s*[:=]\s*['\"]?(\d+(?:\.\d+)?)s", message, re.IGNORECASE)
+    return float(match.group(1)) if match else None
+
+
+def make_gemini_embed_fn(model=DEFAULT_MODEL, task_type="retrieval_document"):
+    """
+    google-genai 비동기 클라이언트를 사용하는 embed_fn 생성 (키마다 클라이언트 재사용)
+    """
+    from google import genai
+
+    clients = {}
+
+    async def embed_fn(api_key, texts):
+        client = clients.get(api_key)
+        if client is None:
+            client = clients[api_key] = genai.Client(api_key=api_key)
+
+        try:
+            result = await client.aio.models.embed_content(
+                model=model,
+                contents=texts,
+                config={"task_type": task_type}
+            )
+        except Exception as e:
+            code = getattr(e, "code", None)
+            message = str(e)
+            if code == 429 or "RESOURCE_EXHAUSTED" in message:
+                if "per day" in message.lower() or "PerDay" in message:
+                    raise QuotaExhaustedError(message) from e
+                raise RateLimitError(message, retry_after=_parse_retry_delay(message)) from e
+            raise
+
+        return [embedding.values for embedding in result.embeddings]
+
+    return embed_fn
+
+
+def make_http_embed_fn(base_url, timeout=30):
+    """
+    HTTP 임베딩 서버(예: fake_embedding_server.py)를 호출하는 embed_fn 생성
+
+    POST {base_url}/embed  {"texts": [...]}  (헤더 X-Api-Key) -> {"embeddings": [[...], ...]}
+    """
+    url = base_url.rstrip("/") + "/embed"
+
+    def _post(api_key, texts):
+        request = urllib.request.Request(
+            url,
+            data=json.dumps({"texts": texts}).encode("utf-8"),
+            headers={"Content-Type": "application/json", "X-Api-Key": api_key},
+            method="POST"
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                return json.loads(response.read().decode("utf-8"))["embeddings"]
+        except urllib.error.HTTPError as e:
+            if e.code == 429:
+                retry_after = e.headers.get("Retry-After")
+                raise RateLimitError(f"HTTP 429 ({api_key[:8]}...)",
+                                     retry_after=float(retry_after) if retry_after else None) from e
+            if e.code == 403:
+                raise QuotaExhaustedError(f"HTTP 403 ({api_key[:8]}...)") from e
+            raise
+
+    async def embed_fn(api_key, texts):
+        return await asyncio.to_thread(_post, api_key, texts)
+
+    return embed_fn
@@ -0,0 +1,293 @@
+"""
+단계별 산출물 캐시를 사용하는 벡터 스토어 빌드 파이프라인
+
+빌드를 이름 있는 단계로 나누고, 각 단계의 산출물을 입력과 설정에서 유도한 키로 저장한다.
+
+    documents   데이터 파일 내용 + 변환 함수 소스  -> documents.jsonl
+    chunks      documents 키 + 분할 설정           -> chunks.jsonl (내용이 같은 청크는 하나만,
+                                                      near_dedup_threshold가 있으면 유사 중복 군집별 대표만)
+    embeddings  chunks 키 + 임베딩 모델            -> embeddings.npy (float32, 청크 순서)
+    index       embeddings 키 + 인덱스 설정        -> index.faiss / index.pkl (LangChain FAISS 형식)
+
+다시 실행하면 입력과 설정이 바뀌지 않은 단계는 저장된 산출물을 그대로 쓰므로, 예를 들어 인덱스 종류만
+바꾸는 실험은 임베딩을 다시 계산하지 않는다.
+
+캐시 디렉토리 구조:
+    {cache_dir}/{stage}/{key}/
+        ...산출물...
+        stage.json      # 단계, 키, 설정, 입력 키, 생성 시각 (마지막에 기록되어 완료 표시 역할)
+"""
+import hashlib
+import inspect
+import json
+import logging
+import shutil
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+STAGE_FILENAME = "stage.json"
+INDEX_TYPES = ("flat", "ivf", "hnsw")
+
+
+def stable_hash(*parts):
+    """JSON 직렬화 가능한 값들로부터 안정적인 키 생성"""
+    payload = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:24]
+
+
+def file_fingerprint(paths):
+    """파일 이름과 내용으로부터 키 생성 (수정 시각이 아닌 내용 기준)"""
+    digest = hashlib.sha256()
+    for path in sorted(Path(p) for p in paths):
+        digest.update(path.name.encode("utf-8"))
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()[:24]
+
+
+def source_fingerprint(func):
+    """함수 소스 코드 해시 - 변환 로직이 바뀌면 documents 단계가 다시 실행되도록"""
+    try:
+        return stable_hash(inspect.getsource(func))
+    except (OSError, TypeError):
+        return getattr(func, "__qualname__", repr(func))
+
+
+class ArtifactCache:
+    """
+    단계 산출물 저장소 - 임시 디렉토리에 완전히 쓴 뒤 이름을 바꿔 게시
+    """
+    def __init__(self, cache_dir):
+        self.cache_dir = Path(cache_dir)
+
+    def path(self, stage, key):
+        return self.cache_dir / stage / key
+
+    def has(self, stage, key):
+        return (self.path(stage, key) / STAGE_FILENAME).exists()
+
+    def read_info(self, stage, key):
+        """게시된 산출물의 stage.json 내용"""
+        with open(self.path(stage, key) / STAGE_FILENAME, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def write(self, stage, key, writer, info=None):
+        """
+        writer(tmp_dir)로 산출물을 만든 뒤 원자적으로 게시 - 같은 키가 이미 있으면 그대로 사용
+        """
+        final_path = self.path(stage, key)
+        final_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = final_path.parent / f".tmp-{key}-{uuid.uuid4().hex}"
+        tmp_path.mkdir()
+
+        try:
+            writer(tmp_path)
+            with open(tmp_path / STAGE_FILENAME, "w", encoding="utf-8") as f:
+                json.dump({
+                    "stage": stage,
+                    "key": key,
+                    "created_at": datetime.now().isoformat(timespec="seconds"),
+                    **(info or {}),
+                }, f, ensure_ascii=False, indent=2)
+            if self.has(stage, key):
+                # 다른 빌드가 먼저 같은 산출물을 게시함
+                shutil.rmtree(tmp_path, ignore_errors=True)
+            else:
+                shutil.rmtree(final_path, ignore_errors=True)
+                tmp_path.rename(final_path)
+        except Exception:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            raise
+        return final_path
+
+
+def write_documents(path, documents):
+    with open(path, "w", encoding="utf-8") as f:
+        for doc in documents:
+            f.write(json.dumps({"page_content": doc.page_content, "metadata": doc.metadata}, ensure_ascii=False) + "\n")
+
+
+def read_documents(path):
+    from langchain.schema import Document
+
+    with open(path, "r", encoding="utf-8") as f:
+        return [Document(**json.loads(line)) for line in f if line.strip()]
+
+
+def build_faiss_from_vectors(vectors, chunks, doc_ids, embeddings, index_type="flat", nlist=None, hnsw_m=32,
+                             nprobe=None):
+    """
+    미리 계산한 벡터로 LangChain FAISS 스토어 생성 (L2 거리, FAISS.from_documents와 같은 점수 체계)
+
+    IVF 인덱스는 nprobe와 direct map을 설정한 채로 반환하므로 저장 파일에도 함께 기록된다.
+    """
+    import faiss
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+    from langchain_community.vectorstores import FAISS
+
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    dimension = vectors.shape[1]
+
+    if index_type == "flat":
+        index = faiss.IndexFlatL2(dimension)
+    elif index_type == "ivf":
+        from ondisk_index import default_nlist
+
+        index = faiss.IndexIVFFlat(faiss.IndexFlatL2(dimension), dimension, nlist or default_nlist(len(vectors)))
+        index.train(vectors)
+    elif index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dimension, hnsw_m)
+    else:
+        raise ValueError(f"지원하지 않는 인덱스 종류입니다: {index_type} (지원: {INDEX_TYPES})")
+    index.add(vectors)
+    if index_type == "ivf":
+        from ondisk_index import prepare_ivf_index
+
+        prepare_ivf_index(index, nprobe)
+
+    return FAISS(
+        embedding_function=embeddings,
+        index=index,
+        docstore=InMemoryDocstore(dict(zip(doc_ids, chunks))),
+        index_to_docstore_id=dict(enumerate(doc_ids)),
+    )
+
+
+class VectorBuildPipeline:
+    """
+    documents -> chunks -> embeddings -> index 단계별 캐시 빌드
+
+    Args:
+        cache: ArtifactCache
+        embeddings: 임베딩 모델 (embed_documents 지원)
+        embedding_model_name: 임베딩 단계 키에 포함할 모델 이름
+        profiler: 단계 시간을 "pipeline/{단계}"로 기록할 StageProfiler (선택)
+    """
+    def __init__(self, cache, embeddings, embedding_model_name, profiler=None):
+        self.cache = cache
+        self.embeddings = embeddings
+        self.embedding_model_name = embedding_model_name
+        self.profiler = profiler
+        self.report = {}
+
+    def _stage(self, stage, key, writer, info=None):
+        started = time.perf_counter()
+        if self.cache.has(stage, key):
+            status = "cached"
+        else:
+            self.cache.write(stage, key, writer, info)
+            status = "built"
+        elapsed = time.perf_counter() - started
+        if self.profiler is not None:
+            self.profiler.add(f"pipeline/{stage}", elapsed)
+        self.report[stage] = {"key": key, "status": status, "seconds": round(elapsed, 3)}
+        logger.info(f"[{stage}] {status} ({key}, {elapsed:.2f}s)")
+        return self.cache.path(stage, key)
+
+    def documents(self, data_files, load_documents, converter_fingerprint):
+        """
+        Args:
+            data_files: 입력 데이터 파일 목록 (내용 해시가 키가 됨)
+            load_documents: 문서 목록을 반환하는 함수 (캐시 미스일 때만 호출)
+        """
+        key = stable_hash("documents", file_fingerprint(data_files), converter_fingerprint)
+        path = self._stage(
+            "documents", key,
+            lambda out: write_documents(out / "documents.jsonl", load_documents()),
+            {"files": [str(p) for p in data_files]}
+        )
+        return key, path / "documents.jsonl"
+
+    def chunks(self, documents_key, documents_path, chunk_size, chunk_overlap, separators, near_dedup_threshold=None):
+        from langchain.text_splitter import RecursiveCharacterTextSplitter
+        from parallel_embedding import chunk_id
+
+        config = {"chunk_size": chunk_size, "chunk_overlap": chunk_overlap, "separators": list(separators)}
+        if near_dedup_threshold:
+            # 설정하지 않은 빌드는 기존 캐시 키를 그대로 사용
+            config["near_dedup_threshold"] = near_dedup_threshold
+        key = stable_hash("chunks", documents_key, config)
+
+        def writer(out):
+            splitter = RecursiveCharacterTextSplitter(
+                chunk_size=chunk_size, chunk_overlap=chunk_overlap, separators=list(separators), length_function=len
+            )
+            unique, seen = [], set()
+            for chunk in splitter.split_documents(read_documents(documents_path)):
+                doc_id = chunk_id(chunk)
+                if doc_id not in seen:
+                    seen.add(doc_id)
+                    unique.append(chunk)
+            if near_dedup_threshold:
+                from near_dedup import deduplicate_chunks
+
+                unique, dedup_report = deduplicate_chunks(unique, threshold=near_dedup_threshold)
+                with open(out / "near_dedup.json", "w", encoding="utf-8") as f:
+                    json.dump(dedup_report, f, ensure_ascii=False, indent=2)
+            write_documents(out / "chunks.jsonl", unique)
+
+        path = self._stage("chunks", key, writer, {"config": config, "inputs": [documents_key]})
+        return key, path / "chunks.jsonl"
+
+    def embed(self, chunks_key, chunks_path, batch_size=256):
+        key = stable_hash("embeddings", chunks_key, self.embedding_model_name)
+
+        def writer(out):
+            from tqdm import tqdm
+
+            chunks = read_documents(chunks_path)
+            batches = []
+            for start in tqdm(range(0, len(chunks), batch_size), desc="청크 임베딩"):
+                texts = [chunk.page_content for chunk in chunks[start:start + batch_size]]
+                batches.append(np.asarray(self.embeddings.embed_documents(texts), dtype=np.float32))
+            np.save(out / "embeddings.npy", np.vstack(batches))
+
+        path = self._stage(
+            "embeddings", key, writer, {"model": self.embedding_model_name, "inputs": [chunks_key]}
+        )
+        return key, path / "embeddings.npy"
+
+    def index(self, embeddings_key, embeddings_path, chunks_path, index_type="flat", nlist=None, hnsw_m=32,
+              nprobe=None):
+        from ondisk_index import DEFAULT_NPROBE
+        from parallel_embedding import chunk_id
+
+        config = {"index_type": index_type, "nlist": nlist, "hnsw_m": hnsw_m}
+        if index_type == "ivf":
+            # 로드 시 검색 설정으로 다시 적용 (stage.json의 config)
+            config["nprobe"] = nprobe or DEFAULT_NPROBE
+        key = stable_hash("index", embeddings_key, config)
+
+        def writer(out):
+            chunks = read_documents(chunks_path)
+            vectors = np.load(embeddings_path, mmap_mode="r")
+            vectorstore = build_faiss_from_vectors(
+                vectors, chunks, [chunk_id(chunk) for chunk in chunks], self.embeddings,
+                index_type=index_type, nlist=nlist, hnsw_m=hnsw_m, nprobe=config.get("nprobe")
+            )
+            vectorstore.save_local(str(out))
+
+        path = self._stage("index", key, writer, {"config": config, "inputs": [embeddings_key]})
+        return key, path
+
+    def run(self, data_files, load_documents, converter_fingerprint, chunk_size=1000, chunk_overlap=200,
+            separators=("\n\n", "\n", ". ", " ", ""), index_type="flat", nlist=None, hnsw_m=32,
+            near_dedup_threshold=None, nprobe=None):
+        """
+        전체 단계 실행 - 인덱스 산출물 경로 반환 (각 단계 결과는 self.report)
+        """
+        self.report = {}
+        documents_key, documents_path = self.documents(data_files, load_documents, converter_fingerprint)
+        chunks_key, chunks_path = self.chunks(
+            documents_key, documents_path, chunk_size, chunk_overlap, separators, near_dedup_threshold
+        )
+        embeddings_key, embeddings_path = self.embed(chunks_key, chunks_path)
+        _, index_path = self.index(embeddings_key, embeddings_path, chunks_path, index_type, nlist, hnsw_m, nprobe)
+        return index_path
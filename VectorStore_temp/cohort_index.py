@@ -0,0 +1,266 @@
+"""
+환자 코호트 비트맵 인덱스 - 진단/약물/알레르기/진료과/성별/나이 조건의 AND/OR/NOT 집합 연산
+
+"와파린과 아스피린을 모두 복용하는 환자", "페니실린 알레르기가 있는 당뇨 환자" 같은 질의는 환자 속성의
+집합 연산이므로, 환자를 행 번호로 두고 속성 값(용어)마다 환자 집합을 비트맵(64비트 워드 배열)으로 저장한다.
+조건 하나는 비트맵 하나 또는 몇 개의 OR이고, 조합은 워드 단위 비트 연산이라 환자 수만 명 규모에서도
+수 마이크로초에 끝난다. 환자 수는 비트 카운트(popcount)로 바로 구한다.
+
+필드:
+    diagnosis, icd10, diagnosis_status ((진단명, 코드, 상태)), medication, drug_class, allergy,
+    department, gender, age (세), age_bucket (10세 단위, 예: 60 -> 60~69세)
+
+진단/약물/알레르기 조건은 PatientTable.query와 같은 규칙(이름 일부 일치, ICD-10 접두사 일치)으로 해석한다.
+"""
+import logging
+from collections import OrderedDict
+
+import numpy as np
+
+from patient_table import _as_terms, _looks_like_icd10
+
+logger = logging.getLogger(__name__)
+
+FIELDS = (
+    "diagnosis", "icd10", "diagnosis_status", "medication", "drug_class", "allergy",
+    "department", "gender", "age", "age_bucket",
+)
+
+
+def _popcount(words):
+    if hasattr(np, "bitwise_count"):
+        return int(np.bitwise_count(words).sum())
+    return int(np.unpackbits(words.view(np.uint8)).sum())
+
+
+class Bitmap:
+    """
+    고정 크기 비트 집합 (환자 행 번호 집합) - &, |, ^, - (차집합), ~ (여집합) 지원
+    """
+    __slots__ = ("words", "size")
+
+    def __init__(self, words, size):
+        self.words = words
+        self.size = size
+
+    @classmethod
+    def empty(cls, size):
+        return cls(np.zeros((size + 63) // 64, dtype=np.uint64), size)
+
+    @classmethod
+    def full(cls, size):
+        return ~cls.empty(size)
+
+    @classmethod
+    def from_rows(cls, rows, size):
+        bitmap = cls.empty(size)
+        rows = np.asarray(rows, dtype=np.uint64)
+        np.bitwise_or.at(bitmap.words, (rows >> np.uint64(6)).astype(np.int64), np.uint64(1) << (rows & np.uint64(63)))
+        return bitmap
+
+    def __and__(self, other):
+        return Bitmap(self.words & other.words, self.size)
+
+    def __or__(self, other):
+        return Bitmap(self.words | other.words, self.size)
+
+    def __xor__(self, other):
+        return Bitmap(self.words ^ other.words, self.size)
+
+    def __sub__(self, other):
+        return Bitmap(self.words & ~other.words, self.size)
+
+    def __invert__(self):
+        words = ~self.words
+        if self.size % 64:
+            # 마지막 워드의 범위 밖 비트는 0으로 유지
+            words[-1] &= np.uint64((1 << (self.size % 64)) - 1)
+        return Bitmap(words, self.size)
+
+    def __len__(self):
+        return _popcount(self.words)
+
+    def rows(self):
+        """켜진 비트의 행 번호 배열 (오름차순)"""
+        bits = np.unpackbits(self.words.view(np.uint8), bitorder="little")[:self.size]
+        return np.flatnonzero(bits)
+
+
+class CohortIndex:
+    """
+    필드/용어별 환자 비트맵 인덱스
+
+    Attributes:
+        patient_ids: 행 번호 -> 환자 ID
+        bitmaps: 필드 -> {용어: Bitmap}
+    """
+    def __init__(self, patient_ids, bitmaps, cache_size=1024):
+        self.patient_ids = np.asarray(patient_ids, dtype=object)
+        self.bitmaps = bitmaps
+        self._match_cache = OrderedDict()
+        self._cache_size = cache_size
+
+    def __len__(self):
+        return len(self.patient_ids)
+
+    @classmethod
+    def from_records(cls, records):
+        """
+        Args:
+            records: (patient, department) 튜플의 iterable
+        """
+        rows_by_term = {field: {} for field in FIELDS}
+        patient_ids, row_of = [], {}
+
+        def add(field, term, row):
+            if term is not None and term != "":
+                rows_by_term[field].setdefault(term, set()).add(row)
+
+        for patient, department in records:
+            patient_id = patient["id"]
+            row = row_of.get(patient_id)
+            if row is None:
+                row = row_of[patient_id] = len(patient_ids)
+                patient_ids.append(patient_id)
+
+            add("department", patient.get("department") or department, row)
+            add("gender", patient.get("gender"), row)
+            age = patient.get("age")
+            if age is not None:
+                add("age", int(age), row)
+                add("age_bucket", int(age) // 10 * 10, row)
+            for diagnosis in patient.get("diagnoses", []):
+                add("diagnosis", diagnosis.get("name"), row)
+                add("icd10", diagnosis.get("icd10"), row)
+                add("diagnosis_status", (diagnosis.get("name"), diagnosis.get("icd10", ""), diagnosis.get("status")), row)
+            for medication in patient.get("medications", []):
+                add("medication", medication.get("medication"), row)
+                add("drug_class", medication.get("class"), row)
+            for allergy in patient.get("allergies", []):
+                add("allergy", allergy, row)
+
+        size = len(patient_ids)
+        bitmaps = {
+            field: {term: Bitmap.from_rows(sorted(rows), size) for term, rows in terms.items()}
+            for field, terms in rows_by_term.items()
+        }
+        index = cls(patient_ids, bitmaps)
+        logger.info(
+            f"코호트 비트맵 인덱스 생성 완료: 환자 {size}명, 비트맵 {sum(len(t) for t in bitmaps.values())}개"
+        )
+        return index
+
+    @classmethod
+    def from_json_files(cls, data_path, file_pattern="*_patients*"):
+        from dataset_io import iter_patient_records
+
+        return cls.from_records(iter_patient_records(data_path, file_pattern))
+
+    def all(self):
+        return Bitmap.full(len(self))
+
+    def none(self):
+        return Bitmap.empty(len(self))
+
+    def term(self, field, value):
+        """정확히 일치하는 용어의 비트맵 (없으면 빈 비트맵)"""
+        bitmap = self.bitmaps[field].get(value)
+        return bitmap if bitmap is not None else self.none()
+
+    def match(self, field, terms):
+        """
+        용어 중 하나라도 일치하는 환자 (이름 일부 일치, 진단은 ICD-10 접두사도 허용) - 해석 결과는 캐시
+        """
+        terms = _as_terms(terms)
+        key = (field, terms)
+        cached = self._match_cache.get(key)
+        if cached is not None:
+            self._match_cache.move_to_end(key)
+            return cached
+
+        result = self.none()
+        for term in terms:
+            for name, bitmap in self.bitmaps[field].items():
+                if term in str(name):
+                    result = result | bitmap
+            if field == "diagnosis" and _looks_like_icd10(term):
+                for code, bitmap in self.bitmaps["icd10"].items():
+                    if str(code).startswith(term):
+                        result = result | bitmap
+
+        self._match_cache[key] = result
+        if len(self._match_cache) > self._cache_size:
+            self._match_cache.popitem(last=False)
+        return result
+
+    def age_range(self, min_age=None, max_age=None):
+        """나이 범위 - 범위에 완전히 포함된 10세 구간은 age_bucket 비트맵, 양 끝은 age 비트맵으로 합침"""
+        result = self.none()
+        for bucket, bitmap in self.bitmaps["age_bucket"].items():
+            if (min_age is None or bucket >= min_age) and (max_age is None or bucket + 9 <= max_age):
+                result = result | bitmap
+            elif (min_age is None or bucket + 9 >= min_age) and (max_age is None or bucket <= max_age):
+                for age in range(bucket, bucket + 10):
+                    if (min_age is None or age >= min_age) and (max_age is None or age <= max_age):
+                        result = result | self.term("age", age)
+        return result
+
+    def _diagnoses(self, terms, diagnosis_status):
+        """진단 조건 - 상태 조건이 있으면 그 상태인 진단만 (같은 진단 행에서 이름/코드와 상태가 함께 일치)"""
+        if not diagnosis_status:
+            return self.match("diagnosis", terms)
+        terms, statuses = _as_terms(terms), _as_terms(diagnosis_status)
+        result = self.none()
+        for (name, code, status), bitmap in self.bitmaps["diagnosis_status"].items():
+            if status not in statuses:
+                continue
+            if any(term in str(name) or (_looks_like_icd10(term) and str(code).startswith(term)) for term in terms):
+                result = result | bitmap
+        return result
+
+    def cohort(self, min_age=None, max_age=None, gender=None, department=None,
+               diagnoses_all=None, diagnoses_any=None, medications_all=None, medications_any=None,
+               allergies_any=None, exclude_allergies=None, diagnosis_status=None):
+        """
+        정형 조건을 모두 만족하는 환자 비트맵 (조건 의미는 PatientTable.query와 같음)
+        """
+        result = self.all()
+        if min_age is not None or max_age is not None:
+            result &= self.age_range(min_age, max_age)
+        if gender:
+            result &= self._union("gender", gender)
+        if department:
+            result &= self._union("department", department)
+
+        for group in diagnoses_all or ():
+            result &= self._diagnoses(group, diagnosis_status)
+        if diagnoses_any:
+            result &= self._diagnoses(tuple(t for group in diagnoses_any for t in _as_terms(group)), diagnosis_status)
+
+        for group in medications_all or ():
+            result &= self.match("medication", group)
+        if medications_any:
+            result &= self.match("medication", tuple(t for group in medications_any for t in _as_terms(group)))
+
+        if allergies_any:
+            result &= self.match("allergy", allergies_any)
+        if exclude_allergies:
+            result -= self.match("allergy", exclude_allergies)
+        return result
+
+    def _union(self, field, values):
+        result = self.none()
+        for value in _as_terms(values):
+            result = result | self.term(field, value)
+        return result
+
+    def query(self, **conditions):
+        """조건을 만족하는 환자 ID 목록 (PatientTable.query와 같은 인자)"""
+        return self.patient_ids[self.cohort(**conditions).rows()].tolist()
+
+    def count(self, **conditions):
+        """조건을 만족하는 환자 수"""
+        return len(self.cohort(**conditions))
+
+    def to_patient_ids(self, bitmap):
+        return self.patient_ids[bitmap.rows()].tolist()
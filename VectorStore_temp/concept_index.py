@@ -0,0 +1,248 @@
+"""
+진단명/동의어/ICD-10 코드 개념 정규화 인덱스
+
+MedicalDataGenerator의 진단 사전(diagnosis_dict)에서 개념(ICD-10 코드 하나)마다 대표 진단명, 동의어(영문/한글),
+코드를 모아 다음 구조를 만든다.
+
+    용어 트라이     정규화된 진단명/동의어/코드 -> 개념 (정확 일치, 질의 문장 안의 용어 탐색)
+    코드 트라이     ICD-10 코드 -> 개념 ("I2", "I2x", "I2*" 같은 코드 접두사 질의)
+    용어 임베딩     동의어 임베딩 행렬 (선택 - 사전에 없는 표현의 의미 기반 매칭)
+
+트라이 조회는 임베딩 계산 없이 문자 단위로만 이루어지므로 질의 하나를 1ms 이내에 코드로 바꿀 수 있고,
+결과의 진단명으로 diagnosis_name 메타데이터를 정확히 필터링할 수 있다.
+"""
+import logging
+import re
+import unicodedata
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# "I25", "E78.5", "I2x", "I2*", "T78.x" 형태의 코드 (접두사 표기 x/X/*/% 지원)
+_CODE_PATTERN = re.compile(r"(?<![A-Za-z0-9])([A-Za-z]\d{1,2}(?:\.\d{0,2})?)([xX*%]*)(?![A-Za-z0-9])")
+_IGNORED_CHARS = re.compile(r"[\s\-_'’/(),]+")
+_ASCII_TOKEN = re.compile(r"[a-z0-9]+")
+
+# 이 길이 이하의 영문 약어(MS, RA, MI, CAD 등)는 문장 안에서 단어 단위로만 매칭 (부분 문자열 오탐 방지)
+SHORT_ABBREVIATION_LENGTH = 3
+
+
+def normalize_term(text):
+    """용어 정규화 - 유니코드 NFC, 소문자, 공백/구두점 제거 ("Parkinson's disease" -> "parkinsonsdisease")"""
+    return _IGNORED_CHARS.sub("", unicodedata.normalize("NFC", str(text)).lower())
+
+
+def normalize_code(code):
+    return str(code).strip().upper()
+
+
+class PrefixTrie:
+    """
+    문자열 -> 값 집합 트라이 (정확 일치, 접두사 일치, 문장 내 최장 일치 탐색)
+    """
+    _END = "\0"
+
+    def __init__(self):
+        self.root = {}
+
+    def insert(self, key, value):
+        node = self.root
+        for char in key:
+            node = node.setdefault(char, {})
+        node.setdefault(self._END, set()).add(value)
+
+    def _node(self, key):
+        node = self.root
+        for char in key:
+            node = node.get(char)
+            if node is None:
+                return None
+        return node
+
+    def get(self, key):
+        node = self._node(key)
+        return set(node.get(self._END, ())) if node else set()
+
+    def with_prefix(self, prefix):
+        """prefix로 시작하는 모든 키의 값"""
+        node = self._node(prefix)
+        if node is None:
+            return set()
+        values, stack = set(), [node]
+        while stack:
+            current = stack.pop()
+            for char, child in current.items():
+                if char == self._END:
+                    values.update(child)
+                else:
+                    stack.append(child)
+        return values
+
+    def scan(self, text):
+        """
+        text 안에 나타나는 키를 왼쪽부터 최장 일치로 탐색 (겹치지 않게)
+
+        Returns:
+            [(시작 위치, 끝 위치, 값 집합), ...]
+        """
+        matches, start = [], 0
+        while start < len(text):
+            node, end, found = self.root, start, None
+            while end < len(text):
+                node = node.get(text[end])
+                if node is None:
+                    break
+                end += 1
+                if self._END in node:
+                    found = (start, end, set(node[self._END]))
+            if found:
+                matches.append(found)
+                start = found[1]
+            else:
+                start += 1
+        return matches
+
+
+class ConceptIndex:
+    """
+    ICD-10 개념 인덱스
+
+    Attributes:
+        concepts: 코드 -> {"icd10", "name", "department", "synonyms"}
+        terms: [(정규화 전 용어, 코드), ...] (용어 임베딩 행 순서)
+    """
+    def __init__(self, diagnosis_dict):
+        self.concepts = {}
+        self.terms = []
+        self.term_trie = PrefixTrie()
+        self.code_trie = PrefixTrie()
+        self.abbreviations = {}
+        self.term_vectors = None
+
+        for department, diseases in diagnosis_dict.items():
+            for disease in diseases:
+                code = normalize_code(disease["icd10"])
+                concept = self.concepts.setdefault(code, {
+                    "icd10": code, "name": disease["name"], "department": department, "synonyms": []
+                })
+                for term in [disease["name"], *disease.get("synonyms", [])]:
+                    if term not in concept["synonyms"] and term != concept["name"]:
+                        concept["synonyms"].append(term)
+                    self.terms.append((term, code))
+                    key = normalize_term(term)
+                    if key.isascii() and len(key) <= SHORT_ABBREVIATION_LENGTH:
+                        self.abbreviations.setdefault(key, set()).add(code)
+                    elif key:
+                        self.term_trie.insert(key, code)
+                self.code_trie.insert(code.replace(".", ""), code)
+
+        logger.info(f"개념 인덱스 생성: ICD-10 코드 {len(self.concepts)}개, 용어 {len(self.terms)}개")
+
+    def __len__(self):
+        return len(self.concepts)
+
+    def _results(self, codes, method, matched=None, scores=None):
+        results = []
+        for code in sorted(codes):
+            concept = self.concepts[code]
+            results.append({
+                "icd10": code,
+                "name": concept["name"],
+                "department": concept["department"],
+                "method": method,
+                "matched": (matched or {}).get(code),
+                "score": (scores or {}).get(code, 1.0),
+            })
+        return results
+
+    def by_code_prefix(self, prefix):
+        """코드 접두사로 개념 조회 ("I2" -> I21, I25 ...; "E78.5"처럼 점이 있어도 됨)"""
+        prefix = normalize_code(prefix).rstrip("X*%").replace(".", "")
+        return self._results(self.code_trie.with_prefix(prefix), "code_prefix") if prefix else []
+
+    def lookup(self, query):
+        """
+        질의 -> ICD-10 개념 목록 (임베딩 계산 없음)
+
+        1. 질의 전체가 진단명/동의어/코드와 일치
+        2. 질의 안의 코드 표기 ("I25", "I2x" 접두사)
+        3. 질의 문장 안에 나타나는 진단명/동의어 (최장 일치)
+
+        Returns:
+            [{"icd10", "name", "department", "method", "matched", "score"}, ...]
+        """
+        key = normalize_term(query)
+        exact = self.term_trie.get(key) or self.abbreviations.get(key)
+        if exact:
+            return self._results(exact, "exact", {code: query for code in exact})
+
+        codes, matched, method = set(), {}, "code"
+        for code, suffix in _CODE_PATTERN.findall(query):
+            code = normalize_code(code)
+            key_code = code.replace(".", "")
+            if suffix:
+                found, method = self.code_trie.with_prefix(key_code), "code_prefix"
+            else:
+                # 정확한 코드가 없으면 하위 코드 ("E78" -> E78.5)
+                found = self.code_trie.get(key_code) or self.code_trie.with_prefix(key_code)
+            for hit in found:
+                matched.setdefault(hit, code + suffix)
+            codes |= found
+        if codes:
+            return self._results(codes, method, matched)
+
+        for start, end, hits in self.term_trie.scan(key):
+            for hit in hits:
+                matched.setdefault(hit, key[start:end])
+            codes |= hits
+        for token in _ASCII_TOKEN.findall(query.lower()):
+            for hit in self.abbreviations.get(token, ()):
+                matched.setdefault(hit, token)
+                codes.add(hit)
+        return self._results(codes, "term", matched)
+
+    def build_term_vectors(self, embeddings, vectors=None):
+        """
+        동의어 임베딩 행렬 준비 (vectors가 주어지면 저장해 둔 값 사용)
+
+        Returns:
+            (용어 수, 차원) 정규화된 float32 행렬
+        """
+        if vectors is None:
+            vectors = embeddings.embed_documents([term for term, _ in self.terms])
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        self.term_vectors = vectors / np.maximum(norms, 1e-12)
+        return self.term_vectors
+
+    def lookup_semantic(self, query_vector, top_k=3, threshold=0.5):
+        """
+        쿼리 임베딩과 가장 가까운 동의어의 개념 (코드별 최고 유사도, threshold 이상만)
+        """
+        if self.term_vectors is None:
+            raise ValueError("동의어 임베딩이 준비되지 않았습니다. build_term_vectors()를 먼저 호출하세요.")
+
+        query = np.asarray(query_vector, dtype=np.float32)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+        similarities = self.term_vectors @ query
+
+        scores, matched = {}, {}
+        for row in np.argsort(-similarities):
+            score = float(similarities[row])
+            if score < threshold:
+                break
+            term, code = self.terms[row]
+            if code not in scores:
+                scores[code], matched[code] = score, term
+                if len(scores) == top_k:
+                    break
+        results = self._results(scores, "semantic", matched, scores)
+        return sorted(results, key=lambda result: -result["score"])
+
+    def diagnosis_filter(self, concepts):
+        """개념 목록 -> 진단 문서 메타데이터 필터 (diagnosis_name 정확 일치)"""
+        names = sorted({concept["name"] for concept in concepts})
+        if not names:
+            return None
+        return {"diagnosis_name": names[0] if len(names) == 1 else {"$in": names}}
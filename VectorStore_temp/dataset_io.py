@@ -0,0 +1,313 @@
+"""
+생성 데이터셋 스트리밍 입출력
+
+환자를 생성하는 즉시 파일에 기록하고 일정 개수마다 파일을 교체(rotation)하므로
+데이터셋 크기와 무관하게 메모리 사용량이 일정하다.
+
+파일 이름:
+    {department}_patients.json                  기존 형식 (전체 목록, indent=2)
+    {department}_patients-00000.jsonl[.gz]      JSON Lines (한 줄에 환자 한 명)
+    {department}_patients-00000.parquet         row group 단위 Parquet
+                                                (id, department, age, gender + 전체 레코드 JSON 문자열)
+
+읽기는 형식에 관계없이 iter_patient_records로 (patient, department)를 하나씩 순회한다.
+"""
+import gzip
+import json
+import logging
+import math
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("json", "jsonl", "parquet")
+COMPRESSIONS = (None, "gzip")
+DATASET_SUFFIXES = (".json", ".jsonl", ".jsonl.gz", ".parquet")
+
+# flatten_patient_records가 만드는 테이블
+TABLES = ("patients", "diagnoses", "medications", "allergies", "lab_values", "visits", "vitals", "procedures")
+
+VITAL_COLUMNS = ["systolic_bp", "diastolic_bp", "pulse", "temperature", "respiratory_rate", "oxygen_saturation"]
+
+
+def department_of(path):
+    """'cardiology_patients-00003.jsonl.gz' -> 'cardiology'"""
+    return Path(path).name.split("_patients", 1)[0]
+
+
+class StreamingDatasetWriter:
+    """
+    진료과 하나의 환자 레코드를 순차 기록하는 스트리밍 작성기
+
+    Args:
+        output_dir: 출력 디렉토리
+        department: 진료과 (파일 이름 접두사)
+        fmt: "jsonl" 또는 "parquet"
+        compression: JSONL은 None/"gzip", Parquet은 pyarrow 압축 코덱 이름 (예: "zstd", "snappy")
+        max_records_per_file: 파일당 최대 환자 수 (넘으면 다음 파일로 교체)
+        row_group_size: Parquet row group 크기 (메모리에 모아두는 최대 환자 수)
+    """
+    def __init__(self, output_dir, department, fmt="jsonl", compression=None,
+                 max_records_per_file=100_000, row_group_size=1_000):
+        if fmt not in ("jsonl", "parquet"):
+            raise ValueError(f"스트리밍 형식은 jsonl 또는 parquet만 지원합니다: {fmt}")
+        if fmt == "jsonl" and compression not in COMPRESSIONS:
+            raise ValueError(f"JSONL 압축은 {COMPRESSIONS} 중 하나여야 합니다: {compression}")
+
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.department = department
+        self.fmt = fmt
+        self.compression = compression
+        self.max_records_per_file = max_records_per_file
+        self.row_group_size = row_group_size
+
+        self.paths = []
+        self.total_records = 0
+        self._file = None
+        self._file_records = 0
+        self._pending_rows = []
+
+        # 같은 진료과의 이전 실행 결과가 섞이지 않도록 기존 파일 정리
+        for old_path in self.output_dir.glob(f"{department}_patients-*"):
+            old_path.unlink()
+
+    def _next_path(self):
+        suffix = ".jsonl.gz" if self.fmt == "jsonl" and self.compression == "gzip" else f".{self.fmt}"
+        return self.output_dir / f"{self.department}_patients-{len(self.paths):05d}{suffix}"
+
+    def _open(self):
+        path = self._next_path()
+        self.paths.append(path)
+        self._file_records = 0
+
+        if self.fmt == "parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            schema = pa.schema([
+                ("id", pa.string()),
+                ("department", pa.string()),
+                ("age", pa.int32()),
+                ("gender", pa.string()),
+                ("record", pa.string()),
+            ])
+            self._file = pq.ParquetWriter(path, schema, compression=self.compression or "zstd")
+        elif self.compression == "gzip":
+            # mtime=0: 같은 입력이면 압축 파일도 바이트 단위로 동일
+            self._file = gzip.GzipFile(filename=path.name, mode="wb", fileobj=open(path, "wb"), mtime=0)
+        else:
+            self._file = open(path, "wb")
+
+    def _flush_rows(self):
+        if not self._pending_rows:
+            return
+        import pyarrow as pa
+
+        columns = {name: [row[name] for row in self._pending_rows]
+                   for name in ("id", "department", "age", "gender", "record")}
+        self._file.write_table(pa.Table.from_pydict(columns, schema=self._file.schema))
+        self._pending_rows = []
+
+    def _close_file(self):
+        if self._file is None:
+            return
+        if self.fmt == "parquet":
+            self._flush_rows()
+            self._file.close()
+        elif self.compression == "gzip":
+            fileobj = self._file.fileobj
+            self._file.close()
+            fileobj.close()
+        else:
+            self._file.close()
+        self._file = None
+
+    def write(self, patient):
+        if self._file is None or self._file_records >= self.max_records_per_file:
+            self._close_file()
+            self._open()
+
+        line = json.dumps(patient, ensure_ascii=False, separators=(",", ":"))
+        if self.fmt == "parquet":
+            self._pending_rows.append({
+                "id": patient.get("id"),
+                "department": patient.get("department", self.department),
+                "age": patient.get("age"),
+                "gender": patient.get("gender"),
+                "record": line,
+            })
+            if len(self._pending_rows) >= self.row_group_size:
+                self._flush_rows()
+        else:
+            self._file.write(line.encode("utf-8") + b"\n")
+
+        self._file_records += 1
+        self.total_records += 1
+
+    def write_many(self, patients):
+        for patient in patients:
+            self.write(patient)
+
+    def close(self):
+        self._close_file()
+        logger.info(f"{self.department}: {self.total_records}명을 {len(self.paths)}개 파일에 저장 완료")
+        return self.paths
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_patients(path):
+    """
+    파일 하나의 환자 레코드를 순차적으로 읽음 (형식은 확장자로 판별)
+    """
+    path = Path(path)
+    name = path.name
+
+    if name.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        parquet_file = pq.ParquetFile(path)
+        for row_group in range(parquet_file.num_row_groups):
+            for record in parquet_file.read_row_group(row_group, columns=["record"]).column("record"):
+                yield json.loads(record.as_py())
+    elif name.endswith(".jsonl") or name.endswith(".jsonl.gz"):
+        opener = gzip.open if name.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    else:
+        # 기존 JSON 배열 형식은 파일 전체를 읽어야 함
+        with open(path, "r", encoding="utf-8") as f:
+            yield from json.load(f)
+
+
+def find_dataset_files(data_path, file_pattern="*_patients*"):
+    """
+    데이터 디렉토리의 환자 데이터 파일 목록 (진료과, 파일 번호 순)
+    """
+    return sorted(
+        path for path in Path(data_path).glob(file_pattern)
+        if path.is_file() and path.name.endswith(DATASET_SUFFIXES)
+    )
+
+
+def iter_patient_records(data_path, file_pattern="*_patients*"):
+    """
+    모든 형식의 환자 데이터 파일에서 (patient, department)를 순회
+    """
+    for path in find_dataset_files(data_path, file_pattern):
+        department = department_of(path)
+        try:
+            for patient in read_patients(path):
+                yield patient, department
+        except Exception as e:
+            logger.error(f"Error loading {path}: {e}")
+
+
+def split_normal_range(normal_range):
+    """'13-17' -> (13.0, 17.0), '<100' -> (0.0, 100.0), '>60' -> (60.0, inf), 해석할 수 없으면 (nan, nan)"""
+    text = str(normal_range).strip()
+    try:
+        if text.startswith("<"):
+            return 0.0, float(text.lstrip("<="))
+        if text.startswith(">"):
+            return float(text.lstrip(">=")), math.inf
+        low, high = text.split("-", 1)
+        return float(low), float(high)
+    except ValueError:
+        return math.nan, math.nan
+
+
+def flatten_patient_records(records, tables=TABLES):
+    """
+    (patient, department) 레코드를 테이블별 컬럼 리스트로 평탄화 (PatientTable, Parquet 웨어하우스 공용)
+
+    환자 레코드 스키마가 바뀌면 이 함수만 고친다.
+
+    Args:
+        tables: 만들 테이블 이름 (필요한 테이블만 모으면 검사/방문 평탄화 비용을 건너뜀)
+
+    Returns:
+        {테이블명: {컬럼명: 값 리스트}} - 행이 없는 테이블은 빈 dict
+    """
+    columns = {table: {} for table in tables}
+
+    def add(table, **values):
+        store = columns[table]
+        for name, value in values.items():
+            store.setdefault(name, []).append(value)
+
+    for patient, department in records:
+        patient_id = patient["id"]
+        department = patient.get("department") or department
+
+        if "patients" in columns:
+            add("patients",
+                patient_id=patient_id, department=department, name=patient.get("name"),
+                gender=patient.get("gender"), age=patient.get("age"), birthdate=patient.get("birthdate"),
+                blood_type=patient.get("blood_type"), height=patient.get("height"),
+                weight=patient.get("weight"), bmi=patient.get("bmi"), insurance=patient.get("insurance"),
+                smoking_status=(patient.get("smoking") or {}).get("status"),
+                alcohol_status=(patient.get("alcohol") or {}).get("status"),
+                allergies=list(patient.get("allergies", [])))
+
+        if "diagnoses" in columns:
+            for diagnosis in patient.get("diagnoses", []):
+                add("diagnoses",
+                    patient_id=patient_id, department=department, name=diagnosis.get("name"),
+                    icd10=diagnosis.get("icd10", ""), date=diagnosis.get("date"),
+                    doctor_id=diagnosis.get("doctor_id"), confidence=diagnosis.get("confidence"),
+                    status=diagnosis.get("status"), severity=diagnosis.get("severity"))
+
+        if "medications" in columns:
+            for medication in patient.get("medications", []):
+                add("medications",
+                    patient_id=patient_id, department=department, medication=medication.get("medication"),
+                    drug_class=medication.get("class"), prescription_date=medication.get("prescription_date"),
+                    duration_days=medication.get("duration_days"), dosage=medication.get("dosage"),
+                    frequency=medication.get("frequency"), related_diagnosis=medication.get("related_diagnosis"),
+                    doctor_id=medication.get("doctor_id"))
+
+        if "allergies" in columns:
+            for allergy in patient.get("allergies", []):
+                add("allergies", patient_id=patient_id, department=department, allergy=allergy)
+
+        if "lab_values" in columns:
+            for lab in patient.get("lab_results", []):
+                for test_name, result in lab.get("results", {}).items():
+                    low, high = split_normal_range(result.get("normal_range"))
+                    add("lab_values",
+                        patient_id=patient_id, department=department, lab_id=lab.get("lab_id"),
+                        date=lab.get("date"), test_type=lab.get("test_type"), test_name=test_name,
+                        value=result.get("value"), unit=result.get("unit"), normal_low=low, normal_high=high,
+                        flag=result.get("flag", ""), ordering_doctor_id=lab.get("ordering_doctor_id"))
+
+        for visit in patient.get("visits", []) if ("visits" in columns or "vitals" in columns) else ():
+            if "visits" in columns:
+                add("visits",
+                    visit_id=visit.get("visit_id"), patient_id=patient_id, department=department,
+                    date=visit.get("date"), time=visit.get("time"), visit_type=visit.get("type"),
+                    doctor_id=visit.get("doctor_id"), chief_complaint=visit.get("chief_complaint"),
+                    duration_minutes=visit.get("duration_minutes"))
+            if "vitals" in columns:
+                vitals = visit.get("vital_signs") or {}
+                add("vitals",
+                    visit_id=visit.get("visit_id"), patient_id=patient_id, department=department,
+                    date=visit.get("date"), **{name: vitals.get(name) for name in VITAL_COLUMNS})
+
+        if "procedures" in columns:
+            for procedure in patient.get("procedures", []):
+                add("procedures",
+                    procedure_id=procedure.get("procedure_id"), patient_id=patient_id, department=department,
+                    date=procedure.get("date"), name=procedure.get("name"),
+                    doctor_id=procedure.get("performing_doctor_id"), anesthesia=procedure.get("anesthesia"),
+                    duration_minutes=procedure.get("duration_minutes"), outcome=procedure.get("outcome"),
+                    num_complications=len(procedure.get("complications", [])))
+
+    return columns
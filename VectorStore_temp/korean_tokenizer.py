@@ -0,0 +1,219 @@
+"""
+희소(BM25) 검색용 한국어 토크나이저
+
+기본 공백 토크나이저는 "고혈압으로", "고혈압이"처럼 조사가 붙은 어절을 서로 다른 단어로 취급하므로
+한국어 키워드 재현율이 낮다. 두 가지 방식을 제공한다.
+
+- CharNgramTokenizer: 어절 + 음절 n-gram (외부 의존성 없음, 빠름)
+- MorphemeTokenizer: konlpy 형태소 분석 (조사/어미 제거, JVM 호출이 느리므로 캐시와 함께 사용)
+
+TokenCache는 텍스트 해시별 토큰을 추가 전용 파일에 저장하여, 문서 분석은 인덱싱 시점에 한 번만 수행하고
+검색 시점에는 캐시에서 바로 읽는다.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from functools import lru_cache
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_PATTERN = re.compile(r"[0-9A-Za-z가-힣]+")
+_HANGUL_PATTERN = re.compile(r"[가-힣]")
+
+
+class WhitespaceTokenizer:
+    """
+    소문자화 후 공백 분리 (BM25Retriever 기본 동작과 동일)
+    """
+    name = "whitespace"
+
+    def __call__(self, text):
+        return text.lower().split()
+
+
+class CharNgramTokenizer:
+    """
+    어절과 한글 음절 n-gram을 토큰으로 사용
+
+    "고혈압으로" -> ["고혈압으로", "고혈", "혈압", "압으", "으로", "고혈압", "혈압으", "압으로"]
+    """
+    name = "ngram"
+
+    def __init__(self, ngram_range=(2, 3)):
+        self.min_n, self.max_n = ngram_range
+
+    def __call__(self, text):
+        tokens = []
+        for word in _TOKEN_PATTERN.findall(text.lower()):
+            tokens.append(word)
+            # 영문/숫자 어절은 그대로 사용
+            if not _HANGUL_PATTERN.search(word):
+                continue
+            for n in range(self.min_n, self.max_n + 1):
+                if len(word) <= n:
+                    break
+                tokens.extend(word[i:i + n] for i in range(len(word) - n + 1))
+        return tokens
+
+
+class MorphemeTokenizer:
+    """
+    konlpy 형태소 분석기로 체언/용언 어간/외국어/숫자만 남김
+    """
+    name = "morpheme"
+
+    # Okt 품사 태그 기준으로 검색에 의미 있는 형태소
+    KEEP_TAGS = {"Noun", "Verb", "Adjective", "Alpha", "Number", "Foreign"}
+
+    def __init__(self, analyzer="okt"):
+        self.analyzer_name = analyzer
+        self._analyzer = None
+        self._lock = threading.Lock()
+
+    def _get_analyzer(self):
+        if self._analyzer is None:
+            try:
+                from konlpy.tag import Komoran, Okt
+            except ImportError:
+                raise ImportError("형태소 토크나이저를 사용하려면 konlpy를 설치하세요: pip install konlpy")
+
+            analyzers = {"okt": Okt, "komoran": Komoran}
+            if self.analyzer_name not in analyzers:
+                raise ValueError(f"지원하지 않는 형태소 분석기입니다: {self.analyzer_name} (가능: {list(analyzers)})")
+            self._analyzer = analyzers[self.analyzer_name]()
+        return self._analyzer
+
+    def __call__(self, text):
+        # konlpy 분석기는 스레드 안전하지 않으므로 직렬화
+        with self._lock:
+            analyzer = self._get_analyzer()
+            if self.analyzer_name == "okt":
+                pos = analyzer.pos(text, norm=True, stem=True)
+                return [word.lower() for word, tag in pos if tag in self.KEEP_TAGS]
+            # Komoran: 일반/고유명사, 동사/형용사 어간, 외국어, 숫자
+            pos = analyzer.pos(text)
+            return [word.lower() for word, tag in pos if tag[:2] in ("NN", "VV", "VA", "SL", "SN")]
+
+
+TOKENIZERS = {
+    WhitespaceTokenizer.name: WhitespaceTokenizer,
+    CharNgramTokenizer.name: CharNgramTokenizer,
+    MorphemeTokenizer.name: MorphemeTokenizer,
+}
+
+
+def create_tokenizer(name="ngram", **kwargs):
+    """이름('whitespace', 'ngram', 'morpheme')에 맞는 토크나이저 생성"""
+    if name not in TOKENIZERS:
+        raise ValueError(f"지원하지 않는 토크나이저입니다: {name} (가능: {list(TOKENIZERS)})")
+    return TOKENIZERS[name](**kwargs)
+
+
+def _text_hash(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class TokenCache:
+    """
+    텍스트 해시 -> 토큰 목록을 저장하는 추가 전용 JSON Lines 캐시
+
+    파일 형식: {"h": "<sha1>", "t": ["토큰", ...]}
+    """
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._tokens = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._tokens is not None:
+            return self._tokens
+
+        self._tokens = {}
+        if self.path.exists():
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # 중단으로 잘린 마지막 줄은 무시 (다시 분석됨)
+                        continue
+                    self._tokens[record["h"]] = record["t"]
+            logger.info(f"토큰 캐시 로드 완료: {len(self._tokens)}개 ({self.path})")
+        return self._tokens
+
+    def __len__(self):
+        return len(self._load())
+
+    def get(self, text):
+        return self._load().get(_text_hash(text))
+
+    def update(self, texts, tokenizer):
+        """
+        캐시에 없는 텍스트만 분석하여 파일에 추가 (인덱싱 시점에 호출)
+        """
+        tokens = self._load()
+        new_records = {}
+        for text in texts:
+            key = _text_hash(text)
+            if key not in tokens and key not in new_records:
+                new_records[key] = tokenizer(text)
+
+        if not new_records:
+            return 0
+
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                for key, text_tokens in new_records.items():
+                    f.write(json.dumps({"h": key, "t": text_tokens}, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            tokens.update(new_records)
+
+        logger.info(f"토큰 캐시에 {len(new_records)}개 텍스트 분석 결과 추가 ({self.path})")
+        return len(new_records)
+
+
+class CachedTokenizer:
+    """
+    문서 토큰은 영구 캐시에서, 쿼리처럼 캐시에 없는 텍스트는 메모리 LRU 캐시로 분석
+    """
+    def __init__(self, tokenizer, cache=None, query_cache_size=1024):
+        self.tokenizer = tokenizer
+        self.cache = cache
+        self.name = tokenizer.name
+        self._analyze = lru_cache(maxsize=query_cache_size)(lambda text: tuple(tokenizer(text)))
+
+    def __call__(self, text):
+        if self.cache is not None:
+            tokens = self.cache.get(text)
+            if tokens is not None:
+                return tokens
+        return list(self._analyze(text))
+
+
+def token_cache_path(cache_dir, tokenizer):
+    """토크나이저별 캐시 파일 경로"""
+    return Path(cache_dir) / f"tokens_{tokenizer.name}.jsonl"
+
+
+def build_bm25_retriever(documents, tokenizer, cache=None, k=5):
+    """
+    한국어 토크나이저로 BM25 검색기 생성 (캐시가 있으면 문서 분석 결과를 재사용)
+    """
+    from langchain_community.retrievers import BM25Retriever
+
+    documents = list(documents)
+    if cache is not None:
+        cache.update((doc.page_content for doc in documents), tokenizer)
+
+    retriever = BM25Retriever.from_documents(
+        documents,
+        preprocess_func=CachedTokenizer(tokenizer, cache)
+    )
+    retriever.k = k
+    return retriever
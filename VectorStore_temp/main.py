@@ -1,8 +1,11 @@
 # medical_vector_db.py
 import os
 import json
+import time
 import random
+import hashlib
 import logging
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
 from pathlib import Path
 from tqdm import tqdm
@@ -13,17 +16,75 @@ import numpy as np
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# 시드를 지정한 생성에서 사용하는 고정 기준일 (같은 시드면 언제 실행해도 같은 날짜가 나오도록)
+FIXED_REFERENCE_DATE = datetime(2025, 5, 1)
+
+# 진료과별 환자 ID 접두사 (진료과마다 달라야 ID가 전역적으로 유일함)
+DEPARTMENT_CODES = {
+    "internal_medicine": "I",
+    "surgery": "S",
+    "cardiology": "C",
+    "neurology": "N",
+    "emergency": "E",
+}
+
+
+def make_patient_id(department, number):
+    """
+    진료과 접두사 + 일련번호로 환자 ID 생성 (예: I00001, 10만 번째부터는 I100000)
+    """
+    code = DEPARTMENT_CODES.get(department, department[:3].upper())
+    return f"{code}{number:05d}"
+
+
+def block_seed(base_seed, department, block_index):
+    """(기본 시드, 진료과, 블록 번호)로부터 블록 난수 시드 유도 - 작업자 수와 무관하게 동일"""
+    digest = hashlib.sha256(f"{base_seed}:{department}:{block_index}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big")
+
+
+# 프로세스 풀 작업자가 사용하는 생성기 (작업자당 한 번 전달받아 재사용)
+_worker_generator = None
+
+
+def _init_generator_worker(generator):
+    global _worker_generator
+    _worker_generator = generator
+
+
+def _generate_block_in_worker(task):
+    return _worker_generator.generate_block(*task)
+
+
 class MedicalDataGenerator:
     """
     의료 데이터 생성기 - 벡터 DB 구축을 위한 풍부한 의료 데이터 생성
     """
-    def __init__(self, output_dir="./medical_data"):
+    def __init__(self, output_dir="./medical_data", seed=None, reference_date=None):
         """
         초기화 함수
+        
+        Args:
+            seed: 난수 시드 (지정하면 같은 시드로 항상 같은 데이터 생성)
+            reference_date: 모든 날짜 계산의 기준일 (기본: 시드가 있으면 FIXED_REFERENCE_DATE, 없으면 오늘)
         """
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(parents=True, exist_ok=True)
         
+        # 전역 random 대신 인스턴스별 난수 생성기 사용 (블록 단위 병렬 생성 시 블록마다 재설정)
+        self.seed = seed
+        self.rng = random.Random(seed)
+        # 검사 값/활력징후처럼 환자 블록 단위로 한꺼번에 뽑는 값은 NumPy 생성기 사용
+        self.np_rng = np.random.default_rng(seed)
+        
+        # 날짜 기준일 - 시드가 같으면 실행 날짜와 무관하게 같은 결과가 나오도록 고정
+        if reference_date is None:
+            reference_date = FIXED_REFERENCE_DATE if seed is not None else datetime.now()
+        self.reference_date = datetime(reference_date.year, reference_date.month, reference_date.day)
+        
+        # 진료과별 다음 환자 일련번호 (ID 중복 방지)
+        self._next_patient_number = {}
+        
         # 환자 수 설정
         self.patient_counts = {
             "internal_medicine": 50,  # 내과 환자
@@ -46,8 +107,8 @@ class MedicalDataGenerator:
         self._build_medical_dictionary()
         
         # 최근 날짜 범위 설정 (최근 1년)
-        self.date_range_start = datetime.now() - timedelta(days=365)
-        self.date_range_end = datetime.now()
+        self.date_range_start = self.reference_date - timedelta(days=365)
+        self.date_range_end = self.reference_date
 
     def _build_medical_dictionary(self):
         """
@@ -316,83 +377,101 @@ class MedicalDataGenerator:
                 {"name": "배응급", "specialty": "응급의학과", "id": "D402", "years_experience": 6},
             ],
         }
+        
+        # 검사 유형별 검사 항목
+        self.lab_panels = {
+            "기본 혈액검사": ["혈색소", "백혈구", "혈소판", "AST", "ALT", "BUN", "크레아티닌"],
+            "심장 효소 검사": ["CK-MB", "트로포닌 I", "BNP", "NT-proBNP"],
+            "지질 프로필": ["총 콜레스테롤", "LDL 콜레스테롤", "HDL 콜레스테롤", "중성지방"],
+            "당뇨 검사": ["공복혈당", "당화혈색소", "인슐린"],
+            "간 기능 검사": ["AST", "ALT", "총 빌리루빈", "직접 빌리루빈", "ALP", "GGT"],
+            "신장 기능 검사": ["BUN", "크레아티닌", "나트륨", "칼륨"],
+            "소변 검사": ["단백뇨", "적혈구뇨", "백혈구뇨", "케톤체"],
+            "갑상선 검사": ["TSH", "Free T4", "T3"],
+        }
+        
+        # 정상 범위 문자열을 한 번만 파싱한 검사 기준표 (항목 x 성별 배열)
+        from vectorized_sampling import LabReferenceTable
+        
+        self.lab_reference = LabReferenceTable(self.lab_tests)
 
     def generate_patient(self, department, patient_id=None):
         """
         환자 기본 정보 생성
         """
         if patient_id is None:
-            dept_code = department[0].upper()
-            patient_id = f"{dept_code}{random.randint(10000, 99999)}"
+            number = self._next_patient_number.get(department, 1)
+            self._next_patient_number[department] = number + 1
+            patient_id = make_patient_id(department, number)
         
         age_range = self.age_ranges.get(department, (20, 80))
-        age = random.randint(age_range[0], age_range[1])
+        age = self.rng.randint(age_range[0], age_range[1])
         
-        gender = random.choice(["남", "여"])
+        gender = self.rng.choice(["남", "여"])
         
         # 생년월일 계산 (현재 연도에서 나이를 빼서)
-        current_year = datetime.now().year
+        current_year = self.reference_date.year
         birth_year = current_year - age
-        birth_month = random.randint(1, 12)
-        birth_day = random.randint(1, 28)  # 간단하게 28일로 제한
+        birth_month = self.rng.randint(1, 12)
+        birth_day = self.rng.randint(1, 28)  # 간단하게 28일로 제한
         
         # 주소 생성
         cities = ["서울", "부산", "인천", "대구", "대전", "광주", "울산", "세종", "수원", "안양", "성남", "고양", "용인", "천안", "청주", "전주", "포항"]
         districts = ["중구", "동구", "서구", "남구", "북구", "강남구", "강북구", "강동구", "강서구", "종로구", "중랑구", "노원구", "양천구", "마포구", "구로구"]
-        address = f"{random.choice(cities)} {random.choice(districts)} "
+        address = f"{self.rng.choice(cities)} {self.rng.choice(districts)} "
         
         # 연락처
-        phone = f"010-{random.randint(1000, 9999)}-{random.randint(1000, 9999)}"
+        phone = f"010-{self.rng.randint(1000, 9999)}-{self.rng.randint(1000, 9999)}"
         
         # 보험 정보
         insurance_types = ["국민건강보험", "의료급여", "자동차보험", "산재보험", "사보험"]
-        insurance = random.choice(insurance_types)
+        insurance = self.rng.choice(insurance_types)
         
         # 알레르기 정보
         allergies = []
-        if random.random() < 0.2:  # 20% 확률로 알레르기 있음
+        if self.rng.random() < 0.2:  # 20% 확률로 알레르기 있음
             possible_allergies = ["페니실린", "설파제", "아스피린", "요오드", "라텍스", "계란", "땅콩", "조개류", "밀가루", "우유"]
-            num_allergies = random.randint(1, 3)
-            allergies = random.sample(possible_allergies, num_allergies)
+            num_allergies = self.rng.randint(1, 3)
+            allergies = self.rng.sample(possible_allergies, num_allergies)
         
         # 흡연 상태
-        smoking_status = random.choice(["비흡연", "과거 흡연", "현재 흡연"])
+        smoking_status = self.rng.choice(["비흡연", "과거 흡연", "현재 흡연"])
         if smoking_status == "과거 흡연":
-            smoking_details = f"{random.randint(5, 30)}갑년, {random.randint(1, 10)}년 전 금연"
+            smoking_details = f"{self.rng.randint(5, 30)}갑년, {self.rng.randint(1, 10)}년 전 금연"
         elif smoking_status == "현재 흡연":
-            smoking_details = f"{random.randint(5, 30)}갑년, 하루 {random.randint(5, 40)}개비"
+            smoking_details = f"{self.rng.randint(5, 30)}갑년, 하루 {self.rng.randint(5, 40)}개비"
         else:
             smoking_details = ""
         
         # 음주 상태
-        alcohol_status = random.choice(["비음주", "사회적 음주", "과도한 음주"])
+        alcohol_status = self.rng.choice(["비음주", "사회적 음주", "과도한 음주"])
         if alcohol_status == "사회적 음주":
-            alcohol_details = f"주 {random.randint(1, 2)}회, 소주 {random.randint(1, 3)}잔"
+            alcohol_details = f"주 {self.rng.randint(1, 2)}회, 소주 {self.rng.randint(1, 3)}잔"
         elif alcohol_status == "과도한 음주":
-            alcohol_details = f"주 {random.randint(3, 7)}회, 소주 {random.randint(4, 10)}잔"
+            alcohol_details = f"주 {self.rng.randint(3, 7)}회, 소주 {self.rng.randint(4, 10)}잔"
         else:
             alcohol_details = ""
         
         # 체중 및 신장 (BMI 고려)
         if gender == "남":
-            height = random.randint(160, 185)
-            bmi = random.uniform(18.5, 30.0)
+            height = self.rng.randint(160, 185)
+            bmi = self.rng.uniform(18.5, 30.0)
         else:
-            height = random.randint(150, 175)
-            bmi = random.uniform(18.0, 29.0)
+            height = self.rng.randint(150, 175)
+            bmi = self.rng.uniform(18.0, 29.0)
         
         weight = round(bmi * (height/100) ** 2, 1)
         
         patient = {
             "id": patient_id,
-            "name": f"{'김' if gender=='남' else '이'}{random.choice('가나다라마바사아자차카타파하')}{'돌' if gender=='남' else '미'}",
+            "name": f"{'김' if gender=='남' else '이'}{self.rng.choice('가나다라마바사아자차카타파하')}{'돌' if gender=='남' else '미'}",
             "gender": gender,
             "birthdate": f"{birth_year}-{birth_month:02d}-{birth_day:02d}",
             "age": age,
             "address": address,
             "phone": phone,
             "insurance": insurance,
-            "blood_type": random.choice(["A+", "A-", "B+", "B-", "O+", "O-", "AB+", "AB-"]),
+            "blood_type": self.rng.choice(["A+", "A-", "B+", "B-", "O+", "O-", "AB+", "AB-"]),
             "height": height,
             "weight": weight,
             "bmi": round(bmi, 1),
@@ -401,9 +480,9 @@ class MedicalDataGenerator:
             "alcohol": {"status": alcohol_status, "details": alcohol_details},
             "department": department,
             "emergency_contact": {
-                "name": f"{'박' if gender=='남' else '최'}{random.choice('가나다라마바사아자차카타파하')}{'수' if gender=='남' else '영'}",
-                "relationship": random.choice(["배우자", "자녀", "부모", "형제자매"]),
-                "phone": f"010-{random.randint(1000, 9999)}-{random.randint(1000, 9999)}"
+                "name": f"{'박' if gender=='남' else '최'}{self.rng.choice('가나다라마바사아자차카타파하')}{'수' if gender=='남' else '영'}",
+                "relationship": self.rng.choice(["배우자", "자녀", "부모", "형제자매"]),
+                "phone": f"010-{self.rng.randint(1000, 9999)}-{self.rng.randint(1000, 9999)}"
             }
         }
         
@@ -415,7 +494,7 @@ class MedicalDataGenerator:
         """
         if count is None:
             # 0-3개의 진단
-            count = random.choices([0, 1, 2, 3], weights=[0.1, 0.5, 0.3, 0.1])[0]
+            count = self.rng.choices([0, 1, 2, 3], weights=[0.1, 0.5, 0.3, 0.1])[0]
         
         diagnoses = []
         department = patient["department"]
@@ -429,34 +508,34 @@ class MedicalDataGenerator:
         if not disease_list:
             return diagnoses
         
-        selected_diseases = random.sample(disease_list, min(count, len(disease_list)))
+        selected_diseases = self.rng.sample(disease_list, min(count, len(disease_list)))
         
         for disease in selected_diseases:
             # 진단일은 과거 날짜 (최대 3년 전까지)
-            days_ago = random.randint(1, 1095)  # 최대 3년(1095일) 전
-            diagnosis_date = (datetime.now() - timedelta(days=days_ago)).strftime("%Y-%m-%d")
+            days_ago = self.rng.randint(1, 1095)  # 최대 3년(1095일) 전
+            diagnosis_date = (self.reference_date - timedelta(days=days_ago)).strftime("%Y-%m-%d")
             
-            doctor = random.choice(self.doctors.get(department, self.doctors["internal_medicine"]))
+            doctor = self.rng.choice(self.doctors.get(department, self.doctors["internal_medicine"]))
             
             # 진단 신뢰도 및 상태
-            confidence = random.choice(["확정", "의증", "추정", "배제 필요"])
+            confidence = self.rng.choice(["확정", "의증", "추정", "배제 필요"])
             if confidence == "확정":
-                status = random.choice(["활성", "관해", "완치"])
+                status = self.rng.choice(["활성", "관해", "완치"])
             else:
                 status = "평가 중"
             
             # 진단 메모
             severity_levels = ["경증", "중등도", "중증"]
-            severity = random.choice(severity_levels)
+            severity = self.rng.choice(severity_levels)
             
             # 진단 메모 생성
             memo_options = [
                 f"{severity} 수준의 {disease['name']}. 추가 검사 필요.",
                 f"{disease['name']}으로 진단. {severity} 단계. 약물 치료 시작.",
-                f"{disease['name']} {confidence}. {random.choice(disease['symptoms'])} 증상 있음.",
+                f"{disease['name']} {confidence}. {self.rng.choice(disease['symptoms'])} 증상 있음.",
                 f"{disease['name']} {status}. 정기적인 모니터링 필요.",
             ]
-            memo = random.choice(memo_options)
+            memo = self.rng.choice(memo_options)
             
             diagnoses.append({
                 "name": disease["name"],
@@ -468,7 +547,7 @@ class MedicalDataGenerator:
                 "status": status,
                 "severity": severity,
                 "memo": memo,
-                "symptoms": random.sample(disease["symptoms"], min(len(disease["symptoms"]), random.randint(1, 3)))
+                "symptoms": self.rng.sample(disease["symptoms"], min(len(disease["symptoms"]), self.rng.randint(1, 3)))
             })
         
         return diagnoses
@@ -496,7 +575,7 @@ class MedicalDataGenerator:
                 continue
             
             # 1-3개의 약물 선택
-            selected_meds = random.sample(suitable_meds, min(random.randint(1, 3), len(suitable_meds)))
+            selected_meds = self.rng.sample(suitable_meds, min(self.rng.randint(1, 3), len(suitable_meds)))
             
             for med_name in selected_meds:
                 if med_name not in self.medications:
@@ -506,15 +585,15 @@ class MedicalDataGenerator:
                 
                 # 처방일은 진단일과 같거나 이후
                 diagnosis_date = datetime.strptime(diagnosis["date"], "%Y-%m-%d")
-                days_after = random.randint(0, 30)
+                days_after = self.rng.randint(0, 30)
                 prescription_date = (diagnosis_date + timedelta(days=days_after)).strftime("%Y-%m-%d")
                 
                 # 처방 기간
-                duration = random.choice([7, 14, 28, 30, 60, 90])
+                duration = self.rng.choice([7, 14, 28, 30, 60, 90])
                 
                 # 복용법
-                dosage = random.choice(med_info["dosage"])
-                frequency = random.choice(med_info["frequency"])
+                dosage = self.rng.choice(med_info["dosage"])
+                frequency = self.rng.choice(med_info["frequency"])
                 
                 medications.append({
                     "medication": med_name,
@@ -523,12 +602,12 @@ class MedicalDataGenerator:
                     "duration_days": duration,
                     "dosage": dosage,
                     "frequency": frequency,
-                    "refill": random.randint(0, 3),
+                    "refill": self.rng.randint(0, 3),
                     "purpose": med_info["purpose"],
                     "doctor": diagnosis["doctor"],
                     "doctor_id": diagnosis["doctor_id"],
                     "related_diagnosis": disease,
-                    "special_instructions": random.choice([
+                    "special_instructions": self.rng.choice([
                         "식후 복용", "식전 복용", "취침 전 복용", 
                         "필요시 복용", "증상 있을 때만 복용", ""
                     ])
@@ -536,162 +615,168 @@ class MedicalDataGenerator:
         
         return medications
 
-    def generate_lab_results(self, patient):
+    def _lab_test_types(self, patient):
         """
-        검사 결과 생성
+        환자의 검사 유형 후보 (진단이 있는 경우, 해당 진단과 관련된 검사를 더 높은 확률로 포함)
+        """
+        diagnosis_names = [d["name"] for d in patient.get("diagnoses", [])]
+        if any(name in ["고혈압", "심부전", "관상동맥질환"] for name in diagnosis_names):
+            return ["기본 혈액검사", "심장 효소 검사", "지질 프로필"]
+        elif any(name in ["당뇨병", "고지혈증"] for name in diagnosis_names):
+            return ["기본 혈액검사", "당뇨 검사", "지질 프로필"]
+        elif any(name in ["간경변", "간염"] for name in diagnosis_names):
+            return ["기본 혈액검사", "간 기능 검사"]
+        elif any(name in ["신부전", "신장병"] for name in diagnosis_names):
+            return ["기본 혈액검사", "신장 기능 검사", "소변 검사"]
+        return ["기본 혈액검사"]
+    
+    @staticmethod
+    def _lab_abnormal_prob(diagnosis_names, item):
         """
-        # 환자당 0-5회의 검사 결과
-        num_tests = random.randint(0, 5)
-        lab_results = []
+        환자의 진단에 따른 검사 항목별 비정상 결과 확률 (기본 20%, 마지막으로 일치한 진단 기준)
+        """
+        abnormal_prob = 0.2
+        for name in diagnosis_names:
+            if name == "당뇨병" and item in ["공복혈당", "당화혈색소"]:
+                abnormal_prob = 0.9
+            elif name == "고혈압" and item in ["BUN", "크레아티닌"]:
+                abnormal_prob = 0.6
+            elif name == "고지혈증" and item in ["총 콜레스테롤", "LDL 콜레스테롤", "중성지방"]:
+                abnormal_prob = 0.8
+            elif name == "간경변" and item in ["AST", "ALT", "총 빌리루빈"]:
+                abnormal_prob = 0.85
+            elif name == "신부전" and item in ["BUN", "크레아티닌"]:
+                abnormal_prob = 0.95
+        return abnormal_prob
+    
+    def _generate_lab_results_batch(self, patients):
+        """
+        여러 환자의 검사 결과 생성
         
-        # 각 검사 기록마다
-        for _ in range(num_tests):
-            # 검사일은 과거 날짜
-            days_ago = random.randint(1, 365)  # 최대 1년 전
-            test_date = (datetime.now() - timedelta(days=days_ago)).strftime("%Y-%m-%d")
-            
-            # 검사 유형 선택 (일반 검사 vs. 특화된 검사)
-            if "diagnoses" in patient and patient["diagnoses"]:
-                # 진단이 있는 경우, 해당 진단과 관련된 검사를 더 높은 확률로 포함
-                diagnosis_names = [d["name"] for d in patient["diagnoses"]]
-                
-                if any(name in ["고혈압", "심부전", "관상동맥질환"] for name in diagnosis_names):
-                    test_types = ["기본 혈액검사", "심장 효소 검사", "지질 프로필"]
-                elif any(name in ["당뇨병", "고지혈증"] for name in diagnosis_names):
-                    test_types = ["기본 혈액검사", "당뇨 검사", "지질 프로필"]
-                elif any(name in ["간경변", "간염"] for name in diagnosis_names):
-                    test_types = ["기본 혈액검사", "간 기능 검사"]
-                elif any(name in ["신부전", "신장병"] for name in diagnosis_names):
-                    test_types = ["기본 혈액검사", "신장 기능 검사", "소변 검사"]
-                else:
-                    test_types = ["기본 혈액검사"]
-            else:
-                test_types = ["기본 혈액검사"]
-            
-            test_type = random.choice(test_types)
-            
-            # 검사 항목 선택
-            if test_type == "기본 혈액검사":
-                test_items = ["혈색소", "백혈구", "혈소판", "AST", "ALT", "BUN", "크레아티닌"]
-            elif test_type == "심장 효소 검사":
-                test_items = ["CK-MB", "트로포닌 I", "BNP", "NT-proBNP"]
-            elif test_type == "지질 프로필":
-                test_items = ["총 콜레스테롤", "LDL 콜레스테롤", "HDL 콜레스테롤", "중성지방"]
-            elif test_type == "당뇨 검사":
-                test_items = ["공복혈당", "당화혈색소", "인슐린"]
-            elif test_type == "간 기능 검사":
-                test_items = ["AST", "ALT", "총 빌리루빈", "직접 빌리루빈", "ALP", "GGT"]
-            elif test_type == "신장 기능 검사":
-                test_items = ["BUN", "크레아티닌", "나트륨", "칼륨"]
-            elif test_type == "소변 검사":
-                test_items = ["단백뇨", "적혈구뇨", "백혈구뇨", "케톤체"]
-            elif test_type == "갑상선 검사":
-                test_items = ["TSH", "Free T4", "T3"]
-            else:
-                test_items = ["혈색소", "백혈구", "혈소판"]
-            
-            # 검사 결과 값 생성
-            results = {}
-            abnormal_count = 0  # 비정상 결과 개수
-            
-            for item in test_items:
-                if item not in self.lab_tests:
-                    continue
-                
-                test_info = self.lab_tests[item]
-                gender = patient["gender"]
-                
-                # 정상 범위 파싱
-                normal_range = test_info["normal_range"].get(gender, "0-0")
-                try:
-                    if "-" in normal_range:
-                        normal_min, normal_max = map(float, normal_range.split("-"))
-                    elif "<" in normal_range:
-                        normal_min, normal_max = 0, float(normal_range.replace("<", ""))
-                    else:
-                        normal_min, normal_max = 0, 0
-                except:
-                    normal_min, normal_max = 0, 0
-                
-                # 환자의 진단에 따라 비정상 결과 확률 조정
-                abnormal_prob = 0.2  # 기본 20% 확률
-                
-                if "diagnoses" in patient:
-                    for diagnosis in patient["diagnoses"]:
-                        # 관련 질환에 따라 특정 검사 이상 확률 증가
-                        if diagnosis["name"] == "당뇨병" and item in ["공복혈당", "당화혈색소"]:
-                            abnormal_prob = 0.9
-                        elif diagnosis["name"] == "고혈압" and item in ["BUN", "크레아티닌"]:
-                            abnormal_prob = 0.6
-                        elif diagnosis["name"] == "고지혈증" and item in ["총 콜레스테롤", "LDL 콜레스테롤", "중성지방"]:
-                            abnormal_prob = 0.8
-                        elif diagnosis["name"] == "간경변" and item in ["AST", "ALT", "총 빌리루빈"]:
-                            abnormal_prob = 0.85
-                        elif diagnosis["name"] == "신부전" and item in ["BUN", "크레아티닌"]:
-                            abnormal_prob = 0.95
+        검사 횟수, 검사일, 검사 유형, 의사, 채취/보고 시각과 모든 검사 항목 값을
+        블록 전체에 대해 NumPy로 한 번에 샘플링한 뒤 레코드만 조립한다.
+        """
+        from vectorized_sampling import gender_index, sample_lab_values
+        
+        table = self.lab_reference
+        rng = self.np_rng
+        minutes = ['00', '15', '30', '45']
+        
+        # 환자당 0-5회의 검사, 검사별 부가 정보
+        num_tests = rng.integers(0, 6, len(patients)).tolist()
+        total_tests = sum(num_tests)
+        days_ago = rng.integers(1, 366, total_tests).tolist()  # 최대 1년 전
+        type_draws = rng.random(total_tests).tolist()
+        doctor_draws = rng.random(total_tests).tolist()
+        collection_hours = rng.integers(8, 18, total_tests).tolist()
+        collection_minutes = rng.integers(0, 4, total_tests).tolist()
+        report_hours = rng.integers(9, 19, total_tests).tolist()
+        report_minutes = rng.integers(0, 4, total_tests).tolist()
+        date_strings = {}
+        
+        # 1단계: 검사 계획 (항목 행 번호, 성별 열, 비정상 확률)
+        plans = []
+        item_idx, gender_idx, abnormal_probs = [], [], []
+        test_pos = 0
+        for patient, count in zip(patients, num_tests):
+            column = gender_index(patient["gender"])
+            test_types = self._lab_test_types(patient)
+            diagnosis_names = [d["name"] for d in patient.get("diagnoses", [])]
+            probs_by_type = {}
+            patient_plans = []
+            
+            for _ in range(count):
+                test_type = test_types[int(type_draws[test_pos] * len(test_types))]
+                test_items = [
+                    item for item in self.lab_panels.get(test_type, ["혈색소", "백혈구", "혈소판"])
+                    if item in table.index
+                ]
+                if test_type not in probs_by_type:
+                    probs_by_type[test_type] = [self._lab_abnormal_prob(diagnosis_names, item) for item in test_items]
                 
-                # 값 생성
-                is_abnormal = random.random() < abnormal_prob
+                item_idx.extend(table.index[item] for item in test_items)
+                gender_idx.extend([column] * len(test_items))
+                abnormal_probs.extend(probs_by_type[test_type])
+                patient_plans.append((test_pos, test_type, test_items))
+                test_pos += 1
+            plans.append((column, patient_plans))
+        
+        # 2단계: 전체 항목 값 일괄 샘플링
+        values, flags, is_abnormal = sample_lab_values(
+            table, item_idx, np.asarray(gender_idx, dtype=np.int64), abnormal_probs, rng
+        )
+        values, flags, is_abnormal = values.tolist(), flags.tolist(), is_abnormal.tolist()
+        
+        # 3단계: 레코드 조립
+        all_lab_results = []
+        offset = 0
+        for patient, (column, patient_plans) in zip(patients, plans):
+            doctors = self.doctors.get(patient["department"], self.doctors["internal_medicine"])
+            lab_results = []
+            
+            for test_index, (pos, test_type, test_items) in enumerate(patient_plans):
+                results = {}
+                abnormal_count = 0  # 비정상 결과 개수
+                for item in test_items:
+                    row = table.index[item]
+                    results[item] = {
+                        "value": values[offset],
+                        "unit": table.units[row],
+                        "normal_range": table.range_text[row][column],
+                        "flag": flags[offset]
+                    }
+                    abnormal_count += is_abnormal[offset]
+                    offset += 1
                 
-                if is_abnormal:
-                    abnormal_count += 1
-                    # 높은 값 또는 낮은 값 선택
-                    if random.random() < 0.7:  # 70%는 높은 값
-                        value = round(normal_max * random.uniform(1.1, 2.0), 2)
-                    else:  # 30%는 낮은 값
-                        value = round(normal_min * random.uniform(0.5, 0.9), 2)
-                    
-                    flag = "H" if value > normal_max else "L"
+                # 메모 생성
+                if abnormal_count == 0:
+                    interpretation = "모든 검사 결과가 정상 범위 내에 있습니다."
+                elif abnormal_count == 1:
+                    interpretation = "한 항목에서 비정상 결과가 관찰됩니다. 추적 관찰이 필요할 수 있습니다."
                 else:
-                    # 정상 범위 내 값
-                    value = round(random.uniform(normal_min, normal_max), 2)
-                    flag = ""
+                    interpretation = f"{abnormal_count}개 항목에서 비정상 결과가 관찰됩니다. 추가 검사 및 평가가 필요합니다."
                 
-                results[item] = {
-                    "value": value,
-                    "unit": test_info["unit"],
-                    "normal_range": normal_range,
-                    "flag": flag
-                }
-            
-            # 의사 및 랩 정보
-            doctor = random.choice(self.doctors.get(patient["department"], self.doctors["internal_medicine"]))
-            
-            # 메모 생성
-            if abnormal_count == 0:
-                interpretation = "모든 검사 결과가 정상 범위 내에 있습니다."
-            elif abnormal_count == 1:
-                interpretation = "한 항목에서 비정상 결과가 관찰됩니다. 추적 관찰이 필요할 수 있습니다."
-            else:
-                interpretation = f"{abnormal_count}개 항목에서 비정상 결과가 관찰됩니다. 추가 검사 및 평가가 필요합니다."
+                if days_ago[pos] not in date_strings:
+                    date_strings[days_ago[pos]] = (
+                        self.reference_date - timedelta(days=days_ago[pos])
+                    ).strftime("%Y-%m-%d")
+                doctor = doctors[int(doctor_draws[pos] * len(doctors))]
+                
+                lab_results.append({
+                    "date": date_strings[days_ago[pos]],
+                    "test_type": test_type,
+                    "ordering_doctor": doctor["name"],
+                    "ordering_doctor_id": doctor["id"],
+                    "lab_id": f"L{test_index + 1}-{patient['id']}",
+                    "results": results,
+                    "interpretation": interpretation,
+                    "collection_time": f"{collection_hours[pos]}:{minutes[collection_minutes[pos]]}",
+                    "report_time": f"{report_hours[pos]}:{minutes[report_minutes[pos]]}"
+                })
             
-            lab_results.append({
-                "date": test_date,
-                "test_type": test_type,
-                "ordering_doctor": doctor["name"],
-                "ordering_doctor_id": doctor["id"],
-                "lab_id": f"L{random.randint(10000, 99999)}",
-                "results": results,
-                "interpretation": interpretation,
-                "collection_time": f"{random.randint(8, 17)}:{random.choice(['00', '15', '30', '45'])}",
-                "report_time": f"{random.randint(9, 18)}:{random.choice(['00', '15', '30', '45'])}"
-            })
+            all_lab_results.append(lab_results)
         
-        return lab_results
+        return all_lab_results
+    
+    def generate_lab_results(self, patient):
+        """
+        검사 결과 생성
+        """
+        return self._generate_lab_results_batch([patient])[0]
 
     def generate_imaging_studies(self, patient):
         """
         영상 검사 생성
         """
         # 환자당 0-3회의 영상 검사
-        num_studies = random.randint(0, 3)
+        num_studies = self.rng.randint(0, 3)
         imaging_studies = []
         
         # 각 영상 검사마다
-        for _ in range(num_studies):
+        for study_index in range(num_studies):
             # 검사일은 과거 날짜
-            days_ago = random.randint(1, 365)  # 최대 1년 전
-            study_date = (datetime.now() - timedelta(days=days_ago)).strftime("%Y-%m-%d")
+            days_ago = self.rng.randint(1, 365)  # 최대 1년 전
+            study_date = (self.reference_date - timedelta(days=days_ago)).strftime("%Y-%m-%d")
             
             # 검사 유형 선택 (환자 상태에 따라)
             # medical_vector_db.py (계속)
@@ -712,14 +797,15 @@ class MedicalDataGenerator:
             else:
                 study_types = list(self.imaging_tests.keys())
             
-            study_type = random.choice(study_types)
+            study_type = self.rng.choice(study_types)
             
             # 의사 정보
-            doctor = random.choice(self.doctors.get(patient["department"], self.doctors["internal_medicine"]))
+            doctor = self.rng.choice(self.doctors.get(patient["department"], self.doctors["internal_medicine"]))
             
             # 소견 생성
             if study_type in self.imaging_tests:
-                possible_findings = self.imaging_tests[study_type]["common_findings"]
+                # 사전의 소견 목록을 복사해서 사용 (진단별 소견 추가가 다른 환자에게 누적되지 않도록)
+                possible_findings = list(self.imaging_tests[study_type]["common_findings"])
                 
                 # 진단에 따른 소견 추가
                 if "diagnoses" in patient:
@@ -732,9 +818,9 @@ class MedicalDataGenerator:
                             possible_findings.extend(["뇌경색", "뇌출혈"])
                 
                 # 0-3개의 소견 선택
-                num_findings = random.randint(0, 3)
+                num_findings = self.rng.randint(0, 3)
                 if num_findings > 0:
-                    findings = random.sample(possible_findings, min(num_findings, len(possible_findings)))
+                    findings = self.rng.sample(possible_findings, min(num_findings, len(possible_findings)))
                     finding_text = ", ".join(findings)
                     impression = f"{finding_text}가 관찰됩니다."
                 else:
@@ -749,11 +835,11 @@ class MedicalDataGenerator:
                 "study_type": study_type,
                 "ordering_doctor": doctor["name"],
                 "ordering_doctor_id": doctor["id"],
-                "radiologist": random.choice(["김영상", "박영상", "이영상"]),
-                "study_id": f"I{random.randint(10000, 99999)}",
+                "radiologist": self.rng.choice(["김영상", "박영상", "이영상"]),
+                "study_id": f"I{study_index + 1}-{patient['id']}",
                 "findings": finding_text,
                 "impression": impression,
-                "recommendation": random.choice([
+                "recommendation": self.rng.choice([
                     "추가 검사 필요 없음",
                     "3개월 후 추적 검사 권장",
                     "6개월 후 추적 검사 권장",
@@ -770,14 +856,14 @@ class MedicalDataGenerator:
         시술 및 수술 정보 생성
         """
         # 환자당 0-2회의 시술
-        num_procedures = random.randint(0, 2)
+        num_procedures = self.rng.randint(0, 2)
         procedures_list = []
         
         # 각 시술마다
-        for _ in range(num_procedures):
+        for procedure_index in range(num_procedures):
             # 시술일은 과거 날짜
-            days_ago = random.randint(1, 365)  # 최대 1년 전
-            procedure_date = (datetime.now() - timedelta(days=days_ago)).strftime("%Y-%m-%d")
+            days_ago = self.rng.randint(1, 365)  # 최대 1년 전
+            procedure_date = (self.reference_date - timedelta(days=days_ago)).strftime("%Y-%m-%d")
             
             # 시술 유형 선택 (환자 상태에 따라)
             if "diagnoses" in patient and patient["diagnoses"]:
@@ -790,28 +876,28 @@ class MedicalDataGenerator:
                             suitable_procedures.append(proc_name)
                 
                 if suitable_procedures:
-                    procedure_name = random.choice(suitable_procedures)
+                    procedure_name = self.rng.choice(suitable_procedures)
                 else:
-                    procedure_name = random.choice(list(self.procedures.keys()))
+                    procedure_name = self.rng.choice(list(self.procedures.keys()))
             else:
-                procedure_name = random.choice(list(self.procedures.keys()))
+                procedure_name = self.rng.choice(list(self.procedures.keys()))
             
             # 시술 정보
             procedure_info = self.procedures.get(procedure_name, {})
             
             # 의사 정보
-            doctor = random.choice(self.doctors.get("surgery", self.doctors["internal_medicine"]))
+            doctor = self.rng.choice(self.doctors.get("surgery", self.doctors["internal_medicine"]))
             
             # 시술 결과 및 합병증
-            outcome = random.choice(["성공", "부분적 성공", "실패"])
+            outcome = self.rng.choice(["성공", "부분적 성공", "실패"])
             
             complications = []
-            if random.random() < 0.2:  # 20% 확률로 합병증 발생
+            if self.rng.random() < 0.2:  # 20% 확률로 합병증 발생
                 potential_complications = procedure_info.get("complications", [])
                 if potential_complications:
-                    complications = random.sample(
+                    complications = self.rng.sample(
                         potential_complications, 
-                        min(random.randint(1, len(potential_complications)), len(potential_complications))
+                        min(self.rng.randint(1, len(potential_complications)), len(potential_complications))
                     )
             
             procedures_list.append({
@@ -820,13 +906,13 @@ class MedicalDataGenerator:
                 "description": procedure_info.get("description", ""),
                 "performing_doctor": doctor["name"],
                 "performing_doctor_id": doctor["id"],
-                "procedure_id": f"P{random.randint(10000, 99999)}",
-                "location": random.choice(["수술실", "시술실", "내시경실", "중재시술실"]),
-                "anesthesia": random.choice(["국소", "부분", "전신", "없음"]),
-                "duration_minutes": random.randint(15, 240),
+                "procedure_id": f"P{procedure_index + 1}-{patient['id']}",
+                "location": self.rng.choice(["수술실", "시술실", "내시경실", "중재시술실"]),
+                "anesthesia": self.rng.choice(["국소", "부분", "전신", "없음"]),
+                "duration_minutes": self.rng.randint(15, 240),
                 "outcome": outcome,
                 "complications": complications,
-                "follow_up": random.choice([
+                "follow_up": self.rng.choice([
                     "1주 후 외래 방문",
                     "2주 후 외래 방문",
                     "1개월 후 외래 방문",
@@ -837,15 +923,14 @@ class MedicalDataGenerator:
         
         return procedures_list
 
-    def generate_visits(self, patient, min_visits=1, max_visits=10):
+    def _plan_visit_dates(self, patient, min_visits=1, max_visits=10):
         """
-        진료 기록 생성
+        방문 날짜 목록 결정
         """
-        num_visits = random.randint(min_visits, max_visits)
-        visits = []
+        num_visits = self.rng.randint(min_visits, max_visits)
         
         # 첫 방문은 가장 오래된 진단일보다 이전
-        first_diagnosis_date = datetime.now()
+        first_diagnosis_date = self.reference_date
         if "diagnoses" in patient and patient["diagnoses"]:
             for diagnosis in patient["diagnoses"]:
                 diag_date = datetime.strptime(diagnosis["date"], "%Y-%m-%d")
@@ -853,19 +938,50 @@ class MedicalDataGenerator:
                     first_diagnosis_date = diag_date
         
         # 첫 방문일은 첫 진단일보다 0-30일 이전
-        first_visit_date = first_diagnosis_date - timedelta(days=random.randint(0, 30))
+        first_visit_date = first_diagnosis_date - timedelta(days=self.rng.randint(0, 30))
         
         # 방문 날짜 리스트 생성
         visit_dates = [first_visit_date]
         current_date = first_visit_date
         
         for _ in range(num_visits - 1):
-            days_to_add = random.randint(14, 120)  # 2주에서 4개월 사이 간격
+            days_to_add = self.rng.randint(14, 120)  # 2주에서 4개월 사이 간격
             current_date = current_date + timedelta(days=days_to_add)
-            if current_date > datetime.now():
+            if current_date > self.reference_date:
                 break
             visit_dates.append(current_date)
         
+        return visit_dates
+    
+    def _generate_visits_batch(self, patients, min_visits=1, max_visits=10):
+        """
+        여러 환자의 진료 기록 생성 - 전체 방문의 활력징후를 NumPy로 한 번에 샘플링
+        """
+        visit_dates = [self._plan_visit_dates(patient, min_visits, max_visits) for patient in patients]
+        
+        vitals = self._generate_vitals_batch(
+            [patient for patient, dates in zip(patients, visit_dates) for _ in dates]
+        )
+        
+        all_visits = []
+        offset = 0
+        for patient, dates in zip(patients, visit_dates):
+            all_visits.append(self._build_visits(patient, dates, vitals[offset:offset + len(dates)]))
+            offset += len(dates)
+        return all_visits
+    
+    def generate_visits(self, patient, min_visits=1, max_visits=10):
+        """
+        진료 기록 생성
+        """
+        return self._generate_visits_batch([patient], min_visits, max_visits)[0]
+    
+    def _build_visits(self, patient, visit_dates, vitals_list):
+        """
+        방문별 상세 정보 구성 (활력징후는 미리 샘플링된 값 사용)
+        """
+        visits = []
+        
         # 의사 선택 (진단에 있는 의사 우선, 없으면 무작위)
         doctors_from_diagnoses = set()
         if "diagnoses" in patient and patient["diagnoses"]:
@@ -873,25 +989,23 @@ class MedicalDataGenerator:
                 doctors_from_diagnoses.add((diagnosis["doctor"], diagnosis["doctor_id"]))
         
         # 각 방문에 대한 상세 정보 생성
-        for i, visit_date in enumerate(visit_dates):
+        for i, (visit_date, vitals) in enumerate(zip(visit_dates, vitals_list)):
             # 의사 선택 (이전 방문 의사 유지 확률 높임)
-            if i > 0 and random.random() < 0.7:  # 70% 확률로 이전 의사와 동일
+            if i > 0 and self.rng.random() < 0.7:  # 70% 확률로 이전 의사와 동일
                 doctor_name = visits[i-1]["doctor"]
                 doctor_id = visits[i-1]["doctor_id"]
-            elif doctors_from_diagnoses and random.random() < 0.8:  # 80% 확률로 진단 의사 중 하나
-                doctor_name, doctor_id = random.choice(list(doctors_from_diagnoses))
+            elif doctors_from_diagnoses and self.rng.random() < 0.8:  # 80% 확률로 진단 의사 중 하나
+                # 집합 순회 순서는 해시 시드에 따라 달라지므로 정렬 후 선택
+                doctor_name, doctor_id = self.rng.choice(sorted(doctors_from_diagnoses))
             else:
-                doctor = random.choice(self.doctors.get(patient["department"], self.doctors["internal_medicine"]))
+                doctor = self.rng.choice(self.doctors.get(patient["department"], self.doctors["internal_medicine"]))
                 doctor_name = doctor["name"]
                 doctor_id = doctor["id"]
             
-            # 활력징후
-            vitals = self.generate_vitals(patient)
-            
             # 방문 유형 및 이유
             if i == 0:
                 visit_type = "초진"
-                chief_complaint = random.choice([
+                chief_complaint = self.rng.choice([
                     "건강 검진", "두통", "복통", "어지러움", "기침", "발열", "무기력", 
                     "소화불량", "가슴 통증", "호흡곤란", "관절통", "혈뇨", "체중감소"
                 ])
@@ -900,31 +1014,31 @@ class MedicalDataGenerator:
                 
                 # 이전 진단에 따른 주요 증상
                 if "diagnoses" in patient and patient["diagnoses"]:
-                    diagnosis = random.choice(patient["diagnoses"])
+                    diagnosis = self.rng.choice(patient["diagnoses"])
                     disease = diagnosis["name"]
                     
                     if disease == "고혈압":
-                        chief_complaint = random.choice([
+                        chief_complaint = self.rng.choice([
                             "혈압 조절 확인", "두통", "어지러움", "약물 부작용 상담"
                         ])
                     elif disease == "당뇨병":
-                        chief_complaint = random.choice([
+                        chief_complaint = self.rng.choice([
                             "혈당 조절 확인", "다뇨", "다갈", "약물 부작용 상담", "발 저림"
                         ])
                     elif disease == "관상동맥질환":
-                        chief_complaint = random.choice([
+                        chief_complaint = self.rng.choice([
                             "가슴 통증", "호흡곤란", "약물 조절", "추적 관찰"
                         ])
                     elif disease in self.diagnosis_dict.get("surgery", []):
-                        chief_complaint = random.choice([
+                        chief_complaint = self.rng.choice([
                             "수술 후 상태 확인", "통증 재평가", "상처 치유 확인", "추적 관찰"
                         ])
                     else:
-                        chief_complaint = random.choice([
+                        chief_complaint = self.rng.choice([
                             "상태 확인", "약물 조절", "증상 재평가", "추적 관찰"
                         ])
                 else:
-                    chief_complaint = random.choice([
+                    chief_complaint = self.rng.choice([
                         "정기 검진", "상태 확인", "약물 조절", "증상 재평가"
                     ])
             
@@ -937,7 +1051,7 @@ class MedicalDataGenerator:
             visits.append({
                 "visit_id": f"V{i+1}-{patient['id']}",
                 "date": visit_date.strftime("%Y-%m-%d"),
-                "time": f"{random.randint(9, 17)}:{random.choice(['00', '15', '30', '45'])}",
+                "time": f"{self.rng.randint(9, 17)}:{self.rng.choice(['00', '15', '30', '45'])}",
                 "type": visit_type,
                 "department": patient["department"],
                 "doctor": doctor_name,
@@ -950,55 +1064,58 @@ class MedicalDataGenerator:
                     "assessment": assessment,
                     "plan": plan
                 },
-                "duration_minutes": random.randint(5, 30),
-                "next_appointment": random.choice([
+                "duration_minutes": self.rng.randint(5, 30),
+                "next_appointment": self.rng.choice([
                     "1주 후", "2주 후", "1개월 후", "3개월 후", "6개월 후", "필요시 방문"
-                ]) if random.random() < 0.8 else None
+                ]) if self.rng.random() < 0.8 else None
             })
         
         return visits
 
+    def _generate_vitals_batch(self, patients):
+        """
+        활력징후 일괄 생성 - patients의 항목마다(같은 환자가 여러 번 나올 수 있음) 한 세트씩 샘플링
+        """
+        from vectorized_sampling import sample_vitals
+        
+        ages, bp_boosts, diabetic = [], [], []
+        for patient in patients:
+            diagnoses = patient.get("diagnoses", [])
+            ages.append(patient["age"])
+            # 치료 전 고혈압이라면 혈압이 더 높을 것
+            bp_boosts.append(sum(
+                1 for d in diagnoses if "고혈압" in d["name"] and d["status"] not in ["관해", "완치"]
+            ))
+            # 당뇨 환자는 공복혈당 측정 추가
+            diabetic.append(any(d["name"] == "당뇨병" for d in diagnoses))
+        
+        sampled = sample_vitals(ages, bp_boosts, diabetic, self.np_rng)
+        columns = {name: sampled[name].tolist() for name in (
+            "systolic_bp", "diastolic_bp", "pulse", "temperature",
+            "respiratory_rate", "oxygen_saturation", "blood_glucose"
+        )}
+        
+        vitals_list = []
+        for i, is_diabetic in enumerate(diabetic):
+            vitals = {
+                "systolic_bp": columns["systolic_bp"][i],
+                "diastolic_bp": columns["diastolic_bp"][i],
+                "pulse": columns["pulse"][i],
+                "temperature": columns["temperature"][i],
+                "respiratory_rate": columns["respiratory_rate"][i],
+                "oxygen_saturation": columns["oxygen_saturation"][i]
+            }
+            if is_diabetic:
+                vitals["blood_glucose"] = columns["blood_glucose"][i]
+            vitals_list.append(vitals)
+        
+        return vitals_list
+    
     def generate_vitals(self, patient):
         """
         활력징후 생성
         """
-        # 나이에 따른 약간의 변동성 추가
-        age = patient["age"]
-        age_factor = age / 60  # 나이를 고려한 요소
-        
-        # 혈압 생성 (고령일수록 수축기 혈압이 높아지는 경향)
-        systolic_base = 120 + (age_factor - 1) * 20
-        diastolic_base = 80 + (age_factor - 1) * 5
-        
-        # 고혈압 진단이 있는 경우 추가 고려
-        has_hypertension = False
-        if "diagnoses" in patient:
-            for diagnosis in patient["diagnoses"]:
-                if "고혈압" in diagnosis["name"]:
-                    has_hypertension = True
-                    # 치료 전이라면 혈압이 더 높을 것
-                    if diagnosis["status"] not in ["관해", "완치"]:
-                        systolic_base += 20
-                        diastolic_base += 10
-        
-        # 무작위성 추가
-        systolic = max(90, min(200, round(systolic_base + random.uniform(-15, 15))))
-        diastolic = max(60, min(110, round(diastolic_base + random.uniform(-10, 10))))
-        
-        vitals = {
-            "systolic_bp": systolic,
-            "diastolic_bp": diastolic,
-            "pulse": round(random.uniform(60, 100)),
-            "temperature": round(random.uniform(36.0, 37.5), 1),
-            "respiratory_rate": round(random.uniform(12, 20)),
-            "oxygen_saturation": round(random.uniform(95, 100))
-        }
-        
-        # 당뇨 환자는 공복혈당 측정 추가
-        if any(d["name"] == "당뇨병" for d in patient.get("diagnoses", [])):
-            vitals["blood_glucose"] = round(random.uniform(100, 250))
-        
-        return vitals
+        return self._generate_vitals_batch([patient])[0]
 
     def generate_subjective_note(self, patient, chief_complaint):
         """
@@ -1006,28 +1123,28 @@ class MedicalDataGenerator:
         """
         # 기본 템플릿
         templates = [
-            f"환자는 {chief_complaint}을(를) 호소합니다. 증상은 {random.choice(['가볍습니다', '중간 정도입니다', '심합니다'])}.",
-            f"{chief_complaint} 관련 내원. 증상은 {random.choice(['최근 시작', '수일 전부터', '수주 전부터', '수개월 전부터'])} 있었다고 합니다.",
-            f"주 호소: {chief_complaint}. 환자는 {random.choice(['경미한', '중등도의', '심한'])} 불편감을 보고합니다."
+            f"환자는 {chief_complaint}을(를) 호소합니다. 증상은 {self.rng.choice(['가볍습니다', '중간 정도입니다', '심합니다'])}.",
+            f"{chief_complaint} 관련 내원. 증상은 {self.rng.choice(['최근 시작', '수일 전부터', '수주 전부터', '수개월 전부터'])} 있었다고 합니다.",
+            f"주 호소: {chief_complaint}. 환자는 {self.rng.choice(['경미한', '중등도의', '심한'])} 불편감을 보고합니다."
         ]
         
-        note = random.choice(templates)
+        note = self.rng.choice(templates)
         
         # 추가 정보
-        if random.random() < 0.7:  # 70% 확률로 추가 정보 포함
+        if self.rng.random() < 0.7:  # 70% 확률로 추가 정보 포함
             additional_info = [
-                f" 증상은 {random.choice(['휴식 시 완화됩니다', '움직일 때 악화됩니다', '식후 악화됩니다', '특별한 유발 요인이 없습니다'])}.",
-                f" 환자는 {random.choice(['수면 장애', '피로감', '식욕 변화', '체중 변화'])}도 보고합니다.",
-                f" 환자는 최근 {random.choice(['스트레스 증가', '식이 변화', '활동 수준 변화', '약물 변화'])}가 있었다고 합니다."
+                f" 증상은 {self.rng.choice(['휴식 시 완화됩니다', '움직일 때 악화됩니다', '식후 악화됩니다', '특별한 유발 요인이 없습니다'])}.",
+                f" 환자는 {self.rng.choice(['수면 장애', '피로감', '식욕 변화', '체중 변화'])}도 보고합니다.",
+                f" 환자는 최근 {self.rng.choice(['스트레스 증가', '식이 변화', '활동 수준 변화', '약물 변화'])}가 있었다고 합니다."
             ]
-            note += random.choice(additional_info)
+            note += self.rng.choice(additional_info)
         
         # 진단 정보가 있는 경우, 관련 정보 추가
         if "diagnoses" in patient and patient["diagnoses"]:
-            diagnosis = random.choice(patient["diagnoses"])
+            diagnosis = self.rng.choice(patient["diagnoses"])
             diagnosis_note = f" 환자는 {diagnosis['date']}에 {diagnosis['name']}으로 진단받았습니다."
             
-            if random.random() < 0.5:  # 50% 확률로 진단 정보 추가
+            if self.rng.random() < 0.5:  # 50% 확률로 진단 정보 추가
                 note += diagnosis_note
             
             # 약물 정보가 있는 경우
@@ -1037,7 +1154,7 @@ class MedicalDataGenerator:
                     if med["related_diagnosis"] == diagnosis["name"]:
                         med_info.append(f"{med['medication']} {med['dosage']} {med['frequency']}")
                 
-                if med_info and random.random() < 0.7:  # 70% 확률로 약물 정보 추가
+                if med_info and self.rng.random() < 0.7:  # 70% 확률로 약물 정보 추가
                     note += f" 현재 {', '.join(med_info)}을(를) 복용 중입니다."
         
         return note
@@ -1056,17 +1173,17 @@ class MedicalDataGenerator:
         if "diagnoses" in patient and patient["diagnoses"]:
             for diagnosis in patient["diagnoses"]:
                 if diagnosis["name"] == "고혈압":
-                    if random.random() < 0.3:  # 30% 확률로 특이 소견
+                    if self.rng.random() < 0.3:  # 30% 확률로 특이 소견
                         physical_exam.append("심음 청진 시 S4 갤럽 청진됨.")
                 elif diagnosis["name"] == "당뇨병":
-                    if random.random() < 0.4:  # 40% 확률로 특이 소견
+                    if self.rng.random() < 0.4:  # 40% 확률로 특이 소견
                         physical_exam.append("발의 감각 저하 관찰됨.")
                 elif diagnosis["name"] == "심부전":
-                    if random.random() < 0.6:  # 60% 확률로 특이 소견
+                    if self.rng.random() < 0.6:  # 60% 확률로 특이 소견
                         physical_exam.append("양측 하지 부종 관찰됨.")
                         physical_exam.append("폐 기저부에서 수포음 청진됨.")
                 elif diagnosis["name"] == "만성 폐쇄성 폐질환":
-                    if random.random() < 0.7:  # 70% 확률로 특이 소견
+                    if self.rng.random() < 0.7:  # 70% 확률로 특이 소견
                         physical_exam.append("호기 시 천명음 청진됨.")
                         physical_exam.append("흉곽 확장 관찰됨.")
         
@@ -1081,42 +1198,42 @@ class MedicalDataGenerator:
         ]
         
         # 1-3개의 시스템에 대한 검진 결과 추가
-        num_systems = random.randint(1, 3)
-        selected_systems = random.sample(systems, num_systems)
+        num_systems = self.rng.randint(1, 3)
+        selected_systems = self.rng.sample(systems, num_systems)
         
         for system in selected_systems:
             if system == "심혈관계":
-                physical_exam.append(random.choice([
+                physical_exam.append(self.rng.choice([
                     "규칙적인 심음, 심잡음 없음.",
                     "규칙적인 심음, 수축기 잡음 2/6 강도로 청진됨.",
                     "불규칙한 심음, 심잡음 없음."
                 ]))
             elif system == "호흡기계":
-                physical_exam.append(random.choice([
+                physical_exam.append(self.rng.choice([
                     "폐 청진 정상, 수포음 없음.",
                     "양폐야에서 거친 호흡음 청진됨.",
                     "우측 폐에서 수포음 청진됨."
                 ]))
             elif system == "소화기계":
-                physical_exam.append(random.choice([
+                physical_exam.append(self.rng.choice([
                     "복부 부드럽고 압통 없음.",
                     "경도의 상복부 압통 있음.",
                     "장음 정상, 간비종대 없음."
                 ]))
             elif system == "신경계":
-                physical_exam.append(random.choice([
+                physical_exam.append(self.rng.choice([
                     "의식 명료, 뇌신경 기능 정상.",
                     "경도의 근력 약화 관찰됨.",
                     "감각 기능 정상."
                 ]))
             elif system == "근골격계":
-                physical_exam.append(random.choice([
+                physical_exam.append(self.rng.choice([
                     "관절 운동 범위 정상.",
                     "경도의 관절 부종 관찰됨.",
                     "근력 5/5로 정상."
                 ]))
             elif system == "피부":
-                physical_exam.append(random.choice([
+                physical_exam.append(self.rng.choice([
                     "피부 상태 양호, 발진 없음.",
                     "경도의 발진 관찰됨.",
                     "피부 탄력 정상."
@@ -1148,24 +1265,24 @@ class MedicalDataGenerator:
                 f"{diagnosis['name']}({diagnosis['icd10']}): {status}."
             ]
             
-            assessment = random.choice(templates)
+            assessment = self.rng.choice(templates)
             
             # 추가 평가 내용
-            if random.random() < 0.5:  # 50% 확률로 추가 내용 포함
+            if self.rng.random() < 0.5:  # 50% 확률로 추가 내용 포함
                 if status == "활성":
-                    assessment += random.choice([
+                    assessment += self.rng.choice([
                         " 증상 지속 중.",
                         " 약물 치료 중.",
                         " 추가 평가 필요."
                     ])
                 elif status == "관해":
-                    assessment += random.choice([
+                    assessment += self.rng.choice([
                         " 증상 호전됨.",
                         " 현재 치료에 좋은 반응 보임.",
                         " 안정적 상태 유지 중."
                     ])
                 elif status == "완치":
-                    assessment += random.choice([
+                    assessment += self.rng.choice([
                         " 추가 치료 필요 없음.",
                         " 정기 검진만 필요.",
                         " 재발 없음."
@@ -1175,7 +1292,7 @@ class MedicalDataGenerator:
         
         # 종합 평가
         if len(assessments) > 1:
-            overall = random.choice([
+            overall = self.rng.choice([
                 "복합 질환 관리 중.",
                 "여러 질환의 상호작용 고려 필요.",
                 "전반적 상태는 안정적."
@@ -1192,7 +1309,7 @@ class MedicalDataGenerator:
         
         # 약물 유지/조정
         if "medications" in patient and patient["medications"]:
-            med_plan = random.choice([
+            med_plan = self.rng.choice([
                 "현재 약물 유지.",
                 "약물 용량 조절:",
                 "약물 변경:",
@@ -1201,13 +1318,13 @@ class MedicalDataGenerator:
             
             if med_plan != "현재 약물 유지.":
                 # 무작위로 약물 하나 선택
-                med = random.choice(patient["medications"])
+                med = self.rng.choice(patient["medications"])
                 med_plan += f" {med['medication']} {med['dosage']} {med['frequency']}."
             
             plans.append(med_plan)
         
         # 검사 계획
-        if random.random() < 0.7:  # 70% 확률로 검사 계획 포함
+        if self.rng.random() < 0.7:  # 70% 확률로 검사 계획 포함
             test_plans = [
                 "다음 방문 시 기본 혈액 검사 시행.",
                 "지질 프로필 검사 예정.",
@@ -1220,10 +1337,10 @@ class MedicalDataGenerator:
                 "복부 초음파 검사 고려."
             ]
             
-            plans.append(random.choice(test_plans))
+            plans.append(self.rng.choice(test_plans))
         
         # 추적 관찰
-        follow_up = random.choice([
+        follow_up = self.rng.choice([
             "1개월 후 재방문.",
             "3개월 후 재방문.",
             "6개월 후 재방문.",
@@ -1233,8 +1350,8 @@ class MedicalDataGenerator:
         plans.append(follow_up)
         
         # 생활 습관 조언
-        if random.random() < 0.5:  # 50% 확률로 생활 습관 조언 포함
-            lifestyle_advice = random.choice([
+        if self.rng.random() < 0.5:  # 50% 확률로 생활 습관 조언 포함
+            lifestyle_advice = self.rng.choice([
                 "저염식이 유지 권장.",
                 "규칙적인 운동 권장.",
                 "체중 관리 필요.",
@@ -1248,57 +1365,207 @@ class MedicalDataGenerator:
         
         return " ".join(plans)
 
-    def generate_complete_medical_record(self, department):
+    def generate_complete_medical_record(self, department, patient_id=None):
         """
         환자 전체 의무기록 생성
         """
-        # 환자 기본 정보
-        patient = self.generate_patient(department)
-        
-        # 진단 정보
-        patient["diagnoses"] = self.generate_diagnoses(patient)
-        
-        # 약물 정보
-        patient["medications"] = self.generate_medications(patient)
-        
-        # 검사 결과
-        patient["lab_results"] = self.generate_lab_results(patient)
-        
-        # 영상 검사
-        patient["imaging_studies"] = self.generate_imaging_studies(patient)
-        
-        # 시술 및 수술
-        patient["procedures"] = self.generate_procedures(patient)
+        return self.generate_complete_medical_records(department, [patient_id])[0]
+    
+    def generate_complete_medical_records(self, department, patient_ids):
+        """
+        여러 환자의 전체 의무기록 생성 - 검사 값과 활력징후는 환자 전체를 모아 벡터화 샘플링
+        """
+        # 환자 기본 정보, 진단 정보, 약물 정보
+        patients = []
+        for patient_id in patient_ids:
+            patient = self.generate_patient(department, patient_id)
+            patient["diagnoses"] = self.generate_diagnoses(patient)
+            patient["medications"] = self.generate_medications(patient)
+            patients.append(patient)
+        
+        # 검사 결과, 영상 검사, 시술 및 수술
+        for patient, lab_results in zip(patients, self._generate_lab_results_batch(patients)):
+            patient["lab_results"] = lab_results
+            patient["imaging_studies"] = self.generate_imaging_studies(patient)
+            patient["procedures"] = self.generate_procedures(patient)
         
         # 진료 기록
-        patient["visits"] = self.generate_visits(patient)
+        for patient, visits in zip(patients, self._generate_visits_batch(patients)):
+            patient["visits"] = visits
         
-        return patient
+        return patients
 
-    def generate_medical_dataset(self):
+    def _department_counts(self, target_count=None):
+        """
+        진료과별 환자 수 - target_count를 주면 patient_counts 비율대로 나눔 (최대 나머지 방식)
+        """
+        if target_count is None:
+            return dict(self.patient_counts)
+        
+        total = sum(self.patient_counts.values())
+        quotas = {dept: target_count * count / total for dept, count in self.patient_counts.items()}
+        counts = {dept: int(quota) for dept, quota in quotas.items()}
+        remainder = target_count - sum(counts.values())
+        for dept in sorted(quotas, key=lambda d: (counts[d] - quotas[d], d))[:remainder]:
+            counts[dept] += 1
+        return counts
+    
+    def generate_block(self, department, block_index, start, size, base_seed):
+        """
+        환자 블록 생성 - 블록마다 (기본 시드, 진료과, 블록 번호)로 난수 생성기를 재설정하므로
+        어느 프로세스에서 어떤 순서로 생성해도 결과가 같음
+        """
+        seed = block_seed(base_seed, department, block_index)
+        self.rng = random.Random(seed)
+        self.np_rng = np.random.default_rng(seed)
+        return self.generate_complete_medical_records(
+            department, [make_patient_id(department, start + i + 1) for i in range(size)]
+        )
+    
+    def _iter_blocks(self, tasks, workers):
+        """
+        블록을 작업 순서대로 생성 - 병렬일 때도 동시에 진행 중인 블록 수를 제한하여
+        결과가 소비되기 전에 메모리에 쌓이지 않도록 함
+        """
+        if workers <= 1 or len(tasks) <= 1:
+            for task in tasks:
+                yield self.generate_block(*task)
+            return
+        
+        from collections import deque
+        
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_generator_worker,
+            initargs=(self,)
+        ) as executor:
+            pending = deque()
+            for task in tasks:
+                pending.append(executor.submit(_generate_block_in_worker, task))
+                if len(pending) >= workers * 2:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+    
+    def generate_medical_dataset(self, target_count=None, workers=1, block_size=1000,
+                                 output_format="json", compression=None, max_records_per_file=100_000):
         """
         전체 의료 데이터셋 생성
+        
+        Args:
+            target_count: 전체 환자 수 (기본: patient_counts 합계)
+            workers: 생성 프로세스 수 (결과는 작업자 수와 무관하게 동일)
+            block_size: 블록당 환자 수 - 결정성의 단위이므로 바꾸면 결과도 달라짐
+            output_format: "json"(기존, 전체 목록을 메모리에 모아 저장), "jsonl", "parquet" (스트리밍 저장)
+            compression: jsonl은 "gzip", parquet은 "zstd"/"snappy" 등
+            max_records_per_file: 스트리밍 저장 시 파일당 최대 환자 수
+        
+        Returns:
+            json: {진료과: 환자 목록}, 스트리밍: {진료과: 저장된 파일 경로 목록}
         """
-        dataset = {}
+        from dataset_io import FORMATS, StreamingDatasetWriter
         
-        for department, count in self.patient_counts.items():
-            logger.info(f"{department} 환자 {count}명 생성 중...")
-            
-            patients = []
-            for i in range(count):
-                patient = self.generate_complete_medical_record(department)
-                patients.append(patient)
+        if output_format not in FORMATS:
+            raise ValueError(f"지원하지 않는 출력 형식입니다: {output_format} (가능: {list(FORMATS)})")
+        
+        counts = self._department_counts(target_count)
+        
+        codes = [DEPARTMENT_CODES.get(dept, dept[:3].upper()) for dept in counts]
+        if len(set(codes)) != len(codes):
+            raise ValueError(f"진료과 ID 접두사가 중복됩니다: {dict(zip(counts, codes))} (DEPARTMENT_CODES에 등록 필요)")
+        
+        # 시드가 없으면 이번 실행용 기본 시드를 하나 뽑아 모든 블록에 사용
+        base_seed = self.seed if self.seed is not None else self.rng.getrandbits(64)
+        
+        tasks = [
+            (department, block_index, start, min(block_size, count - start), base_seed)
+            for department, count in counts.items()
+            for block_index, start in enumerate(range(0, count, block_size))
+        ]
+        
+        streaming = output_format != "json"
+        dataset = {department: [] for department in counts}
+        writers = {}
+        
+        try:
+            blocks = self._iter_blocks(tasks, workers)
+            for task, patients in zip(tasks, tqdm(blocks, total=len(tasks), desc="환자 블록 생성")):
+                department = task[0]
+                if not streaming:
+                    dataset[department].extend(patients)
+                    continue
+                
+                # 진료과가 바뀌면 이전 진료과 파일은 바로 닫음
+                if department not in writers:
+                    for writer in writers.values():
+                        writer.close()
+                    writers = {department: StreamingDatasetWriter(
+                        self.output_dir,
+                        department,
+                        fmt=output_format,
+                        compression=compression,
+                        max_records_per_file=max_records_per_file
+                    )}
+                    dataset[department] = writers[department].paths
+                writers[department].write_many(patients)
+        finally:
+            for writer in writers.values():
+                writer.close()
+        
+        for department, count in counts.items():
+            # 이후 generate_patient 호출이 블록에서 쓴 ID와 겹치지 않도록 일련번호 갱신
+            self._next_patient_number[department] = count + 1
+            
+            legacy_path = self.output_dir / f"{department}_patients.json"
+            if streaming:
+                # 같은 진료과의 기존 형식 파일이 함께 읽히지 않도록 제거
+                if legacy_path.exists():
+                    legacy_path.unlink()
+                logger.info(f"{department} 환자 {count}명 스트리밍 저장 완료 ({len(dataset[department])}개 파일)")
+                continue
             
-            dataset[department] = patients
+            for old_path in self.output_dir.glob(f"{department}_patients-*"):
+                old_path.unlink()
             
             # 파일로 저장
-            output_path = self.output_dir / f"{department}_patients.json"
-            with open(output_path, 'w', encoding='utf-8') as f:
+            patients = dataset[department]
+            with open(legacy_path, 'w', encoding='utf-8') as f:
                 json.dump(patients, f, ensure_ascii=False, indent=2)
             
-            logger.info(f"{output_path}에 {len(patients)}명의 환자 데이터 저장 완료")
+            logger.info(f"{legacy_path}에 {len(patients)}명의 환자 데이터 저장 완료")
         
         return dataset
+    
+    def export_parquet_warehouse(self, dataset, warehouse_dir=None):
+        """
+        생성한 데이터셋을 진료과별로 파티션된 Parquet 테이블로 저장 (검사 결과 등 분석용)
+        """
+        from medical_warehouse import export_warehouse
+        
+        warehouse_dir = Path(warehouse_dir) if warehouse_dir else self.output_dir / "warehouse"
+        records = (
+            (patient, department)
+            for department, patients in dataset.items()
+            for patient in patients
+        )
+        return export_warehouse(records, warehouse_dir)
+    
+    def generate_query_workload(self, num_queries=1000, output_path=None, zipf_s=1.1, seed=None):
+        """
+        생성한 데이터셋(output_dir)으로부터 정답 환자 ID가 달린 검색 질의 워크로드 생성
+        
+        Args:
+            zipf_s: 질의 인기도 편향 (0이면 균등)
+            seed: 질의 난수 시드 (기본: 생성기 시드)
+        """
+        from query_workload import generate_workload_file
+        
+        output_path = Path(output_path) if output_path else self.output_dir / "query_workload.jsonl"
+        generate_workload_file(
+            self.output_dir, output_path, num_queries=num_queries, zipf_s=zipf_s,
+            seed=self.seed if seed is None else seed
+        )
+        return output_path
 
 
 # medical_vector_db.py (계속)
@@ -1320,27 +1587,82 @@ class MedicalVectorStore:
         from langchain_community.embeddings import HuggingFaceEmbeddings
         
         # 한국어에 최적화된 임베딩 모델 사용
+        self.embedding_model_name = "jhgan/ko-sroberta-multitask"
         self.embeddings = HuggingFaceEmbeddings(
-            model_name="jhgan/ko-sroberta-multitask"
+            model_name=self.embedding_model_name
         )
         
         from langchain.text_splitter import RecursiveCharacterTextSplitter
         
         # 문서 분할기 설정 - 의료 문서에 적합하게 설정
+        self.chunk_size = 1000
+        self.chunk_overlap = 200
+        self.chunk_separators = ["\n\n", "\n", ". ", " ", ""]
         self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            separators=["\n\n", "\n", ". ", " ", ""],
+            chunk_size=self.chunk_size,
+            chunk_overlap=self.chunk_overlap,
+            separators=self.chunk_separators,
             length_function=len
         )
+        
+        # 보관할 벡터 스토어 스냅샷 수 (현재 버전 포함)
+        self.snapshot_keep = 3
+        
+        # 하이브리드 검색의 BM25 토크나이저 ("ngram", "morpheme", "whitespace")
+        # 문서 토큰은 인덱싱 시점에 token_cache 디렉토리에 저장되어 검색 시 재사용됨
+        self.sparse_tokenizer = "ngram"
+        self.token_cache_path = self.vector_store_path / "token_cache"
+        self._bm25_retriever = None
+        
+        # 환자별 청크 위치 (처음 사용할 때 생성)
+        self._patient_positions = {}
+        self._patient_index = None
+        
+        # 진단명/동의어/ICD-10 코드 개념 인덱스 (처음 사용할 때 생성)
+        self._concept_index = None
+        self._diagnosis_positions = None
+        
+        # 환자별 검사/활력징후/방문 시계열 인덱스 (처음 사용할 때 생성)
+        self._temporal_index = None
+        
+        # 진단/약물/알레르기/진료과/나이 코호트 비트맵 인덱스 (처음 사용할 때 생성)
+        self._cohort_index = None
+        
+        # 진단/약물/검사 용어 자동완성 및 오타 교정 인덱스 (처음 사용할 때 생성)
+        self._term_index = None
+        
+        # 필터 조건에 맞는 가장 작은 하위 인덱스를 고르는 쿼리 계획기 (create_vector_indices 또는 처음 사용할 때 생성)
+        self._query_planner = None
+        
+        # 2단계 검색의 교차 인코더 재순위화 모델 (rerank=True로 검색할 때 로드)
+        self.reranker_model_name = "Dongjin-kr/ko-reranker"
+        self._reranker = None
+        
+        from profiling import StageProfiler
+        
+        # 빌드/검색 단계별 시간 측정 (profile_run으로 실행 단위 JSON 보고서 저장)
+        self.profiler = StageProfiler(enabled=True, report_dir=self.vector_store_path / "profiles")
+    
+    def profile_run(self, run_name, cprofile=False):
+        """
+        실행 단위 프로파일링 - 블록 안의 단계별 시간을 모아 {vector_store_path}/profiles에 JSON 보고서 저장
+        
+            with store.profile_run("build", cprofile=True) as run:
+                store.create_vector_store(store.load_medical_data())
+            run["report_path"], run["report"]["stages"]
+        
+        Args:
+            cprofile: True이면 cProfile 함수 단위 프로파일도 수집 (.prof 파일과 보고서의 상위 함수 목록)
+        """
+        return self.profiler.capture(run_name, cprofile=cprofile)
     
-    def load_medical_data(self, file_pattern="*_patients.json"):
+    def load_medical_data(self, file_pattern="*_patients*"):
         """
-        의료 데이터 로드
+        의료 데이터 로드 (json, 스트리밍 저장된 jsonl/jsonl.gz/parquet 모두 지원)
         """
-        import glob
+        from dataset_io import department_of, find_dataset_files, read_patients
         
-        data_files = list(self.data_path.glob(file_pattern))
+        data_files = find_dataset_files(self.data_path, file_pattern)
         
         if not data_files:
             logger.warning(f"No files matching {file_pattern} found in {self.data_path}")
@@ -1350,15 +1672,16 @@ class MedicalVectorStore:
         
         for file_path in data_files:
             try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    patients = json.load(f)
+                department = department_of(file_path)
                 
-                department = file_path.stem.replace("_patients", "")
-                logger.info(f"Loading {len(patients)} patients from {department} department")
+                # 각 환자 정보를 문서로 변환 (파일을 한 번에 읽지 않고 환자 단위로 순회)
+                count = 0
+                for patient in self.profiler.timed_iter("load/parse", read_patients(file_path)):
+                    with self.profiler.stage("load/convert"):
+                        documents.extend(self._convert_patient_to_documents(patient, department))
+                    count += 1
                 
-                # 각 환자 정보를 문서로 변환
-                for patient in patients:
-                    documents.extend(self._convert_patient_to_documents(patient, department))
+                logger.info(f"Loading {count} patients from {department} department ({file_path.name})")
                 
             except Exception as e:
                 logger.error(f"Error loading {file_path}: {e}")
@@ -1366,6 +1689,36 @@ class MedicalVectorStore:
         logger.info(f"Loaded {len(documents)} total documents from medical data")
         return documents
     
+    def load_all_sources(self, source_paths=("../data",), include_generated=True, max_workers=4):
+        """
+        형태가 다른 여러 소스(data/의 내과환자/외과환자/당일진료환자/약처방, 생성된 *_patients* 파일)를
+        소스별 어댑터로 정규화하여 하나의 문서 목록으로 수집
+        """
+        from source_adapters import ADAPTERS, GeneratedPatientsAdapter, load_sources
+        
+        # 생성기 형식은 기존 변환 로직을 그대로 사용
+        adapters = [GeneratedPatientsAdapter(self._convert_patient_to_documents), *ADAPTERS.values()]
+        paths = list(source_paths) + ([self.data_path] if include_generated else [])
+        
+        # 약물 계열이 없는 소스(약처방 등)는 약물 사전으로 medication_class를 채움
+        medication_classes = {
+            name: info["class"] for name, info in MedicalDataGenerator(output_dir=self.data_path).medications.items()
+        }
+        return load_sources(paths, adapters, max_workers=max_workers, medication_classes=medication_classes)
+    
+    def create_multi_source_vector_store(self, source_paths=("../data",), store_name="medical_vector_store",
+                                         include_generated=True, max_workers=4):
+        """
+        모든 소스를 수집하여 하나의 벡터 스토어 생성 (문서마다 source, source_type 메타데이터 포함)
+        """
+        documents = self.load_all_sources(source_paths, include_generated, max_workers)
+        
+        if not documents:
+            logger.warning("벡터 스토어를 생성할 문서가 없습니다.")
+            return None
+        
+        return self.create_vector_store(documents, store_name)
+    
     def _convert_patient_to_documents(self, patient, department):
         """
         환자 정보를 여러 개의 문서로 변환 (세분화된 정보)
@@ -1447,6 +1800,7 @@ class MedicalVectorStore:
                         "department": department,
                         "document_type": "diagnosis",
                         "diagnosis_name": diagnosis['name'],
+                        "icd10": diagnosis.get('icd10', ''),
                         "diagnosis_date": diagnosis.get('date', ''),
                         "diagnosis_status": diagnosis.get('status', '')
                     }
@@ -1740,9 +2094,37 @@ class MedicalVectorStore:
         
         return documents
     
-    def create_vector_store(self, documents, store_name="medical_vector_store"):
+    def _split_documents(self, documents, near_dedup_threshold=None):
+        """
+        문서를 청크로 분할하고, near_dedup_threshold가 있으면 유사 중복 청크를 군집별 대표 하나로 줄임
+        
+        Returns:
+            (청크 목록, 유사 중복 제거 보고서 또는 None)
+        """
+        with self.profiler.stage("build/split"):
+            chunks = self.text_splitter.split_documents(documents)
+        logger.info(f"총 {len(chunks)}개의 청크 생성")
+        
+        if not near_dedup_threshold:
+            return chunks, None
+        
+        from near_dedup import deduplicate_chunks
+        
+        with self.profiler.stage("build/near_dedup"):
+            return deduplicate_chunks(chunks, threshold=near_dedup_threshold)
+    
+    def create_vector_store(self, documents, store_name="medical_vector_store", num_workers=1,
+                            threads_per_worker=None, near_dedup_threshold=None):
         """
         벡터 스토어 생성
+        
+        Args:
+            num_workers: 임베딩 작업 프로세스 수 - 2 이상이면 청크를 나누어 프로세스별 모델로
+                부분 인덱스를 만든 뒤 병합 (중복 청크 제거)
+            threads_per_worker: 작업자당 연산 스레드 수 (기본: CPU 코어 수 / 작업자 수)
+            near_dedup_threshold: 지정하면 추정 Jaccard 유사도가 이 값 이상인 유사 중복 청크를 MinHash LSH로
+                묶어 군집별 대표 청크만 인덱싱 (같은 환자의 청크끼리만 묶음, 예: 0.9, 감소율은 매니페스트의
+                near_dedup에 기록)
         """
         if not documents:
             logger.warning("벡터 스토어를 생성할 문서가 없습니다.")
@@ -1751,27 +2133,170 @@ class MedicalVectorStore:
         logger.info(f"{len(documents)}개 문서로 벡터 스토어 생성 중...")
         
         # 문서를 청크로 분할
-        chunks = self.text_splitter.split_documents(documents)
-        logger.info(f"총 {len(chunks)}개의 청크 생성")
+        chunks, dedup_report = self._split_documents(documents, near_dedup_threshold)
         
         from langchain_community.vectorstores import FAISS
+        from store_snapshots import VectorStoreSnapshots
         
         # 벡터 스토어 경로
         store_path = self.vector_store_path / store_name
         store_path.mkdir(parents=True, exist_ok=True)
         
         # FAISS 벡터 스토어 생성
-        vectorstore = FAISS.from_documents(chunks, self.embeddings)
-        vectorstore.save_local(store_path)
+        if num_workers > 1:
+            from functools import partial
+            from parallel_embedding import build_faiss_parallel, huggingface_embeddings
+            
+            with self.profiler.stage("build/embed_parallel"):
+                vectorstore = build_faiss_parallel(
+                    chunks,
+                    partial(huggingface_embeddings, self.embedding_model_name),
+                    self.embeddings,
+                    num_workers=num_workers,
+                    threads_per_worker=threads_per_worker,
+                    work_dir=self.vector_store_path
+                )
+        else:
+            # 임베딩과 인덱스 구성을 나누어 측정 (FAISS.from_documents와 같은 결과)
+            texts = [chunk.page_content for chunk in chunks]
+            with self.profiler.stage("build/embed"):
+                vectors = self.embeddings.embed_documents(texts)
+            with self.profiler.stage("build/index"):
+                vectorstore = FAISS.from_embeddings(
+                    list(zip(texts, vectors)), self.embeddings, metadatas=[chunk.metadata for chunk in chunks]
+                )
+        
+        # 하이브리드 검색용 토큰 분석을 인덱싱 시점에 미리 수행
+        with self.profiler.stage("build/tokenize"):
+            self._get_token_cache().update((chunk.page_content for chunk in chunks), self._get_sparse_tokenizer())
+        
+        # 새 버전 스냅샷으로 저장 후 CURRENT 포인터 교체 (서비스 중인 인덱스는 건드리지 않음)
+        with self.profiler.stage("build/save"):
+            version = VectorStoreSnapshots(store_path).publish(
+                vectorstore,
+                extra_manifest={"num_documents": len(documents), "num_chunks": len(chunks), "near_dedup": dedup_report},
+                keep=self.snapshot_keep
+            )
         
-        logger.info(f"벡터 스토어가 {store_path}에 저장되었습니다.")
+        logger.info(f"벡터 스토어가 {store_path} ({version})에 저장되었습니다.")
         return vectorstore
     
-    def load_vector_store(self, store_name="medical_vector_store"):
+    def build_vector_store_cached(self, store_name="medical_vector_store", file_pattern="*_patients*",
+                                  chunk_size=None, chunk_overlap=None, index_type="flat", nlist=None,
+                                  cache_dir=None, near_dedup_threshold=None, nprobe=None):
         """
-        저장된 벡터 스토어 로드
+        단계별 산출물 캐시를 사용한 벡터 스토어 빌드
+        
+        documents -> chunks -> embeddings -> index 각 단계의 산출물을 입력/설정 해시로 저장해 두고,
+        입력과 설정이 같은 단계는 다시 계산하지 않는다 (예: index_type만 바꾸면 임베딩 재사용).
+        
+        Args:
+            chunk_size, chunk_overlap: 분할 설정 (기본: 생성자 설정)
+            index_type: "flat", "ivf", "hnsw"
+            cache_dir: 산출물 캐시 위치 (기본: {vector_store_path}/build_cache)
+            near_dedup_threshold: chunks 단계에서 유사 중복 청크를 군집별 대표 하나로 줄일 유사도 기준
+            nprobe: IVF 인덱스의 질의당 탐색 리스트 수 (index 단계 설정과 스냅샷 매니페스트에 기록)
         """
-        from langchain_community.vectorstores import FAISS
+        from build_pipeline import ArtifactCache, VectorBuildPipeline, read_documents, source_fingerprint
+        from dataset_io import find_dataset_files
+        from ondisk_index import load_faiss_store
+        from store_snapshots import VectorStoreSnapshots
+        
+        data_files = find_dataset_files(self.data_path, file_pattern)
+        if not data_files:
+            logger.warning(f"No files matching {file_pattern} found in {self.data_path}")
+            return None
+        
+        pipeline = VectorBuildPipeline(
+            ArtifactCache(cache_dir or self.vector_store_path / "build_cache"),
+            self.embeddings,
+            self.embedding_model_name,
+            profiler=self.profiler
+        )
+        index_path = pipeline.run(
+            data_files,
+            lambda: self.load_medical_data(file_pattern),
+            source_fingerprint(type(self)._convert_patient_to_documents),
+            chunk_size=chunk_size or self.chunk_size,
+            chunk_overlap=self.chunk_overlap if chunk_overlap is None else chunk_overlap,
+            separators=self.chunk_separators,
+            index_type=index_type,
+            nlist=nlist,
+            near_dedup_threshold=near_dedup_threshold,
+            nprobe=nprobe
+        )
+        
+        index_config = pipeline.cache.read_info("index", pipeline.report["index"]["key"])["config"]
+        vectorstore = load_faiss_store(index_path, self.embeddings, index_config.get("nprobe"))
+        
+        # 하이브리드 검색용 토큰 분석 (이미 분석된 청크는 토큰 캐시에서 건너뜀)
+        chunks_path = pipeline.cache.path("chunks", pipeline.report["chunks"]["key"]) / "chunks.jsonl"
+        self._get_token_cache().update(
+            (chunk.page_content for chunk in read_documents(chunks_path)), self._get_sparse_tokenizer()
+        )
+        
+        store_path = self.vector_store_path / store_name
+        store_path.mkdir(parents=True, exist_ok=True)
+        version = VectorStoreSnapshots(store_path).publish(
+            vectorstore,
+            extra_manifest={
+                "build_stages": pipeline.report, "index_type": index_type, "nprobe": index_config.get("nprobe")
+            },
+            keep=self.snapshot_keep
+        )
+        
+        logger.info(
+            f"벡터 스토어가 {store_path} ({version})에 저장되었습니다. 단계: "
+            + ", ".join(f"{stage}={info['status']}" for stage, info in pipeline.report.items())
+        )
+        return vectorstore
+    
+    def create_ondisk_vector_store(self, documents, store_name="medical_vector_store_ondisk", nlist=None,
+                                   batch_size=4096, train_size=50_000, near_dedup_threshold=None):
+        """
+        메모리보다 큰 인덱스용 디스크 기반 IVF 벡터 스토어 생성
+        
+        청크를 batch_size개씩 임베딩하여 바로 디스크에 기록하므로 전체 벡터를 메모리에 올리지 않는다.
+        
+        Args:
+            nlist: 역색인 리스트 수 (기본: 약 4*sqrt(학습 벡터 수))
+            train_size: 중심점 학습에 사용할 벡터 수
+            near_dedup_threshold: 유사 중복 청크를 군집별 대표 하나로 줄일 유사도 기준 (create_vector_store 참고)
+        """
+        if not documents:
+            logger.warning("벡터 스토어를 생성할 문서가 없습니다.")
+            return None
+        
+        from ondisk_index import build_ondisk_store, iter_chunk_batches
+        
+        chunks, dedup_report = self._split_documents(documents, near_dedup_threshold)
+        logger.info(f"총 {len(chunks)}개의 청크로 디스크 기반 IVF 스토어 생성 중...")
+        
+        store_path = self.vector_store_path / store_name
+        with self.profiler.stage("build/ondisk_index"):
+            build_ondisk_store(
+                iter_chunk_batches(chunks, self.embeddings, batch_size),
+                store_path,
+                nlist=nlist,
+                train_size=train_size,
+                extra_manifest={"num_documents": len(documents), "num_chunks": len(chunks), "near_dedup": dedup_report}
+            )
+        
+        # 하이브리드 검색용 토큰 분석을 인덱싱 시점에 미리 수행
+        with self.profiler.stage("build/tokenize"):
+            self._get_token_cache().update((chunk.page_content for chunk in chunks), self._get_sparse_tokenizer())
+        
+        return self.load_vector_store(store_name)
+    
+    def load_vector_store(self, store_name="medical_vector_store", version=None, nprobe=None):
+        """
+        저장된 벡터 스토어 로드 (스냅샷이 있으면 CURRENT 또는 지정 버전, 없으면 기존 단일 디렉토리)
+        
+        디스크 기반 IVF 스토어는 역색인을 mmap으로 열고 nprobe개 리스트만 탐색한다.
+        IVF 인덱스는 nprobe(생략하면 빌드 시 기록한 값)와 reconstruct용 direct map을 준비해 둔다.
+        """
+        from ondisk_index import DEFAULT_NPROBE, is_ondisk_store, load_faiss_store, load_ondisk_store
+        from store_snapshots import VectorStoreSnapshots
         
         store_path = self.vector_store_path / store_name
         
@@ -1782,40 +2307,123 @@ class MedicalVectorStore:
         logger.info(f"{store_path}에서 벡터 스토어 로드 중...")
         
         try:
-            # allow_dangerous_deserialization=True 옵션 추가
-            vectorstore = FAISS.load_local(
-                store_path, 
-                self.embeddings, 
-                allow_dangerous_deserialization=True
-            )
+            snapshots = VectorStoreSnapshots(store_path)
+            if is_ondisk_store(store_path):
+                vectorstore = load_ondisk_store(store_path, self.embeddings, nprobe=nprobe or DEFAULT_NPROBE)
+            elif version or snapshots.current_version():
+                vectorstore = snapshots.load(self.embeddings, version, nprobe=nprobe)
+            else:
+                vectorstore = load_faiss_store(store_path, self.embeddings, nprobe)
             logger.info("벡터 스토어 로드 완료")
             return vectorstore
         except Exception as e:
             logger.error(f"벡터 스토어 로드 중 오류 발생: {e}")
             return None
     
-    def search_similar_documents(self, query, vectorstore, k=5, filter_dict=None):
+    def load_hot_reloading_vector_store(self, store_name="medical_vector_store", poll_interval=5.0):
+        """
+        새 스냅샷이 게시되면 백그라운드에서 자동으로 교체되는 벡터 스토어 로드
+        (장시간 실행되는 검색 서버용, 사용 후 stop() 호출)
+        """
+        from store_snapshots import HotReloadingVectorStore, VectorStoreSnapshots
+        
+        snapshots = VectorStoreSnapshots(self.vector_store_path / store_name)
+        if snapshots.current_version() is None:
+            logger.error(f"게시된 스냅샷이 없습니다: {snapshots.store_path}")
+            return None
+        
+        try:
+            vectorstore = HotReloadingVectorStore(snapshots, self.embeddings, poll_interval).start()
+            logger.info(f"핫 리로드 벡터 스토어 시작 (버전 {vectorstore.version})")
+            return vectorstore
+        except Exception as e:
+            logger.error(f"벡터 스토어 로드 중 오류 발생: {e}")
+            return None
+    
+    def search_similar_documents(self, query, vectorstore, k=5, filter_dict=None,
+                                 rerank=False, rerank_candidates=30, latency_budget_ms=None,
+                                 normalize_terms=False):
         """
         유사 문서 검색 (메타데이터 필터링 지원)
+        
+        Args:
+            normalize_terms: 임베딩 전에 쿼리의 오타/부분 표기 용어를 사전 용어로 교정 (normalize_query)
+            rerank: 상위 rerank_candidates개 후보를 교차 인코더로 재순위화한 뒤 k개 반환
+            latency_budget_ms: 요청당 시간 예산 - 재순위화 도중 소진되면 그때까지의 최선 순서 반환
         """
         if not vectorstore:
             logger.error("유효한 벡터 스토어가 없습니다.")
             return []
         
+        started = time.perf_counter()
+        
+        # 핫 리로드 스토어는 검색하는 동안 한 버전으로 고정
+        vectorstore = getattr(vectorstore, "current", vectorstore)
+        
+        if normalize_terms:
+            with self.profiler.stage("search/normalize"):
+                query, _ = self.normalize_query(query)
+        
         logger.info(f"쿼리로 검색 중: {query}")
         
-        if filter_dict:
-            # 메타데이터 필터 적용한 검색
-            docs = vectorstore.similarity_search(
-                query, 
-                k=k,
-                filter=filter_dict
+        from profiling import timed_similarity_search
+        
+        fetch_k = max(k, rerank_candidates) if rerank else k
+        
+        # 쿼리 임베딩 / ANN 검색 / docstore 조회 / 메타데이터 필터를 단계별로 측정
+        docs = timed_similarity_search(vectorstore, query, k=fetch_k, filter_dict=filter_dict, profiler=self.profiler)
+        
+        if not rerank:
+            return docs
+        
+        deadline = started + latency_budget_ms / 1000 if latency_budget_ms else None
+        with self.profiler.stage("search/rerank"):
+            reranked = self._get_reranker().rerank(query, docs, top_k=k, deadline=deadline)
+        return [doc for doc, _ in reranked]
+    
+    def _get_reranker(self):
+        """교차 인코더 재순위화기 (점수 캐시를 검색 간에 공유하도록 하나만 생성)"""
+        if self._reranker is None:
+            from reranker import CrossEncoderReranker
+            
+            self._reranker = CrossEncoderReranker(self.reranker_model_name)
+        return self._reranker
+    
+    def _get_sparse_tokenizer(self):
+        """
+        설정된 BM25 토크나이저 생성
+        """
+        from korean_tokenizer import create_tokenizer
+        
+        return create_tokenizer(self.sparse_tokenizer)
+    
+    def _get_token_cache(self):
+        """
+        토크나이저별 영구 토큰 캐시
+        """
+        from korean_tokenizer import TokenCache, token_cache_path
+        
+        return TokenCache(token_cache_path(self.token_cache_path, self._get_sparse_tokenizer()))
+    
+    def _get_bm25_retriever(self, vectorstore):
+        """
+        벡터 스토어의 문서로 BM25 검색기 생성 (같은 스토어/토크나이저면 재사용)
+        """
+        from korean_tokenizer import build_bm25_retriever
+        
+        cache_key = (id(vectorstore), vectorstore.index.ntotal, self.sparse_tokenizer)
+        if self._bm25_retriever is None or self._bm25_retriever[0] != cache_key:
+            # 디스크 기반 스토어의 docstore는 SQLite에서 문서를 순회
+            docstore = vectorstore.docstore
+            documents = docstore.iter_documents() if hasattr(docstore, "iter_documents") else docstore._dict.values()
+            retriever = build_bm25_retriever(
+                documents,
+                self._get_sparse_tokenizer(),
+                self._get_token_cache()
             )
-        else:
-            # 기본 유사도 검색
-            docs = vectorstore.similarity_search(query, k=k)
+            self._bm25_retriever = (cache_key, retriever)
         
-        return docs
+        return self._bm25_retriever[1]
     
     def search_hybrid(self, query, vectorstore, k=5, filter_dict=None):
         """
@@ -1825,45 +2433,437 @@ class MedicalVectorStore:
             logger.error("유효한 벡터 스토어가 없습니다.")
             return []
         
-        # 키워드 검색을 위한 인덱스 생성
-        from langchain.retrievers import BM25Retriever
+        # 핫 리로드 스토어는 검색하는 동안 한 버전으로 고정
+        vectorstore = getattr(vectorstore, "current", vectorstore)
         
-        # BM25 검색기 생성
-        all_documents = vectorstore.docstore._dict.values()
-        bm25_retriever = BM25Retriever.from_documents(all_documents)
+        # 키워드 검색을 위한 BM25 검색기 (한국어 토크나이저, 스토어별로 한 번만 생성)
+        bm25_retriever = self._get_bm25_retriever(vectorstore)
         bm25_retriever.k = k
         
-        # 두 검색 결과 결합
-        vector_results = set(doc.page_content for doc in self.search_similar_documents(query, vectorstore, k, filter_dict))
-        keyword_results = set(doc.page_content for doc in bm25_retriever.get_relevant_documents(query))
+        # 두 검색 결과 결합 (결과 문서만 사용 - 전체 문서를 순회하지 않으므로 디스크 기반 스토어도 그대로 동작)
+        vector_docs = self.search_similar_documents(query, vectorstore, k, filter_dict)
+        keyword_docs = bm25_retriever.get_relevant_documents(query)
+        vector_results = set(doc.page_content for doc in vector_docs)
+        keyword_results = set(doc.page_content for doc in keyword_docs)
+        
+        # 두 결과 모두에 있는 문서 우선, 그다음 벡터 검색 결과만, 키워드 검색 결과만 있는 문서 (각각 검색 순위 순)
+        combined_results, seen = [], set()
+        for doc in (
+            [doc for doc in vector_docs if doc.page_content in keyword_results]
+            + [doc for doc in vector_docs if doc.page_content not in keyword_results]
+            + [doc for doc in keyword_docs if doc.page_content not in vector_results]
+        ):
+            if doc.page_content not in seen:
+                seen.add(doc.page_content)
+                combined_results.append(doc)
+        
+        return combined_results[:k]
+    
+    def search_by_patient(self, query, vectorstore, k=5, fetch_k=None, aggregation="max",
+                          use_mmr=False, lambda_mult=0.5, chunks_per_patient=3, filter_dict=None):
+        """
+        환자 단위 검색 (한 환자의 여러 청크가 top-k를 독점하지 않도록 환자별로 묶어 k명 반환)
         
-        # 두 결과 모두에 있는 문서 우선
-        combined_results = []
+        Args:
+            aggregation: 환자 점수 집계 방식 ("max" 또는 "sum")
+            use_mmr: 환자 대표 벡터에 MMR을 적용해 서로 비슷한 환자 중복 완화
+            lambda_mult: MMR 관련도 가중치 (1에 가까울수록 관련도 우선)
+        """
+        if not vectorstore:
+            logger.error("유효한 벡터 스토어가 없습니다.")
+            return []
         
-        # 두 결과 모두에 있는 문서
-        for doc in all_documents:
-            if doc.page_content in vector_results and doc.page_content in keyword_results:
-                combined_results.append(doc)
+        # 핫 리로드 스토어는 검색하는 동안 한 버전으로 고정
+        vectorstore = getattr(vectorstore, "current", vectorstore)
         
-        # 벡터 검색 결과만 있는 문서
-        for doc in all_documents:
-            if doc.page_content in vector_results and doc.page_content not in keyword_results:
-                if len(combined_results) < k:
-                    combined_results.append(doc)
+        from patient_grouping import search_patients
         
-        # 키워드 검색 결과만 있는 문서
-        for doc in all_documents:
-            if doc.page_content not in vector_results and doc.page_content in keyword_results:
-                if len(combined_results) < k:
-                    combined_results.append(doc)
+        logger.info(f"환자 단위 검색 중: {query}")
         
-        return combined_results[:k]
+        query_vector = self.embeddings.embed_query(query)
+        return search_patients(
+            vectorstore,
+            query_vector,
+            k=k,
+            fetch_k=fetch_k,
+            aggregation=aggregation,
+            use_mmr=use_mmr,
+            lambda_mult=lambda_mult,
+            chunks_per_patient=chunks_per_patient,
+            filter_dict=filter_dict
+        )
+    
+    def replay_query_workload(self, workload_path, vectorstore, target_qps=10.0, k=10,
+                              method="similarity", max_workers=8, max_queries=None, **search_kwargs):
+        """
+        질의 워크로드를 목표 QPS로 재생하여 지연 시간 분위수와 recall@k 측정
+        
+        Args:
+            method: "similarity"(청크 검색), "hybrid"(BM25 + 벡터), "patient"(환자 단위 검색),
+                "hierarchical"(환자 -> 청크 계층적 검색)
+            search_kwargs: 검색 함수에 그대로 전달 - 방식별로 받는 인자만 허용 (그 외 인자는 오류로 거부)
+                similarity      rerank, rerank_candidates, latency_budget_ms, normalize_terms
+                                (예: rerank=True, latency_budget_ms=200)
+                hybrid          없음
+                patient         fetch_k, aggregation, use_mmr, lambda_mult, chunks_per_patient
+                hierarchical    top_patients, pooling
+        """
+        import inspect
+        
+        from query_workload import read_workload, replay_workload
+        
+        search_functions = {
+            "similarity": self.search_similar_documents,
+            "hybrid": self.search_hybrid,
+            "hierarchical": self.search_hierarchical,
+            "patient": self.search_by_patient,
+        }
+        if method not in search_functions:
+            logger.error(f"지원하지 않는 검색 방식입니다: {method}")
+            return None
+        
+        # 지원하지 않는 인자는 질의마다 TypeError가 되어 오류 수로만 집계되므로 재생 전에 거부
+        search = search_functions[method]
+        accepted = set(inspect.signature(search).parameters) - {"query", "vectorstore", "k", "filter_dict"}
+        unsupported = sorted(set(search_kwargs) - accepted)
+        if unsupported:
+            logger.error(f"{method} 검색은 {unsupported} 인자를 지원하지 않습니다 (지원: {sorted(accepted) or '없음'})")
+            return None
+        
+        def run_search(q):
+            return search(q["query"], vectorstore, k=k, filter_dict=q.get("filters") or None, **search_kwargs)
+        
+        report = replay_workload(
+            read_workload(workload_path), run_search, target_qps=target_qps,
+            max_workers=max_workers, k=k, max_queries=max_queries
+        )
+        logger.info(
+            f"워크로드 재생 완료 ({method}): {report['queries']}개 질의, {report['achieved_qps']:.1f} QPS, "
+            f"p95 {report['latency_ms']['p95']}ms, recall@{k} {report['mean_recall_at_k']}"
+        )
+        return report
+    
+    def get_cohort_index(self, refresh=False):
+        """
+        *_patients.json으로부터 코호트 비트맵 인덱스 생성 (한 번 생성 후 재사용)
+        """
+        from cohort_index import CohortIndex
+        
+        if self._cohort_index is None or refresh:
+            self._cohort_index = CohortIndex.from_json_files(self.data_path)
+        
+        return self._cohort_index
+    
+    def count_cohort(self, **conditions):
+        """
+        정형 조건(CohortIndex.cohort와 같은 인자)을 만족하는 환자 수
+        
+        예: count_cohort(medications_all=["와파린", "아스피린"])
+            count_cohort(diagnoses_all=["당뇨"], allergies_any=["페니실린"])
+        """
+        return self.get_cohort_index().count(**conditions)
+    
+    def get_temporal_index(self, refresh=False):
+        """
+        *_patients.json으로부터 환자별 시계열 인덱스 생성 (한 번 생성 후 재사용)
+        """
+        from temporal_index import TemporalIndex
+        
+        if self._temporal_index is None or refresh:
+            self._temporal_index = TemporalIndex.from_json_files(self.data_path)
+        
+        return self._temporal_index
+    
+    def search_temporal(self, query, vectorstore, item, days=None, k=5, document_type=None,
+                        recency_half_life_days=None, **conditions):
+        """
+        시간 조건 검색 - 시계열 인덱스로 조건에 맞는 환자를 먼저 구한 뒤 그 환자들의 청크만 의미 검색
+        
+        예: search_temporal("신기능 저하 소견", vs, "크레아티닌", days=180, worsening=True)
+            search_temporal("혈압 조절", vs, "혈압", days=90, min_abnormal=2, recency_half_life_days=30)
+        
+        Args:
+            item: 검사/활력징후 항목 ("크레아티닌", "혈압", "systolic_bp", "방문" 등)
+            days: 기준일(마지막 관측일)로부터 최근 days일 - 조건 판정에 쓰고, 날짜가 있는 청크도 이 구간만 반환
+            recency_half_life_days: 지정하면 청크 날짜의 최근성으로 점수를 감쇠 (반감기, 일)
+            conditions: TemporalIndex.query 조건 (worsening, improving, min_slope, min_abnormal,
+                latest_min, latest_max, min_count ...)
+        """
+        if not vectorstore:
+            logger.error("유효한 벡터 스토어가 없습니다.")
+            return []
+        
+        # 핫 리로드 스토어는 검색하는 동안 한 버전으로 고정
+        vectorstore = getattr(vectorstore, "current", vectorstore)
+        
+        from patient_grouping import rank_patient_chunks
+        from temporal_index import document_date, recency_rescore
+        
+        temporal_index = self.get_temporal_index()
+        try:
+            patient_ids = temporal_index.query(item, days=days, **conditions)
+        except ValueError as e:
+            logger.error(f"시간 조건 검색 중 오류 발생: {e}")
+            return []
+        logger.info(f"시간 조건({item}, 최근 {days}일, {conditions})을 만족하는 환자: {len(patient_ids)}명")
+        if not patient_ids:
+            return []
+        
+        # 구간 밖 청크 제외와 최근성 재정렬에 대비해 후보를 넉넉히 가져옴
+        fetch_k = k * 4 if days or recency_half_life_days else k
+        ranked = rank_patient_chunks(
+            vectorstore,
+            self.embeddings.embed_query(query),
+            self._get_patient_positions(vectorstore),
+            patient_ids,
+            fetch_k,
+            {"document_type": document_type} if document_type else None
+        )
+        
+        if days:
+            start_date, _ = temporal_index.window_bounds(days)
+            ranked = [(doc, score) for doc, score in ranked if not document_date(doc) < start_date]
+        if recency_half_life_days:
+            ranked = recency_rescore(ranked, recency_half_life_days, temporal_index.max_date)
+        return [doc for doc, _ in ranked[:k]]
+    
+    def search_patient_chunks(self, query, vectorstore, patient_ids, k=5, filter_dict=None):
+        """
+        지정한 환자들의 청크만 대상으로 의미 검색 (정형 조건으로 환자를 먼저 좁힌 뒤 사용)
+        """
+        if not vectorstore:
+            logger.error("유효한 벡터 스토어가 없습니다.")
+            return []
+        
+        # 핫 리로드 스토어는 검색하는 동안 한 버전으로 고정
+        vectorstore = getattr(vectorstore, "current", vectorstore)
+        
+        from patient_grouping import rank_patient_chunks
+        
+        query_vector = self.embeddings.embed_query(query)
+        ranked = rank_patient_chunks(
+            vectorstore, query_vector, self._get_patient_positions(vectorstore), patient_ids, k, filter_dict
+        )
+        return [doc for doc, _ in ranked]
+    
+    def _get_patient_positions(self, vectorstore):
+        """환자 ID -> 청크 위치 매핑 (같은 스토어면 재사용)"""
+        from patient_grouping import build_patient_positions
+        
+        # 쿼리 계획기가 하위 인덱스를 번갈아 고르므로 스토어별로 보관
+        cache_key = (id(vectorstore), vectorstore.index.ntotal)
+        positions = self._patient_positions.get(cache_key)
+        if positions is None:
+            if len(self._patient_positions) >= 32:
+                self._patient_positions.clear()
+            positions = self._patient_positions[cache_key] = build_patient_positions(vectorstore)
+        return positions
+    
+    def _get_patient_index(self, vectorstore, pooling="mean"):
+        """
+        환자 대표 벡터 인덱스 (integrated_record 청크 우선 풀링, 같은 스토어/풀링이면 재사용)
+        """
+        from patient_grouping import build_patient_positions
+        from patient_index import build_patient_index
+        
+        cache_key = (id(vectorstore), vectorstore.index.ntotal, pooling)
+        if self._patient_index is None or self._patient_index[0] != cache_key:
+            integrated_positions = build_patient_positions(vectorstore, document_type="integrated_record")
+            patient_index = build_patient_index(
+                vectorstore, self._get_patient_positions(vectorstore), integrated_positions, pooling=pooling
+            )
+            self._patient_index = (cache_key, patient_index)
+        return self._patient_index[1]
+    
+    def search_hierarchical(self, query, vectorstore, k=5, top_patients=20, pooling="mean", filter_dict=None):
+        """
+        계층적 검색 - 환자 벡터 인덱스로 상위 환자를 먼저 고르고, 그 환자들의 청크만 순위화
+        
+        Args:
+            top_patients: 1단계에서 고를 환자 수 (클수록 정확하지만 2단계 비교 청크 증가, 필터를 만족하는 청크가
+                k개보다 적으면 자동으로 늘림)
+            pooling: 환자 벡터 풀링 방식 ("mean" 또는 "attention")
+        """
+        if not vectorstore:
+            logger.error("유효한 벡터 스토어가 없습니다.")
+            return []
+        
+        # 핫 리로드 스토어는 검색하는 동안 한 버전으로 고정
+        vectorstore = getattr(vectorstore, "current", vectorstore)
+        
+        from patient_index import hierarchical_search
+        
+        logger.info(f"계층적 검색 중: {query}")
+        
+        query_vector = self.embeddings.embed_query(query)
+        ranked = hierarchical_search(
+            vectorstore,
+            self._get_patient_index(vectorstore, pooling),
+            self._get_patient_positions(vectorstore),
+            query_vector,
+            k=k,
+            top_patients=top_patients,
+            filter_dict=filter_dict
+        )
+        return [doc for doc, _ in ranked]
+    
+    def get_concept_index(self, semantic=False):
+        """
+        진단 사전 기반 ICD-10 개념 인덱스
+        
+        Args:
+            semantic: True이면 동의어 임베딩도 준비 ({vector_store_path}/concept_index에 모델별로 저장해 재사용)
+        """
+        from concept_index import ConceptIndex
+        
+        if self._concept_index is None:
+            self._concept_index = ConceptIndex(MedicalDataGenerator(output_dir=self.data_path).diagnosis_dict)
+        
+        concept_index = self._concept_index
+        if semantic and concept_index.term_vectors is None:
+            from build_pipeline import stable_hash
+            
+            cache_path = self.vector_store_path / "concept_index" / (
+                stable_hash(self.embedding_model_name, concept_index.terms) + ".npy"
+            )
+            if cache_path.exists():
+                concept_index.build_term_vectors(self.embeddings, np.load(cache_path))
+            else:
+                vectors = concept_index.build_term_vectors(self.embeddings)
+                cache_path.parent.mkdir(parents=True, exist_ok=True)
+                np.save(cache_path, vectors)
+                logger.info(f"동의어 임베딩 {len(vectors)}개 저장: {cache_path}")
+        return concept_index
+    
+    def get_term_index(self, refresh=False):
+        """
+        진단명/동의어, 약물명/계열, 검사 항목 사전 기반 용어 자동완성 및 오타 교정 인덱스
+        """
+        from term_index import MedicalTermIndex
+        
+        if self._term_index is None or refresh:
+            self._term_index = MedicalTermIndex.from_generator(MedicalDataGenerator(output_dir=self.data_path))
+        return self._term_index
+    
+    def autocomplete_terms(self, prefix, limit=10):
+        """
+        입력 중인 용어 자동완성 ("메트포" -> 메트포르민, "메트ㅍ"처럼 음절 입력 중이어도 가능)
+        
+        Returns:
+            [{"term", "canonical", "kind", "distance"}, ...]
+        """
+        return self.get_term_index().autocomplete(prefix, limit=limit)
+    
+    def normalize_query(self, query):
+        """
+        쿼리의 오타("메트포르빈")와 부분 표기("아토르바")를 사전 용어로 교정
+        
+        Returns:
+            (정규화된 쿼리, 교정 목록)
+        """
+        return self.get_term_index().normalize_query(query)
+    
+    def map_query_to_icd10(self, query, semantic=False, threshold=0.5):
+        """
+        질의를 ICD-10 개념으로 정규화
+        
+        진단명/동의어/코드("I25", 접두사 "I2x")를 트라이로 찾고, 찾지 못했을 때 semantic=True이면
+        쿼리 임베딩과 가장 가까운 동의어로 매칭한다.
+        
+        Returns:
+            [{"icd10", "name", "department", "method", "matched", "score"}, ...]
+        """
+        concept_index = self.get_concept_index(semantic=semantic)
+        concepts = concept_index.lookup(query)
+        if not concepts and semantic:
+            concepts = concept_index.lookup_semantic(self.embeddings.embed_query(query), threshold=threshold)
+        return concepts
+    
+    def search_by_concept(self, query, vectorstore, k=5, code_prefix=None, semantic=False):
+        """
+        개념 정규화 검색 - 질의(또는 code_prefix)를 ICD-10 개념으로 바꾼 뒤, 해당 진단명의 진단 청크만
+        쿼리와 정확히 비교하여 순위화
+        
+        Args:
+            code_prefix: 코드 접두사 (예: "I2" - 모든 I2x 심장 질환 진단)
+            semantic: 사전에서 찾지 못한 표현은 동의어 임베딩으로 매칭
+        """
+        concept_index = self.get_concept_index()
+        concepts = concept_index.by_code_prefix(code_prefix) if code_prefix else self.map_query_to_icd10(query, semantic)
+        
+        if not concepts:
+            logger.info(f"일치하는 ICD-10 개념이 없어 일반 검색으로 진행합니다: {query}")
+            return self.search_similar_documents(query, vectorstore, k)
+        
+        # 핫 리로드 스토어는 검색하는 동안 한 버전으로 고정
+        vectorstore = getattr(vectorstore, "current", vectorstore)
+        
+        from patient_grouping import build_patient_positions, rank_patient_chunks
+        
+        # 진단명 -> 진단 청크 위치 (스토어당 한 번 생성) - 근사 검색 후보에 없는 드문 진단도 빠짐없이 비교
+        cache_key = (id(vectorstore), vectorstore.index.ntotal)
+        if self._diagnosis_positions is None or self._diagnosis_positions[0] != cache_key:
+            self._diagnosis_positions = (
+                cache_key,
+                build_patient_positions(vectorstore, key="diagnosis_name", document_type="diagnosis")
+            )
+        
+        names = sorted({concept["name"] for concept in concepts})
+        logger.info("ICD-10 개념: " + ", ".join(f"{c['icd10']}({c['name']})" for c in concepts))
+        ranked = rank_patient_chunks(
+            vectorstore, self.embeddings.embed_query(query), self._diagnosis_positions[1], names, k
+        )
+        return [doc for doc, _ in ranked]
     
     def advanced_medical_search(self, query, vectorstore, age_filter=None, gender=None, department=None, 
-                              diagnosis=None, date_range=None, document_type=None, k=5):
+                              diagnosis=None, date_range=None, document_type=None, k=5,
+                              diagnoses_all=None, medications=None, allergies=None):
         """
         고급 의료 검색 (다양한 필터 조합)
+        
+        나이/성별/진료과/진단/약물/알레르기 조건은 코호트 비트맵 인덱스에서 정확히 처리하고,
+        조건을 만족하는 환자의 청크만 의미 검색으로 순위화한다.
+        환자 데이터 파일이 없으면 벡터 스토어 메타데이터 필터로 검색한다.
+        
+        vectorstore에 create_vector_indices의 인덱스 dict(또는 get_query_planner())를 넘기면
+        문서 유형/진료과 조건을 포함하는 가장 작은 하위 인덱스에서 검색한다.
+        
+        Args:
+            diagnosis: 진단명/동의어/영문명/ICD-10 코드 (진단 사전의 개념으로 해석)
+            diagnoses_all: 모두 가져야 하는 진단 조건 목록 (이름 일부 또는 ICD-10 접두사, 튜플은 OR)
+                예: [("I2", "I3", "I4", "I5"), "당뇨"] -> 심장 질환과 당뇨병을 동시에 가진 환자
+            medications: 모두 처방받은 약물 목록
+            allergies: 하나라도 가진 알레르기 목록
         """
+        structured = any([age_filter, gender, department, diagnosis, diagnoses_all, medications, allergies])
+        cohort_index = self.get_cohort_index() if structured else None
+        
+        if cohort_index is not None and len(cohort_index) > 0:
+            min_age, max_age = age_filter if age_filter else (None, None)
+            diagnosis_groups = list(diagnoses_all or [])
+            if diagnosis:
+                # 동의어/영문명/코드로 입력해도 사전의 ICD-10 코드로 바꿔 조건에 사용 (코드 중 하나면 일치)
+                codes = tuple(sorted({concept["icd10"] for concept in self.get_concept_index().lookup(diagnosis)}))
+                diagnosis_groups.insert(0, codes or diagnosis)
+            patient_ids = cohort_index.query(
+                min_age=min_age,
+                max_age=max_age,
+                gender=gender,
+                department=department,
+                diagnoses_all=diagnosis_groups,
+                medications_all=medications,
+                allergies_any=allergies
+            )
+            logger.info(f"정형 조건을 만족하는 환자: {len(patient_ids)}명")
+            
+            chunk_filter = {"document_type": document_type} if document_type else None
+            # 환자 진료과 조건은 청크의 진료과와 같으므로 진료과 인덱스 선택에도 사용
+            vectorstore, chunk_filter = self._plan_search(
+                vectorstore, chunk_filter, implied={"department": department} if department else None
+            )
+            docs = self.search_patient_chunks(query, vectorstore, patient_ids, k, chunk_filter)
+            return self._filter_by_date_range(docs, date_range)
+        
         # 필터 딕셔너리 구성
         filter_dict = {}
         
@@ -1878,15 +2878,24 @@ class MedicalVectorStore:
             filter_dict["department"] = department
         
         if diagnosis:
-            filter_dict["diagnosis_name"] = diagnosis
+            # 동의어/영문명/코드로 입력해도 사전의 진단명으로 정확히 필터링
+            concept_index = self.get_concept_index()
+            concept_filter = concept_index.diagnosis_filter(concept_index.lookup(diagnosis))
+            filter_dict.update(concept_filter or {"diagnosis_name": diagnosis})
         
         if document_type:
             filter_dict["document_type"] = document_type
         
-        # 다양한 필터 조합을 적용한 검색
+        # 다양한 필터 조합을 적용한 검색 (인덱스 dict이면 필터를 포함하는 가장 작은 인덱스에서)
+        vectorstore, filter_dict = self._plan_search(vectorstore, filter_dict)
         docs = self.search_similar_documents(query, vectorstore, k, filter_dict)
         
-        # 후처리: 날짜 필터링 (벡터 스토어의 기본 기능에 없는 경우)
+        return self._filter_by_date_range(docs, date_range)
+    
+    def _filter_by_date_range(self, docs, date_range):
+        """
+        후처리: 날짜 필터링 (벡터 스토어의 기본 기능에 없는 경우)
+        """
         if date_range and docs:
             from datetime import datetime
             
@@ -2204,7 +3213,82 @@ class MedicalVectorStore:
                         f"department_{dept}_index"
                     )
         
+        from query_planner import QueryPlanner
+        
+        self._query_planner = QueryPlanner(indices)
+        return indices
+    
+    def load_vector_indices(self):
+        """
+        create_vector_indices로 저장한 인덱스 로드
+        
+        Returns:
+            {"general", "diagnosis", "medication", "lab_results", "visits", "dept_{진료과}": 벡터 스토어}
+        """
+        from query_planner import stored_index_names
+        
+        indices = {}
+        for name, store_name in stored_index_names(self.vector_store_path).items():
+            vectorstore = self.load_vector_store(store_name)
+            if vectorstore is not None:
+                indices[name] = vectorstore
+        logger.info(f"인덱스 {len(indices)}개 로드: {', '.join(indices)}")
         return indices
+    
+    def get_query_planner(self, refresh=False):
+        """
+        하위 인덱스 쿼리 계획기 (create_vector_indices로 만든 인덱스, 없으면 저장된 인덱스를 로드)
+        """
+        from query_planner import QueryPlanner
+        
+        if self._query_planner is None or refresh:
+            self._query_planner = QueryPlanner(self.load_vector_indices())
+        return self._query_planner
+    
+    def _plan_search(self, vectorstore, filter_dict, implied=None):
+        """
+        검색 대상 결정 - vectorstore가 인덱스 dict 또는 QueryPlanner이면 필터를 포함하는 가장 작은 인덱스와
+        그 인덱스가 보장하지 않는 나머지 필터, 단일 스토어면 그대로
+        
+        Args:
+            implied: 다른 방법(코호트 조건 등)으로 이미 보장되는 조건 - 인덱스 선택에만 쓰고 필터에는 넣지 않음
+        
+        Returns:
+            (벡터 스토어, 필터)
+        """
+        from query_planner import QueryPlanner
+        
+        if isinstance(vectorstore, dict):
+            vectorstore = QueryPlanner(vectorstore)
+        if not isinstance(vectorstore, QueryPlanner):
+            return vectorstore, filter_dict
+        
+        implied = implied or {}
+        plan = vectorstore.plan({**(filter_dict or {}), **implied})
+        if plan is None:
+            logger.error("필터 조건을 포함하는 인덱스가 없습니다.")
+            return None, filter_dict
+        residual = {field: condition for field, condition in (plan["filter"] or {}).items() if field not in implied}
+        logger.info(
+            f"쿼리 계획: {plan['index']} 인덱스 "
+            f"(벡터 {plan['size']}/{plan['total']}개, {plan['fraction']:.1%}), 남은 필터: {residual or None}"
+        )
+        return plan["vectorstore"], residual or None
+    
+    def search_with_planner(self, query, k=5, filter_dict=None, indices=None):
+        """
+        필터 조건을 완전히 포함하는 가장 작은 하위 인덱스에서 유사 문서 검색
+        
+        예: {"document_type": "medication"} -> medication 인덱스를 필터 없이 검색,
+            {"department": "cardiology", "age": {...}} -> dept_cardiology 인덱스를 age 필터로 검색
+        
+        Args:
+            indices: {인덱스 이름: 벡터 스토어} (생략하면 get_query_planner()의 인덱스)
+        """
+        vectorstore, filter_dict = self._plan_search(
+            indices if indices is not None else self.get_query_planner(), filter_dict
+        )
+        return self.search_similar_documents(query, vectorstore, k, filter_dict)
 
 
 # 메인 실행 함수
@@ -2255,6 +3339,7 @@ def main():
             vectorstore, 
             age_filter=(60, 100), 
             gender="남",
+            diagnoses_all=[("I2", "I3", "I4", "I5"), "당뇨"],
             document_type="integrated_record",
             k=3
         )
@@ -2269,6 +3354,20 @@ def main():
             print(f"내용 미리보기: {doc.page_content[:200]}...")
             print("-" * 50)
         
+        # 환자 단위 검색 (환자별 그룹화 + MMR)
+        query = "당뇨 환자"
+        patient_results = vs_builder.search_by_patient(query, vectorstore, k=3, use_mmr=True)
+        
+        print(f"\n환자 단위 검색 쿼리: {query}")
+        print(f"검색 결과 ({len(patient_results)}명):")
+        for i, result in enumerate(patient_results, 1):
+            print(f"\n결과 {i}:")
+            print(f"환자 ID: {result['patient_id']}")
+            print(f"점수: {result['score']:.4f}")
+            print(f"근거 청크 수: {len(result['chunks'])}")
+            print(f"내용 미리보기: {result['chunks'][0].page_content[:200]}...")
+            print("-" * 50)
+        
         # 의미론적 질의 확장 검색
         query = "흉부 증상이 있는 환자"
         # 여기서도 변수명 수정 (vector_store -> vs_builder)
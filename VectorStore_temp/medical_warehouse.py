@@ -0,0 +1,249 @@
+"""
+환자 데이터 Parquet 웨어하우스 및 검사 결과 분석
+
+중첩 JSON(patient["lab_results"][i]["results"][test])을 평탄화하여 진료과별로 파티션된
+Parquet 테이블로 저장하고, 자주 쓰는 집계(검사 항목별 이상 비율, 진료과별 활력징후 등)를
+pandas 벡터화 groupby로 제공한다.
+
+디렉토리 구조:
+    {warehouse}/
+        patients/department=cardiology/part-0.parquet
+        diagnoses/...
+        medications/...
+        lab_values/...      # 검사 항목 값당 1행
+        visits/...
+        vitals/...          # 방문별 활력징후
+        procedures/...
+
+사용 예:
+    python medical_warehouse.py export ./medical_data ./warehouse
+    python medical_warehouse.py report ./warehouse
+"""
+import argparse
+import logging
+import shutil
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from dataset_io import VITAL_COLUMNS, flatten_patient_records
+
+logger = logging.getLogger(__name__)
+
+# 웨어하우스 테이블 (알레르기는 patients.allergies 리스트 컬럼으로 저장)
+TABLES = ("patients", "diagnoses", "medications", "lab_values", "visits", "vitals", "procedures")
+
+
+def flatten_records(records):
+    """
+    (patient, department) 목록을 테이블별 DataFrame으로 평탄화 (dataset_io.flatten_patient_records + 타입 지정)
+
+    컬럼별 리스트에 값을 모은 뒤 한 번에 DataFrame으로 만든다 (행 단위 dict 생성보다 빠름).
+    """
+    columns = flatten_patient_records(records, TABLES)
+    return {table: _typed_frame(table, pd.DataFrame(values)) for table, values in columns.items()}
+
+
+def _typed_frame(table, frame):
+    """테이블별 컬럼 타입 지정 (날짜, 범주형, 수치형)"""
+    if frame.empty:
+        return frame
+
+    for column in ("date", "birthdate", "prescription_date"):
+        if column in frame:
+            frame[column] = pd.to_datetime(frame[column], errors="coerce")
+
+    categorical = {
+        "department", "gender", "blood_type", "insurance", "smoking_status", "alcohol_status",
+        "status", "severity", "confidence", "drug_class", "test_type", "test_name", "unit", "flag",
+        "visit_type", "anesthesia", "outcome",
+    }
+    for column in frame.columns:
+        if column in categorical:
+            frame[column] = frame[column].astype("category")
+
+    numeric = {"age", "height", "weight", "bmi", "value", "duration_days", "duration_minutes", *VITAL_COLUMNS}
+    for column in frame.columns:
+        if column in numeric:
+            frame[column] = pd.to_numeric(frame[column], errors="coerce").astype("float32")
+    return frame
+
+
+def load_json_records(data_path, file_pattern="*_patients*"):
+    """환자 데이터 파일(json, jsonl, jsonl.gz, parquet)에서 (patient, department) 레코드 순회"""
+    from dataset_io import iter_patient_records
+
+    return iter_patient_records(data_path, file_pattern)
+
+
+def export_warehouse(records, warehouse_path, partition_cols=("department",)):
+    """
+    평탄화한 테이블을 파티션된 Parquet으로 저장 (기존 테이블은 교체)
+
+    Returns:
+        {테이블명: 행 수}
+    """
+    warehouse_path = Path(warehouse_path)
+    warehouse_path.mkdir(parents=True, exist_ok=True)
+    frames = flatten_records(records)
+
+    counts = {}
+    for table, frame in frames.items():
+        table_path = warehouse_path / table
+        if table_path.exists():
+            shutil.rmtree(table_path)
+        counts[table] = len(frame)
+        if frame.empty:
+            continue
+
+        # 범주형 파티션 컬럼은 문자열로 저장해야 디렉토리 이름이 값 그대로 유지됨
+        frame = frame.astype({col: "string" for col in partition_cols if col in frame})
+        frame.to_parquet(
+            table_path,
+            engine="pyarrow",
+            index=False,
+            partition_cols=[col for col in partition_cols if col in frame],
+        )
+
+    logger.info(f"Parquet 웨어하우스 저장 완료 ({warehouse_path}): {counts}")
+    return counts
+
+
+class MedicalWarehouse:
+    """
+    Parquet 웨어하우스 분석 API (테이블은 처음 사용할 때 로드하여 캐시)
+    """
+    def __init__(self, warehouse_path):
+        self.warehouse_path = Path(warehouse_path)
+        self._tables = {}
+
+    def table(self, name, columns=None, filters=None):
+        """
+        테이블 로드 (columns/filters를 주면 캐시하지 않고 필요한 부분만 읽음)
+
+        Args:
+            filters: pyarrow 필터 (예: [("department", "=", "cardiology")]) - 파티션 가지치기에 사용
+        """
+        if name not in TABLES:
+            raise ValueError(f"알 수 없는 테이블입니다: {name} (가능: {list(TABLES)})")
+
+        table_path = self.warehouse_path / name
+        if not table_path.exists():
+            raise FileNotFoundError(f"테이블이 없습니다: {table_path}")
+
+        if columns is not None or filters is not None:
+            return pd.read_parquet(table_path, engine="pyarrow", columns=columns, filters=filters)
+
+        if name not in self._tables:
+            frame = pd.read_parquet(table_path, engine="pyarrow")
+            self._tables[name] = frame.astype({"department": "category"}) if "department" in frame else frame
+        return self._tables[name]
+
+    def abnormal_rate(self, by=("test_name",), department=None):
+        """
+        검사 항목별 이상(H/L) 비율
+
+        Returns:
+            by 컬럼 + count, abnormal, high, low, abnormal_rate
+        """
+        labs = self.table("lab_values")
+        if department:
+            labs = labs[labs["department"] == department]
+
+        # 범주형 비교는 코드 배열 비교로 처리되어 문자열 변환 없이 빠름
+        frame = pd.DataFrame({
+            **{col: labs[col] for col in by},
+            "high": (labs["flag"] == "H").to_numpy(dtype=bool),
+            "low": (labs["flag"] == "L").to_numpy(dtype=bool),
+        })
+        result = frame.groupby(list(by), observed=True).agg(
+            count=("high", "size"), high=("high", "sum"), low=("low", "sum")
+        )
+        result["abnormal"] = result["high"] + result["low"]
+        result["abnormal_rate"] = result["abnormal"] / result["count"]
+        return result.reset_index().sort_values("abnormal_rate", ascending=False, ignore_index=True)
+
+    def lab_summary(self, test_name=None, by=("test_name",), percentiles=(0.05, 0.5, 0.95)):
+        """
+        검사 항목 값 분포 요약 (평균, 표준편차, 최소/최대, 백분위)
+        """
+        labs = self.table("lab_values")
+        if test_name:
+            labs = labs[labs["test_name"].isin([test_name] if isinstance(test_name, str) else test_name)]
+
+        grouped = labs.groupby(list(by), observed=True)["value"]
+        result = grouped.agg(["count", "mean", "std", "min", "max"])
+        quantiles = grouped.quantile(list(percentiles)).unstack()
+        quantiles.columns = [f"p{int(q * 100)}" for q in quantiles.columns]
+        return result.join(quantiles).reset_index()
+
+    def lab_trend(self, test_name, freq="MS", by=None):
+        """
+        검사 항목의 기간별 평균값과 이상 비율 추이
+        """
+        labs = self.table("lab_values")
+        labs = labs[labs["test_name"] == test_name]
+        keys = [pd.Grouper(key="date", freq=freq)] + list(by or [])
+        frame = labs.assign(abnormal=labs["flag"].isin(["H", "L"]).to_numpy(dtype=bool))
+        return frame.groupby(keys, observed=True).agg(
+            count=("value", "size"), mean=("value", "mean"), abnormal_rate=("abnormal", "mean")
+        ).reset_index()
+
+    def out_of_range_patients(self, test_name, latest_only=True):
+        """
+        정상 범위를 벗어난 검사 결과를 가진 환자 (기본: 환자별 가장 최근 검사 기준)
+        """
+        labs = self.table("lab_values")
+        labs = labs[labs["test_name"] == test_name]
+        if latest_only:
+            labs = labs.sort_values("date").drop_duplicates("patient_id", keep="last")
+
+        outside = (labs["value"] < labs["normal_low"]) | (labs["value"] > labs["normal_high"])
+        return labs.loc[outside, ["patient_id", "department", "date", "value", "normal_low", "normal_high", "flag"]]
+
+    def vitals_summary(self, by=("department",)):
+        """진료과별 활력징후 평균"""
+        vitals = self.table("vitals")
+        return vitals.groupby(list(by), observed=True)[VITAL_COLUMNS].mean().reset_index()
+
+    def diagnosis_counts(self, by=("department", "name")):
+        """진단별 환자 수"""
+        diagnoses = self.table("diagnoses")
+        return (diagnoses.groupby(list(by), observed=True)["patient_id"].nunique()
+                .rename("patients").reset_index()
+                .sort_values("patients", ascending=False, ignore_index=True))
+
+    def report(self):
+        """자주 쓰는 집계를 한 번에 계산 (소요 시간 포함)"""
+        start = time.perf_counter()
+        result = {
+            "abnormal_rate_by_test": self.abnormal_rate(),
+            "abnormal_rate_by_department": self.abnormal_rate(by=("department", "test_name")),
+            "vitals_by_department": self.vitals_summary(),
+            "top_diagnoses": self.diagnosis_counts().head(20),
+        }
+        logger.info(f"웨어하우스 리포트 계산 완료: {time.perf_counter() - start:.3f}초")
+        return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="환자 데이터 Parquet 웨어하우스")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="JSON 환자 데이터를 Parquet으로 변환")
+    export_parser.add_argument("data_path")
+    export_parser.add_argument("warehouse_path")
+
+    report_parser = subparsers.add_parser("report", help="기본 집계 리포트 출력")
+    report_parser.add_argument("warehouse_path")
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if args.command == "export":
+        export_warehouse(load_json_records(args.data_path), args.warehouse_path)
+    else:
+        for title, frame in MedicalWarehouse(args.warehouse_path).report().items():
+            print(f"\n[{title}]")
+            print(frame.to_string(index=False))
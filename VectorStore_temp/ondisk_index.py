@@ -0,0 +1,349 @@
+"""
+메모리보다 큰 인덱스를 위한 디스크 기반 IVF 벡터 스토어
+
+    - 거친 양자화기(coarse centroid)만 메모리에 두고, 역색인 리스트(inverted list)는 .ivfdata 파일에
+      두어 mmap으로 읽는다. 질의 비용은 nprobe개 리스트 읽기로 제한된다.
+    - 문서 본문/메타데이터도 메모리에 올리지 않도록 SQLite 파일에 저장하고 검색 결과만 조회한다.
+    - 빌드는 배치 단위 스트리밍이다. 첫 train_size개 벡터로 중심점을 학습하고, 이후 배치마다 같은
+      양자화기를 쓰는 블록 인덱스를 디스크에 쓴 뒤 마지막에 하나의 on-disk 역색인으로 병합한다.
+
+디렉토리 구조:
+    {store_path}/
+        ivf.index               # 양자화기 + 역색인 메타데이터 (IO_FLAG_ONDISK_SAME_DIR로 로드)
+        ivf.ivfdata             # 역색인 리스트 본체 (mmap)
+        docstore.sqlite         # position -> (docstore ID, 본문, 메타데이터)
+        ondisk_manifest.json    # 벡터 수, 차원, nlist, 생성 시각
+"""
+import json
+import logging
+import math
+import os
+import shutil
+import sqlite3
+import threading
+import uuid
+from collections.abc import Mapping
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILENAME = "ivf.index"
+IVFDATA_FILENAME = "ivf.ivfdata"
+DOCSTORE_FILENAME = "docstore.sqlite"
+ONDISK_MANIFEST_FILENAME = "ondisk_manifest.json"
+
+DEFAULT_NPROBE = 16
+
+
+def is_ondisk_store(store_path):
+    return (Path(store_path) / ONDISK_MANIFEST_FILENAME).exists()
+
+
+def default_nlist(num_vectors):
+    """역색인 리스트 수 - 약 4*sqrt(N), 중심점마다 학습 벡터가 39개 이상 되도록 제한"""
+    return max(1, min(int(4 * math.sqrt(num_vectors)), num_vectors // 39))
+
+
+class SqliteDocstore:
+    """
+    SQLite 기반 읽기 전용 docstore (LangChain Docstore.search 인터페이스)
+
+    연결은 스레드마다 따로 열어 여러 검색 스레드에서 동시에 사용할 수 있다.
+    """
+    def __init__(self, path):
+        self.path = str(path)
+        self._local = threading.local()
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+            self._local.connection = connection
+        return connection
+
+    def search(self, search):
+        from langchain.schema import Document
+
+        row = self._connection().execute(
+            "SELECT page_content, metadata FROM documents WHERE doc_id = ?", (search,)
+        ).fetchone()
+        if row is None:
+            return f"ID {search} not found."
+        return Document(page_content=row[0], metadata=json.loads(row[1]))
+
+    def iter_documents(self):
+        """저장된 문서를 position 순서로 순회 (BM25 인덱스 구축 등)"""
+        from langchain.schema import Document
+
+        cursor = self._connection().execute("SELECT page_content, metadata FROM documents ORDER BY position")
+        for page_content, metadata in cursor:
+            yield Document(page_content=page_content, metadata=json.loads(metadata))
+
+    def doc_id_at(self, position):
+        row = self._connection().execute(
+            "SELECT doc_id FROM documents WHERE position = ?", (int(position),)
+        ).fetchone()
+        return row[0] if row else None
+
+    def count(self):
+        return self._connection().execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+
+class SqliteIndexToDocstoreId(Mapping):
+    """
+    FAISS 벡터 위치 -> docstore ID 매핑 (필요한 위치만 SQLite에서 조회)
+    """
+    def __init__(self, docstore):
+        self.docstore = docstore
+
+    def __getitem__(self, position):
+        doc_id = self.docstore.doc_id_at(position)
+        if doc_id is None:
+            raise KeyError(position)
+        return doc_id
+
+    def __iter__(self):
+        return iter(range(len(self)))
+
+    def __len__(self):
+        return self.docstore.count()
+
+
+class OnDiskIVFBuilder:
+    """
+    디스크 기반 IVF 인덱스 스트리밍 빌더
+
+    Args:
+        output_dir: 결과 디렉토리 (비어 있거나 없어야 함)
+        dimension: 벡터 차원
+        nlist: 역색인 리스트 수
+    """
+    def __init__(self, output_dir, dimension, nlist):
+        import faiss
+
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.blocks_dir = self.output_dir / ".blocks"
+        self.blocks_dir.mkdir(exist_ok=True)
+        self.dimension = dimension
+        self.nlist = nlist
+
+        self.index = faiss.IndexIVFFlat(faiss.IndexFlatL2(dimension), dimension, nlist, faiss.METRIC_L2)
+        self.block_paths = []
+        self.num_vectors = 0
+
+        self._db = sqlite3.connect(self.output_dir / DOCSTORE_FILENAME)
+        self._db.execute(
+            "CREATE TABLE documents ("
+            "position INTEGER PRIMARY KEY, doc_id TEXT NOT NULL, page_content TEXT NOT NULL, metadata TEXT NOT NULL)"
+        )
+
+    def train(self, sample_vectors):
+        sample_vectors = np.ascontiguousarray(sample_vectors, dtype=np.float32)
+        logger.info(f"IVF 중심점 {self.nlist}개 학습 중 (학습 벡터 {len(sample_vectors)}개)...")
+        self.index.train(sample_vectors)
+
+    def add(self, vectors, documents, doc_ids):
+        """
+        벡터 배치 추가 - 같은 양자화기를 쓰는 블록 인덱스 파일과 SQLite 문서 행으로 기록
+        """
+        import faiss
+
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        positions = np.arange(self.num_vectors, self.num_vectors + len(vectors), dtype=np.int64)
+
+        block = faiss.clone_index(self.index)
+        block.add_with_ids(vectors, positions)
+        block_path = self.blocks_dir / f"block-{len(self.block_paths):05d}.index"
+        faiss.write_index(block, str(block_path))
+        self.block_paths.append(block_path)
+
+        self._db.executemany(
+            "INSERT INTO documents (position, doc_id, page_content, metadata) VALUES (?, ?, ?, ?)",
+            [
+                (int(position), doc_id, doc.page_content, json.dumps(doc.metadata, ensure_ascii=False, default=str))
+                for position, doc_id, doc in zip(positions, doc_ids, documents)
+            ]
+        )
+        self._db.commit()
+        self.num_vectors += len(vectors)
+
+    def finalize(self, extra_manifest=None):
+        """블록 인덱스를 하나의 on-disk 역색인으로 병합하고 매니페스트 기록"""
+        import faiss
+        from faiss.contrib.ondisk import merge_ondisk
+
+        self._db.execute("CREATE INDEX documents_doc_id ON documents (doc_id)")
+        self._db.commit()
+        self._db.close()
+
+        # 로드 시 IO_FLAG_ONDISK_SAME_DIR로 ivfdata를 인덱스 파일 옆에서 찾으므로 디렉토리를 옮겨도 됨
+        merge_ondisk(self.index, [str(path) for path in self.block_paths], str(self.output_dir / IVFDATA_FILENAME))
+        faiss.write_index(self.index, str(self.output_dir / INDEX_FILENAME))
+        shutil.rmtree(self.blocks_dir, ignore_errors=True)
+
+        manifest = {
+            "layout": "ondisk_ivf",
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "num_vectors": self.num_vectors,
+            "dimension": self.dimension,
+            "nlist": self.nlist,
+        }
+        if extra_manifest:
+            manifest.update(extra_manifest)
+        with open(self.output_dir / ONDISK_MANIFEST_FILENAME, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        return manifest
+
+
+def iter_chunk_batches(chunks, embeddings, batch_size=4096, id_fn=None):
+    """청크를 배치 단위로 임베딩 - (벡터 배열, 문서 목록, docstore ID 목록), 중복 청크는 제외"""
+    if id_fn is None:
+        from parallel_embedding import chunk_id as id_fn
+
+    seen = set()
+    for start in range(0, len(chunks), batch_size):
+        batch, doc_ids = [], []
+        for chunk in chunks[start:start + batch_size]:
+            doc_id = id_fn(chunk)
+            if doc_id not in seen:
+                seen.add(doc_id)
+                batch.append(chunk)
+                doc_ids.append(doc_id)
+        if not batch:
+            continue
+        vectors = np.asarray(embeddings.embed_documents([chunk.page_content for chunk in batch]), dtype=np.float32)
+        yield vectors, batch, doc_ids
+
+
+def iter_faiss_store_batches(vectorstore, batch_size=4096):
+    """기존 FAISS 벡터 스토어의 벡터와 문서를 배치 단위로 꺼냄 (메모리 인덱스 -> 디스크 인덱스 변환용)"""
+    total = vectorstore.index.ntotal
+    for start in range(0, total, batch_size):
+        count = min(batch_size, total - start)
+        doc_ids = [vectorstore.index_to_docstore_id[position] for position in range(start, start + count)]
+        documents = [vectorstore.docstore.search(doc_id) for doc_id in doc_ids]
+        yield vectorstore.index.reconstruct_n(start, count), documents, doc_ids
+
+
+def build_ondisk_store(batches, store_path, nlist=None, train_size=50_000, extra_manifest=None):
+    """
+    배치 스트림으로부터 디스크 기반 IVF 스토어 생성
+
+    임시 디렉토리에 빌드한 뒤 store_path로 교체하므로 실패해도 기존 스토어는 남는다.
+
+    Args:
+        batches: (벡터 배열, 문서 목록, docstore ID 목록) iterable
+        nlist: 역색인 리스트 수 (기본: 학습 벡터 수 기준 default_nlist)
+        train_size: 중심점 학습에 사용할 최대 벡터 수 (이만큼은 메모리에 버퍼링)
+    """
+    store_path = Path(store_path)
+    store_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = store_path.parent / f".{store_path.name}.tmp-{uuid.uuid4().hex}"
+
+    builder = None
+    buffered = []
+    buffered_count = 0
+    try:
+        for vectors, documents, doc_ids in batches:
+            if builder is None:
+                buffered.append((vectors, documents, doc_ids))
+                buffered_count += len(vectors)
+                if buffered_count < train_size:
+                    continue
+                builder = _start_builder(tmp_path, buffered, nlist, train_size)
+                buffered = []
+            else:
+                builder.add(vectors, documents, doc_ids)
+
+        if builder is None:
+            if not buffered_count:
+                raise ValueError("디스크 인덱스를 만들 벡터가 없습니다.")
+            builder = _start_builder(tmp_path, buffered, nlist, train_size)
+
+        manifest = builder.finalize(extra_manifest)
+    except Exception:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+
+    # 기존 스토어는 옆으로 옮긴 뒤 교체
+    old_path = None
+    if store_path.exists():
+        old_path = store_path.parent / f".{store_path.name}.old-{uuid.uuid4().hex}"
+        os.rename(store_path, old_path)
+    os.rename(tmp_path, store_path)
+    if old_path:
+        shutil.rmtree(old_path, ignore_errors=True)
+
+    logger.info(
+        f"디스크 기반 IVF 스토어 생성 완료: {store_path} (벡터 {manifest['num_vectors']}개, nlist {manifest['nlist']})"
+    )
+    return manifest
+
+
+def _start_builder(tmp_path, buffered, nlist, train_size):
+    sample = np.vstack([vectors for vectors, _, _ in buffered])[:train_size]
+    builder = OnDiskIVFBuilder(tmp_path, sample.shape[1], nlist or default_nlist(len(sample)))
+    builder.train(sample)
+    for vectors, documents, doc_ids in buffered:
+        builder.add(vectors, documents, doc_ids)
+    return builder
+
+
+def prepare_ivf_index(index, nprobe=None):
+    """
+    IVF 인덱스 검색 준비 - nprobe 설정과 reconstruct용 direct map 생성 (IVF가 아니면 그대로 반환)
+
+    Args:
+        nprobe: 질의마다 탐색할 역색인 리스트 수 (None이면 인덱스에 저장된 값 유지)
+    """
+    import faiss
+
+    try:
+        ivf = faiss.extract_index_ivf(index)
+    except RuntimeError:
+        return index
+    if nprobe:
+        ivf.nprobe = nprobe
+    # 위치 -> 역색인 항목 매핑 (벡터당 8바이트) - 환자 단위 검색의 벡터 reconstruct에 필요
+    if ivf.direct_map.type == faiss.DirectMap.NoMap:
+        ivf.make_direct_map()
+    return index
+
+
+def load_faiss_store(store_path, embeddings, nprobe=None):
+    """
+    FAISS.load_local로 저장된 스토어 로드 - IVF 인덱스면 prepare_ivf_index까지 적용
+    """
+    from langchain_community.vectorstores import FAISS
+
+    vectorstore = FAISS.load_local(str(store_path), embeddings, allow_dangerous_deserialization=True)
+    prepare_ivf_index(vectorstore.index, nprobe)
+    return vectorstore
+
+
+def load_ondisk_store(store_path, embeddings, nprobe=DEFAULT_NPROBE):
+    """
+    디스크 기반 IVF 스토어 로드 - 역색인은 mmap, 문서는 SQLite에서 필요할 때 조회
+
+    Args:
+        nprobe: 질의마다 탐색할 역색인 리스트 수 (클수록 정확하지만 디스크 읽기 증가)
+    """
+    import faiss
+    from langchain_community.vectorstores import FAISS
+
+    store_path = Path(store_path)
+    index = prepare_ivf_index(
+        faiss.read_index(str(store_path / INDEX_FILENAME), faiss.IO_FLAG_ONDISK_SAME_DIR), nprobe
+    )
+
+    docstore = SqliteDocstore(store_path / DOCSTORE_FILENAME)
+    return FAISS(
+        embedding_function=embeddings,
+        index=index,
+        docstore=docstore,
+        index_to_docstore_id=SqliteIndexToDocstoreId(docstore),
+    )
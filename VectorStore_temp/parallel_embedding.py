@@ -0,0 +1,185 @@
+"""
+다중 프로세스 임베딩과 부분 인덱스 병합
+
+청크 목록을 N개의 작업 프로세스에 나누어 주고, 작업자마다 자체 임베딩 모델과 스레드 수
+(torch/OpenMP/MKL)를 두어 부분 FAISS 인덱스를 만든다. 부분 인덱스들은 벡터와 docstore ID를
+합쳐 하나의 인덱스로 병합하며, 같은 내용의 청크(내용+메타데이터 해시가 같은 ID)는 한 번만 남긴다.
+
+PyTorch는 fork 이후 스레드 풀 상태가 깨질 수 있으므로 작업 프로세스는 spawn 방식으로 시작한다.
+"""
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def huggingface_embeddings(model_name):
+    """작업 프로세스에서 임베딩 모델 생성 (functools.partial로 감싸 전달)"""
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+
+    return HuggingFaceEmbeddings(model_name=model_name)
+
+
+def chunk_id(chunk):
+    """청크 내용과 메타데이터로부터 결정적 docstore ID 생성 (중복 청크는 같은 ID)"""
+    payload = json.dumps(
+        {"text": chunk.page_content, "metadata": chunk.metadata},
+        ensure_ascii=False, sort_keys=True, default=str
+    )
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def shard_ranges(total, num_shards):
+    """[0, total)을 크기가 거의 같은 연속 구간 num_shards개로 분할 (빈 구간 제외)"""
+    bounds = np.linspace(0, total, num_shards + 1).astype(int)
+    return [(int(start), int(end)) for start, end in zip(bounds[:-1], bounds[1:]) if end > start]
+
+
+# 작업 프로세스별 임베딩 모델 (초기화 시 한 번 생성)
+_worker_embeddings = None
+
+
+def _init_embedding_worker(embeddings_factory, threads_per_worker):
+    global _worker_embeddings
+
+    # 작업자마다 스레드 수를 제한해야 코어 수를 넘는 과다 구독(oversubscription)을 피할 수 있음
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(threads_per_worker)
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+    try:
+        import torch
+
+        torch.set_num_threads(threads_per_worker)
+    except ImportError:
+        pass
+
+    _worker_embeddings = embeddings_factory()
+
+
+def _build_partial_index(task):
+    """작업 프로세스: 청크 구간 하나를 임베딩하여 부분 인덱스를 디스크에 저장"""
+    from langchain_community.vectorstores import FAISS
+
+    shard_index, texts, metadatas, ids, output_dir = task
+    partial = FAISS.from_texts(texts, _worker_embeddings, metadatas=metadatas, ids=ids)
+    partial_path = Path(output_dir) / f"part-{shard_index:04d}"
+    partial.save_local(str(partial_path))
+    return shard_index, str(partial_path), len(texts)
+
+
+def merge_faiss_indexes(partials, embeddings):
+    """
+    부분 FAISS 인덱스 병합 - 이미 포함된 docstore ID의 벡터는 건너뜀
+
+    Args:
+        partials: 병합 순서대로 정렬된 FAISS 벡터 스토어 목록
+        embeddings: 병합 결과의 질의 임베딩 함수
+
+    Returns:
+        FAISS 벡터 스토어 (IndexFlatL2, FAISS.from_documents와 같은 구성)
+    """
+    import faiss
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+    from langchain_community.vectorstores import FAISS
+
+    vectors, documents, index_to_docstore_id = [], {}, {}
+    for partial in partials:
+        count = partial.index.ntotal
+        if count == 0:
+            continue
+        partial_vectors = partial.index.reconstruct_n(0, count)
+        keep = []
+        for position in range(count):
+            doc_id = partial.index_to_docstore_id[position]
+            if doc_id in documents:
+                continue
+            documents[doc_id] = partial.docstore.search(doc_id)
+            index_to_docstore_id[len(index_to_docstore_id)] = doc_id
+            keep.append(position)
+        vectors.append(partial_vectors[keep])
+
+    if not vectors:
+        raise ValueError("병합할 벡터가 없습니다.")
+
+    matrix = np.ascontiguousarray(np.vstack(vectors), dtype=np.float32)
+    index = faiss.IndexFlatL2(matrix.shape[1])
+    index.add(matrix)
+    return FAISS(
+        embedding_function=embeddings,
+        index=index,
+        docstore=InMemoryDocstore(documents),
+        index_to_docstore_id=index_to_docstore_id,
+    )
+
+
+def build_faiss_parallel(chunks, embeddings_factory, embeddings, num_workers=2,
+                         threads_per_worker=None, work_dir=None):
+    """
+    청크를 여러 프로세스에서 임베딩하여 FAISS 벡터 스토어 생성
+
+    Args:
+        chunks: 분할된 Document 목록
+        embeddings_factory: 작업 프로세스에서 임베딩 모델을 만드는 pickle 가능한 함수
+        embeddings: 병합된 스토어에서 질의 임베딩에 사용할 모델 (주 프로세스)
+        num_workers: 작업 프로세스 수
+        threads_per_worker: 작업자당 연산 스레드 수 (기본: CPU 코어 수 / 작업자 수)
+        work_dir: 부분 인덱스 임시 디렉토리를 만들 위치 (기본: 시스템 임시 디렉토리)
+    """
+    from langchain_community.vectorstores import FAISS
+
+    # 내용이 같은 청크는 한 번만 임베딩
+    unique_chunks, ids, seen = [], [], set()
+    for chunk in chunks:
+        doc_id = chunk_id(chunk)
+        if doc_id in seen:
+            continue
+        seen.add(doc_id)
+        unique_chunks.append(chunk)
+        ids.append(doc_id)
+    if len(unique_chunks) < len(chunks):
+        logger.info(f"중복 청크 {len(chunks) - len(unique_chunks)}개 제외")
+
+    threads_per_worker = threads_per_worker or max(1, (os.cpu_count() or 1) // num_workers)
+    partial_dir = Path(tempfile.mkdtemp(prefix="partial_indexes_", dir=work_dir))
+    tasks = [
+        (
+            shard_index,
+            [chunk.page_content for chunk in unique_chunks[start:end]],
+            [chunk.metadata for chunk in unique_chunks[start:end]],
+            ids[start:end],
+            str(partial_dir),
+        )
+        for shard_index, (start, end) in enumerate(shard_ranges(len(unique_chunks), num_workers))
+    ]
+    logger.info(
+        f"{len(unique_chunks)}개 청크를 {len(tasks)}개 작업자(작업자당 {threads_per_worker}스레드)로 임베딩 중..."
+    )
+
+    try:
+        with ProcessPoolExecutor(
+            max_workers=len(tasks),
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_embedding_worker,
+            initargs=(embeddings_factory, threads_per_worker)
+        ) as executor:
+            results = sorted(executor.map(_build_partial_index, tasks))
+
+        partials = [
+            FAISS.load_local(partial_path, embeddings, allow_dangerous_deserialization=True)
+            for _, partial_path, _ in results
+        ]
+        vectorstore = merge_faiss_indexes(partials, embeddings)
+    finally:
+        shutil.rmtree(partial_dir, ignore_errors=True)
+
+    logger.info(f"부분 인덱스 {len(results)}개 병합 완료: 벡터 {vectorstore.index.ntotal}개")
+    return vectorstore
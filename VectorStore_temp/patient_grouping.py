@@ -0,0 +1,240 @@
+"""
+환자 단위 검색 결과 그룹화 및 MMR 다양화
+
+청크 단위 검색은 방문 기록이 많은 환자 한 명이 top-k를 모두 차지할 수 있으므로,
+후보를 넉넉히 가져온 뒤 patient_id로 묶어 점수를 집계(max/sum)하고,
+필요하면 환자 대표 벡터에 MMR(Maximal Marginal Relevance)을 적용해 서로 다른 환자 k명을 고른다.
+후보별 점수 계산과 그룹 집계는 모두 NumPy 행렬 연산으로 처리한다.
+"""
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+AGGREGATIONS = ("max", "sum")
+
+_FILTER_OPERATORS = {
+    "$eq": lambda value, target: value == target,
+    "$ne": lambda value, target: value != target,
+    "$gt": lambda value, target: value is not None and value > target,
+    "$gte": lambda value, target: value is not None and value >= target,
+    "$lt": lambda value, target: value is not None and value < target,
+    "$lte": lambda value, target: value is not None and value <= target,
+    "$in": lambda value, target: value in target,
+    "$nin": lambda value, target: value not in target,
+}
+
+
+def _normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def matches_filter(metadata, filter_dict):
+    """
+    메타데이터 필터 검사 (값 일치, 리스트 포함, $gte/$lte 등 비교 연산자 지원)
+    """
+    for key, condition in filter_dict.items():
+        value = metadata.get(key)
+        if isinstance(condition, dict):
+            for op, target in condition.items():
+                if op not in _FILTER_OPERATORS:
+                    raise ValueError(f"지원하지 않는 필터 연산자입니다: {op}")
+                try:
+                    if not _FILTER_OPERATORS[op](value, target):
+                        return False
+                except TypeError:
+                    return False
+        elif isinstance(condition, list):
+            if value not in condition:
+                return False
+        elif value != condition:
+            return False
+    return True
+
+
+def fetch_candidates(vectorstore, query_vector, fetch_k=100, filter_dict=None):
+    """
+    FAISS 인덱스에서 후보 청크를 가져와 (문서 리스트, 청크 벡터 행렬, 코사인 유사도) 반환
+    """
+    index = vectorstore.index
+    # 필터가 있으면 걸러질 것을 감안해 더 많이 가져옴
+    search_k = min(index.ntotal, fetch_k * 4 if filter_dict else fetch_k)
+    if search_k == 0:
+        return [], np.empty((0, index.d), dtype=np.float32), np.empty(0, dtype=np.float32)
+
+    query = np.asarray(query_vector, dtype=np.float32).reshape(1, -1)
+    _, positions = index.search(query, search_k)
+    positions = positions[0][positions[0] >= 0]
+
+    docs = []
+    kept = []
+    for position in positions:
+        doc = vectorstore.docstore.search(vectorstore.index_to_docstore_id[int(position)])
+        if filter_dict and not matches_filter(doc.metadata, filter_dict):
+            continue
+        docs.append(doc)
+        kept.append(position)
+        if len(docs) >= fetch_k:
+            break
+
+    if not docs:
+        return [], np.empty((0, index.d), dtype=np.float32), np.empty(0, dtype=np.float32)
+
+    vectors = _normalize(index.reconstruct_batch(np.asarray(kept, dtype=np.int64)))
+    scores = vectors @ _normalize(query[0])
+    return docs, vectors, scores
+
+
+def group_by_patient(docs, scores, aggregation="max", key="patient_id"):
+    """
+    후보 청크를 환자별로 묶어 점수 집계
+
+    Returns:
+        (patient_ids, patient_scores, inverse, best_positions)
+        - inverse: 각 후보가 속한 환자 인덱스
+        - best_positions: 환자별 최고 점수 후보의 위치
+    """
+    if aggregation not in AGGREGATIONS:
+        raise ValueError(f"지원하지 않는 집계 방식입니다: {aggregation} (가능: {list(AGGREGATIONS)})")
+
+    # patient_id가 없는 문서는 각자 하나의 그룹으로 취급
+    keys = np.array([str(doc.metadata.get(key) or f"__doc_{i}") for i, doc in enumerate(docs)])
+    patient_ids, inverse = np.unique(keys, return_inverse=True)
+
+    if aggregation == "sum":
+        patient_scores = np.bincount(inverse, weights=scores, minlength=len(patient_ids))
+    else:
+        patient_scores = np.full(len(patient_ids), -np.inf)
+        np.maximum.at(patient_scores, inverse, scores)
+
+    # 환자 인덱스 오름차순, 같은 환자 안에서는 점수 내림차순으로 정렬 후 각 그룹의 첫 원소
+    order = np.lexsort((-scores, inverse))
+    first = np.r_[True, inverse[order][1:] != inverse[order][:-1]]
+    best_positions = order[first]
+
+    return patient_ids, patient_scores, inverse, best_positions
+
+
+def mmr_select(relevance, vectors, k, lambda_mult=0.5):
+    """
+    MMR로 k개 선택 - 반복은 선택 횟수(k)만큼이며 각 단계는 벡터 연산
+
+    Args:
+        relevance: 항목별 쿼리 관련도 (n,)
+        vectors: 정규화된 항목 벡터 (n, d)
+    """
+    n = len(relevance)
+    k = min(k, n)
+    if k == 0:
+        return np.empty(0, dtype=np.int64)
+
+    similarity = vectors @ vectors.T
+    selected = [int(np.argmax(relevance))]
+    max_similarity = similarity[selected[0]].copy()
+    available = np.ones(n, dtype=bool)
+    available[selected[0]] = False
+
+    while len(selected) < k:
+        mmr = lambda_mult * relevance - (1 - lambda_mult) * max_similarity
+        mmr[~available] = -np.inf
+        choice = int(np.argmax(mmr))
+        selected.append(choice)
+        available[choice] = False
+        np.maximum(max_similarity, similarity[choice], out=max_similarity)
+
+    return np.asarray(selected, dtype=np.int64)
+
+
+def search_patients(vectorstore, query_vector, k=5, fetch_k=None, aggregation="max",
+                    use_mmr=False, lambda_mult=0.5, chunks_per_patient=3, filter_dict=None):
+    """
+    환자 단위 검색 - 서로 다른 환자 k명과 각 환자의 근거 청크 반환
+
+    Returns:
+        [{"patient_id", "score", "chunks": [Document, ...], "chunk_scores": [float, ...]}, ...]
+    """
+    fetch_k = fetch_k or max(k * 10, 50)
+    docs, vectors, scores = fetch_candidates(vectorstore, query_vector, fetch_k, filter_dict)
+    if not docs:
+        return []
+
+    patient_ids, patient_scores, inverse, best_positions = group_by_patient(docs, scores, aggregation)
+
+    if use_mmr:
+        # 관련도는 집계 방식과 무관하게 0~1 범위로 맞춰 유사도 페널티와 비교 가능하게 함
+        relevance = patient_scores
+        if aggregation == "sum" and patient_scores.max() > 0:
+            relevance = patient_scores / patient_scores.max()
+        selected = mmr_select(relevance, vectors[best_positions], k, lambda_mult)
+    else:
+        selected = np.argsort(-patient_scores, kind="stable")[:k]
+
+    # 선택된 환자의 근거 청크를 점수 순으로 정렬
+    order = np.lexsort((-scores, inverse))
+    sorted_groups = inverse[order]
+    starts = np.searchsorted(sorted_groups, selected, side="left")
+
+    results = []
+    for group, start in zip(selected, starts):
+        positions = order[start:start + chunks_per_patient]
+        positions = positions[inverse[positions] == group]
+        results.append({
+            "patient_id": docs[positions[0]].metadata.get("patient_id"),
+            "score": float(patient_scores[group]),
+            "chunks": [docs[p] for p in positions],
+            "chunk_scores": [float(s) for s in scores[positions]],
+        })
+
+    logger.info(f"환자 단위 검색: 후보 {len(docs)}개 청크 -> 환자 {len(patient_ids)}명 중 {len(results)}명 선택")
+    return results
+
+
+def build_patient_positions(vectorstore, key="patient_id", document_type=None):
+    """
+    환자 ID -> FAISS 인덱스 위치 배열 매핑 (스토어당 한 번 생성하여 재사용)
+
+    Args:
+        document_type: 지정하면 해당 문서 유형의 청크만 포함 (예: "integrated_record")
+    """
+    positions = {}
+    for position, docstore_id in vectorstore.index_to_docstore_id.items():
+        doc = vectorstore.docstore.search(docstore_id)
+        if document_type and doc.metadata.get("document_type") != document_type:
+            continue
+        patient_id = doc.metadata.get(key)
+        if patient_id is not None:
+            positions.setdefault(patient_id, []).append(position)
+    return {patient_id: np.asarray(items, dtype=np.int64) for patient_id, items in positions.items()}
+
+
+def rank_patient_chunks(vectorstore, query_vector, patient_positions, patient_ids, k=5, filter_dict=None):
+    """
+    지정한 환자들의 청크만 쿼리와의 코사인 유사도로 정확히 순위화
+
+    Returns:
+        [(Document, score), ...] 점수 내림차순 최대 k개
+    """
+    arrays = [patient_positions[pid] for pid in patient_ids if pid in patient_positions]
+    if not arrays:
+        return []
+    positions = np.concatenate(arrays)
+
+    if filter_dict:
+        docs = [vectorstore.docstore.search(vectorstore.index_to_docstore_id[int(p)]) for p in positions]
+        keep = np.array([matches_filter(doc.metadata, filter_dict) for doc in docs], dtype=bool)
+        positions = positions[keep]
+        if len(positions) == 0:
+            return []
+
+    vectors = _normalize(vectorstore.index.reconstruct_batch(positions))
+    query = _normalize(np.asarray(query_vector, dtype=np.float32))
+    scores = vectors @ query
+
+    top = np.argsort(-scores, kind="stable")[:k]
+    return [
+        (vectorstore.docstore.search(vectorstore.index_to_docstore_id[int(positions[i])]), float(scores[i]))
+        for i in top
+    ]
@@ -0,0 +1,176 @@
+"""
+환자 단위 벡터 인덱스와 계층적(환자 -> 청크) 검색
+
+1단계: 환자마다 청크 벡터를 하나로 풀링한 환자 벡터 인덱스에서 상위 환자를 찾는다.
+       풀링에는 integrated_record 문서의 청크를 우선 사용하고, 없는 환자는 전체 청크를 사용한다.
+2단계: 상위 환자의 청크만 쿼리와 정확히 비교하여 순위화한다.
+       필터(filter_dict)를 만족하는 청크가 k개에 못 미치면 상위 환자 수를 늘려 다시 찾고, 마지막에는
+       모든 환자를 본다. patient_id 조건은 1단계 환자 선택에 바로 적용한다.
+
+청크 전체를 훑는 대신 (환자 수 + 상위 환자의 청크 수)만 비교하므로, 환자당 청크가 많은
+대규모 코퍼스에서 후보 수가 크게 줄어든다.
+
+풀링 방식:
+    mean       정규화된 청크 벡터의 평균
+    attention  환자 평균 벡터와의 유사도 softmax(유사도 / temperature)로 가중 평균
+               (환자 기록의 중심 주제에 가까운 청크 비중을 높이고 동떨어진 청크 영향은 줄임)
+"""
+import logging
+
+import numpy as np
+
+from patient_grouping import _normalize, matches_filter, rank_patient_chunks
+
+logger = logging.getLogger(__name__)
+
+POOLINGS = ("mean", "attention")
+
+
+def _select_positions(all_positions, preferred_positions):
+    """환자별 풀링 대상 위치 - preferred(integrated_record)가 있으면 그것, 없으면 전체 청크"""
+    return {
+        patient_id: preferred_positions.get(patient_id, positions)
+        for patient_id, positions in all_positions.items()
+    }
+
+
+class PatientVectorIndex:
+    """
+    환자 대표 벡터 인덱스 (코사인 유사도, faiss.IndexFlatIP)
+
+    Attributes:
+        patient_ids: 인덱스 행 -> 환자 ID
+        vectors: (환자 수, 차원) 정규화된 환자 벡터
+        pooling: 풀링 방식
+    """
+    def __init__(self, patient_ids, vectors, pooling="mean"):
+        import faiss
+
+        self.patient_ids = np.asarray(patient_ids, dtype=object)
+        self.vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        self.pooling = pooling
+        self.index = faiss.IndexFlatIP(self.vectors.shape[1])
+        self.index.add(self.vectors)
+        self._rows = {patient_id: row for row, patient_id in enumerate(self.patient_ids)}
+
+    def __len__(self):
+        return len(self.patient_ids)
+
+    @classmethod
+    def build(cls, vectorstore, positions_by_patient, pooling="mean", temperature=0.1, batch_size=65_536):
+        """
+        청크 벡터를 환자별로 풀링하여 인덱스 생성
+
+        Args:
+            positions_by_patient: 환자 ID -> 풀링할 청크의 FAISS 위치 배열
+            temperature: attention 풀링의 softmax 온도 (작을수록 중심에 가까운 청크에 집중)
+            batch_size: 한 번에 reconstruct할 벡터 수 (메모리 사용량 제한)
+        """
+        if pooling not in POOLINGS:
+            raise ValueError(f"지원하지 않는 풀링 방식입니다: {pooling} (지원: {POOLINGS})")
+
+        patient_ids = sorted(positions_by_patient)
+        if not patient_ids:
+            raise ValueError("환자 벡터를 만들 청크가 없습니다.")
+
+        positions = np.concatenate([positions_by_patient[pid] for pid in patient_ids])
+        owners = np.repeat(
+            np.arange(len(patient_ids)),
+            [len(positions_by_patient[pid]) for pid in patient_ids]
+        )
+        dimension = vectorstore.index.d
+
+        def iter_batches():
+            for start in range(0, len(positions), batch_size):
+                end = start + batch_size
+                yield owners[start:end], _normalize(vectorstore.index.reconstruct_batch(positions[start:end]))
+
+        # 1차: 정규화 청크 벡터의 환자별 평균
+        sums = np.zeros((len(patient_ids), dimension), dtype=np.float64)
+        for batch_owners, vectors in iter_batches():
+            np.add.at(sums, batch_owners, vectors)
+        counts = np.bincount(owners, minlength=len(patient_ids)).astype(np.float64)
+        pooled = sums / counts[:, None]
+
+        if pooling == "attention":
+            # 2차: 평균 벡터(쿼리 역할)와의 유사도 softmax 가중 평균
+            centroids = _normalize(pooled)
+            max_logits = np.full(len(patient_ids), -np.inf)
+            for batch_owners, vectors in iter_batches():
+                logits = np.einsum("ij,ij->i", vectors, centroids[batch_owners]) / temperature
+                np.maximum.at(max_logits, batch_owners, logits)
+
+            weighted = np.zeros((len(patient_ids), dimension), dtype=np.float64)
+            weights_sum = np.zeros(len(patient_ids), dtype=np.float64)
+            for batch_owners, vectors in iter_batches():
+                logits = np.einsum("ij,ij->i", vectors, centroids[batch_owners]) / temperature
+                weights = np.exp(logits - max_logits[batch_owners])
+                np.add.at(weighted, batch_owners, vectors * weights[:, None])
+                weights_sum += np.bincount(batch_owners, weights=weights, minlength=len(patient_ids))
+            pooled = weighted / weights_sum[:, None]
+
+        logger.info(f"환자 벡터 인덱스 생성 완료: 환자 {len(patient_ids)}명, 청크 {len(positions)}개 ({pooling} 풀링)")
+        return cls(patient_ids, _normalize(pooled.astype(np.float32)), pooling)
+
+    def search(self, query_vector, top_patients=20, patient_ids=None):
+        """
+        쿼리와 가까운 환자 top_patients명
+
+        Args:
+            patient_ids: 지정하면 이 환자들 중에서만 선택 (인덱스에 없는 환자는 무시)
+
+        Returns:
+            (환자 ID 목록, 점수 배열)
+        """
+        query = _normalize(np.asarray(query_vector, dtype=np.float32)).reshape(1, -1)
+        if patient_ids is not None:
+            rows = np.array([self._rows[pid] for pid in patient_ids if pid in self._rows], dtype=np.int64)
+            scores = self.vectors[rows] @ query[0]
+            top = np.argsort(-scores, kind="stable")[:top_patients]
+            return self.patient_ids[rows[top]].tolist(), scores[top]
+
+        scores, rows = self.index.search(query, min(top_patients, len(self)))
+        keep = rows[0] >= 0
+        return self.patient_ids[rows[0][keep]].tolist(), scores[0][keep]
+
+
+def build_patient_index(vectorstore, all_positions, preferred_positions=None, pooling="mean", temperature=0.1):
+    """
+    환자 벡터 인덱스 생성 - preferred_positions(예: integrated_record 청크)를 우선 풀링
+    """
+    positions = _select_positions(all_positions, preferred_positions or {})
+    return PatientVectorIndex.build(vectorstore, positions, pooling=pooling, temperature=temperature)
+
+
+def hierarchical_search(vectorstore, patient_index, patient_positions, query_vector, k=5,
+                        top_patients=20, filter_dict=None):
+    """
+    계층적 검색 - 환자 인덱스에서 상위 환자를 고른 뒤 그 환자들의 청크만 순위화
+
+    필터를 만족하는 청크가 k개보다 적으면 상위 환자 수를 4배씩 늘려 다시 순위화한다 (마지막에는 모든 환자).
+
+    Returns:
+        [(Document, score), ...] 점수 내림차순 최대 k개
+    """
+    candidates = None
+    if filter_dict and "patient_id" in filter_dict:
+        # 환자 ID 조건은 1단계 환자 선택에 바로 적용
+        condition = {"patient_id": filter_dict["patient_id"]}
+        candidates = [pid for pid in patient_index.patient_ids if matches_filter({"patient_id": pid}, condition)]
+    total = len(patient_index) if candidates is None else len(candidates)
+
+    rounds = 0
+    while True:
+        rounds += 1
+        patient_ids, _ = patient_index.search(query_vector, top_patients, candidates)
+        ranked = rank_patient_chunks(vectorstore, query_vector, patient_positions, patient_ids, k, filter_dict)
+        if len(ranked) >= k or len(patient_ids) >= total:
+            break
+        top_patients = min(top_patients * 4, total)
+
+    num_candidates = sum(len(patient_positions.get(pid, ())) for pid in patient_ids)
+    logger.info(
+        f"계층적 검색: 환자 {len(patient_index)}명 중 {len(patient_ids)}명 선택 ({rounds}회) -> "
+        f"청크 {vectorstore.index.ntotal}개 중 {num_candidates}개만 비교"
+    )
+    return ranked
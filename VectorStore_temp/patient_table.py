@@ -0,0 +1,184 @@
+"""
+환자 기록 컬럼형 테이블 - 정형 조건(나이, 성별, 진단, 약물, 알레르기)을 정확하게 처리
+
+"60세 이상 남성 환자 중 심장 질환과 당뇨병을 동시에 가진 환자" 같은 질의는 벡터 검색으로는
+논리곱을 보장할 수 없으므로, *_patients.json으로부터 타입이 지정된 pandas 테이블을 만들어
+조건에 맞는 환자 ID를 먼저 정확히 구한 뒤 해당 환자의 청크만 의미 검색으로 순위화한다.
+
+테이블 구성:
+    patients    환자당 1행 (인구통계, 생활습관, 신체 계측)
+    diagnoses   진단당 1행 (patient_id, name, icd10, date, status, severity)
+    medications 처방당 1행 (patient_id, medication, drug_class, prescription_date, related_diagnosis)
+    allergies   알레르기당 1행 (patient_id, allergy)
+"""
+import logging
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+_ICD10_PREFIX_CHARS = set("ABCDEFGHIJKLMNOPQRSTUVWXYZ")
+
+
+def _as_terms(value):
+    """문자열 하나 또는 여러 개를 튜플로 통일"""
+    if value is None:
+        return ()
+    if isinstance(value, str):
+        return (value,)
+    return tuple(value)
+
+
+def _looks_like_icd10(term):
+    return len(term) >= 1 and term[0] in _ICD10_PREFIX_CHARS and (len(term) == 1 or term[1:2].isdigit())
+
+
+class PatientTable:
+    """
+    환자 정형 데이터 컬럼형 테이블
+    """
+    def __init__(self, patients, diagnoses, medications, allergies):
+        self.patients = patients
+        self.diagnoses = diagnoses
+        self.medications = medications
+        self.allergies = allergies
+
+    @classmethod
+    def from_records(cls, records):
+        """
+        환자 레코드(dict) 목록으로부터 테이블 생성
+
+        Args:
+            records: (patient, department) 튜플의 iterable
+        """
+        from dataset_io import flatten_patient_records
+
+        columns = flatten_patient_records(records, ("patients", "diagnoses", "medications", "allergies"))
+
+        patients = pd.DataFrame(columns["patients"], columns=[
+            "patient_id", "name", "gender", "age", "birthdate", "department", "blood_type",
+            "height", "weight", "bmi", "insurance", "smoking_status", "alcohol_status"
+        ])
+        diagnoses = pd.DataFrame(columns["diagnoses"], columns=["patient_id", "name", "icd10", "date", "status", "severity"])
+        medications = pd.DataFrame(columns["medications"], columns=[
+            "patient_id", "medication", "drug_class", "prescription_date", "related_diagnosis"
+        ])
+        allergies = pd.DataFrame(columns["allergies"], columns=["patient_id", "allergy"])
+
+        patients = patients.drop_duplicates("patient_id", keep="last").astype({
+            "patient_id": "string",
+            "name": "string",
+            "gender": "category",
+            "age": "Int16",
+            "department": "category",
+            "blood_type": "category",
+            "height": "float32",
+            "weight": "float32",
+            "bmi": "float32",
+            "insurance": "category",
+            "smoking_status": "category",
+            "alcohol_status": "category",
+        })
+        patients["birthdate"] = pd.to_datetime(patients["birthdate"], errors="coerce")
+        patients = patients.set_index("patient_id", drop=False)
+
+        diagnoses = diagnoses.astype({
+            "patient_id": "string", "name": "string", "icd10": "string",
+            "status": "category", "severity": "category",
+        })
+        diagnoses["date"] = pd.to_datetime(diagnoses["date"], errors="coerce")
+
+        medications = medications.astype({
+            "patient_id": "string", "medication": "string", "drug_class": "category",
+            "related_diagnosis": "string",
+        })
+        medications["prescription_date"] = pd.to_datetime(medications["prescription_date"], errors="coerce")
+
+        allergies = allergies.astype({"patient_id": "string", "allergy": "string"})
+
+        table = cls(patients, diagnoses, medications, allergies)
+        logger.info(
+            f"환자 테이블 생성 완료: 환자 {len(patients)}명, 진단 {len(diagnoses)}건, "
+            f"처방 {len(medications)}건, 알레르기 {len(allergies)}건"
+        )
+        return table
+
+    @classmethod
+    def from_json_files(cls, data_path, file_pattern="*_patients*"):
+        """
+        환자 데이터 파일(json, jsonl, jsonl.gz, parquet)로부터 테이블 생성
+        """
+        from dataset_io import iter_patient_records
+
+        return cls.from_records(iter_patient_records(data_path, file_pattern))
+
+    def __len__(self):
+        return len(self.patients)
+
+    @staticmethod
+    def _match_terms(names, codes, terms):
+        """
+        진단/약물명 부분 일치 또는 ICD-10 코드 접두사 일치 마스크 (terms 중 하나라도 일치)
+        """
+        mask = np.zeros(len(names), dtype=bool)
+        for term in terms:
+            mask |= names.str.contains(term, regex=False, na=False).to_numpy(dtype=bool)
+            if codes is not None and _looks_like_icd10(term):
+                mask |= codes.str.startswith(term, na=False).to_numpy(dtype=bool)
+        return mask
+
+    def _patients_with(self, frame, name_column, terms, code_column=None):
+        """조건에 맞는 행을 가진 환자 ID 배열"""
+        codes = frame[code_column] if code_column else None
+        mask = self._match_terms(frame[name_column], codes, terms)
+        return frame["patient_id"].to_numpy(dtype=object)[mask]
+
+    def query(self, min_age=None, max_age=None, gender=None, department=None,
+              diagnoses_all=None, diagnoses_any=None, medications_all=None, medications_any=None,
+              allergies_any=None, exclude_allergies=None, diagnosis_status=None):
+        """
+        정형 조건을 모두 만족하는 환자 ID 목록
+
+        진단/약물 조건의 각 항목은 이름 일부(예: "당뇨") 또는 ICD-10 접두사(예: "I2")이며,
+        항목 하나를 튜플/리스트로 주면 그 안에서는 OR로 처리한다.
+
+        예: diagnoses_all=[("I2", "I3", "I4", "I5"), "당뇨"] -> 심장 질환 AND 당뇨병
+        """
+        patients = self.patients
+        mask = np.ones(len(patients), dtype=bool)
+
+        if min_age is not None:
+            mask &= (patients["age"] >= min_age).fillna(False).to_numpy(dtype=bool)
+        if max_age is not None:
+            mask &= (patients["age"] <= max_age).fillna(False).to_numpy(dtype=bool)
+        if gender:
+            mask &= patients["gender"].isin(_as_terms(gender)).to_numpy(dtype=bool)
+        if department:
+            mask &= patients["department"].isin(_as_terms(department)).to_numpy(dtype=bool)
+
+        patient_ids = patients["patient_id"].to_numpy(dtype=object)
+
+        diagnoses = self.diagnoses
+        if diagnosis_status:
+            diagnoses = diagnoses[diagnoses["status"].isin(_as_terms(diagnosis_status))]
+
+        # 각 조건 그룹별로 해당 환자 집합과 교집합/합집합
+        for group in diagnoses_all or ():
+            mask &= np.isin(patient_ids, self._patients_with(diagnoses, "name", _as_terms(group), "icd10"))
+        if diagnoses_any:
+            terms = tuple(term for group in diagnoses_any for term in _as_terms(group))
+            mask &= np.isin(patient_ids, self._patients_with(diagnoses, "name", terms, "icd10"))
+
+        for group in medications_all or ():
+            mask &= np.isin(patient_ids, self._patients_with(self.medications, "medication", _as_terms(group)))
+        if medications_any:
+            terms = tuple(term for group in medications_any for term in _as_terms(group))
+            mask &= np.isin(patient_ids, self._patients_with(self.medications, "medication", terms))
+
+        if allergies_any:
+            mask &= np.isin(patient_ids, self._patients_with(self.allergies, "allergy", _as_terms(allergies_any)))
+        if exclude_allergies:
+            mask &= ~np.isin(patient_ids, self._patients_with(self.allergies, "allergy", _as_terms(exclude_allergies)))
+
+        return patient_ids[mask].tolist()
@@ -0,0 +1,257 @@
+"""
+빌드/검색 단계별 시간 측정과 선택적 cProfile 수집
+
+    profiler = StageProfiler()
+    with profiler.stage("build/embed"):
+        ...
+    for patient in profiler.timed_iter("load/parse", read_patients(path)):
+        ...
+    with profiler.capture("build", cprofile=True):     # 실행 단위 - 끝나면 JSON 보고서 저장
+        ...
+
+capture()는 실행마다 별도의 측정기를 두고 그 기간의 측정값만 모으므로, 공유 측정기의 누적 통계를
+지우지 않으며 여러 capture가 동시에 실행되어도 서로의 결과를 초기화하지 않는다.
+
+단계 이름은 "영역/세부단계" 형식이며, 보고서에는 단계별 호출 수, 합계, 평균, 최대 시간과
+(cProfile을 켠 경우) 누적 시간 상위 함수 목록이 들어간다.
+"""
+import cProfile
+import io
+import json
+import logging
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class StageProfiler:
+    """
+    단계별 누적 시간 측정기 (스레드 안전)
+
+    Args:
+        enabled: False이면 누적 통계를 기록하지 않음 (진행 중인 capture가 없으면 stage/timed_iter가
+            거의 비용 없이 통과)
+        report_dir: capture()가 보고서를 저장할 디렉토리
+    """
+    def __init__(self, enabled=True, report_dir=None):
+        self.enabled = enabled
+        self.report_dir = Path(report_dir) if report_dir else None
+        self._lock = threading.Lock()
+        self._captures = []
+        self.reset()
+
+    @property
+    def active(self):
+        """측정값을 받을 곳이 있는지 (누적 통계 또는 진행 중인 capture)"""
+        return self.enabled or bool(self._captures)
+
+    def reset(self):
+        with self._lock:
+            self._stats = {}
+            self._started_at = datetime.now()
+
+    def add(self, name, seconds, count=1):
+        """측정값 직접 기록 (반복문 안에서 직접 잰 시간을 합산할 때)"""
+        if not self.active:
+            return
+        with self._lock:
+            captures = list(self._captures)
+            if self.enabled:
+                stats = self._stats.get(name)
+                if stats is None:
+                    stats = self._stats[name] = {"count": 0, "total_s": 0.0, "max_s": 0.0}
+                stats["count"] += count
+                stats["total_s"] += seconds
+                stats["max_s"] = max(stats["max_s"], seconds / count if count else seconds)
+        for run in captures:
+            run.add(name, seconds, count)
+
+    @contextmanager
+    def stage(self, name):
+        if not self.active:
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    def timed_iter(self, name, iterable):
+        """iterable의 다음 항목을 꺼내는 데 걸린 시간(예: JSON 파싱)을 name으로 합산"""
+        if not self.active:
+            yield from iterable
+            return
+        iterator = iter(iterable)
+        elapsed, count = 0.0, 0
+        try:
+            while True:
+                started = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    elapsed += time.perf_counter() - started
+                    break
+                elapsed += time.perf_counter() - started
+                count += 1
+                yield item
+        finally:
+            self.add(name, elapsed, max(count, 1))
+
+    def report(self):
+        """단계별 통계 (합계 시간 내림차순)"""
+        with self._lock:
+            stages = {
+                name: {
+                    "count": stats["count"],
+                    "total_s": round(stats["total_s"], 6),
+                    "mean_ms": round(stats["total_s"] / stats["count"] * 1000, 3) if stats["count"] else 0.0,
+                    "max_ms": round(stats["max_s"] * 1000, 3),
+                }
+                for name, stats in sorted(self._stats.items(), key=lambda item: -item[1]["total_s"])
+            }
+            started_at = self._started_at
+        return {"started_at": started_at.isoformat(timespec="seconds"), "stages": stages}
+
+    def write_report(self, path, extra=None):
+        report = self.report()
+        if extra:
+            report.update(extra)
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        return path
+
+    @contextmanager
+    def capture(self, run_name, cprofile=False, top_functions=30):
+        """
+        실행 단위 측정 - 블록이 실행되는 동안의 측정값을 별도로 모아 끝나면 report_dir에 JSON 보고서 저장
+
+        공유 측정기의 누적 통계는 그대로 두므로 동시에 실행 중인 검색이나 다른 capture와 충돌하지 않는다.
+        다만 같은 측정기에 기록되는 값은 모두 모이므로, 블록 밖 스레드의 측정값도 그 기간에 있었다면 포함된다.
+
+        Args:
+            cprofile: True이면 cProfile로 함수 단위 프로파일도 수집 (.prof 파일 + 보고서의 상위 함수 목록)
+
+        Yields:
+            결과 dict - 블록이 끝나면 "report_path", "report"가 채워짐
+        """
+        run = StageProfiler(enabled=True)
+        with self._lock:
+            self._captures.append(run)
+        result = {}
+        profile = cProfile.Profile() if cprofile else None
+        started = time.perf_counter()
+        if profile:
+            profile.enable()
+        try:
+            with run.stage(f"{run_name}/total"):
+                yield result
+        finally:
+            if profile:
+                profile.disable()
+            with self._lock:
+                self._captures.remove(run)
+
+            extra = {"run": run_name, "wall_s": round(time.perf_counter() - started, 6)}
+            timestamp = datetime.now().strftime("%Y%m%dT%H%M%S")
+            report_dir = self.report_dir or Path(".")
+            if profile:
+                prof_path = report_dir / f"{run_name}-{timestamp}.prof"
+                prof_path.parent.mkdir(parents=True, exist_ok=True)
+                profile.dump_stats(str(prof_path))
+                extra["cprofile"] = {"path": str(prof_path), "top": _top_functions(profile, top_functions)}
+
+            result["report_path"] = run.write_report(report_dir / f"{run_name}-{timestamp}.json", extra)
+            result["report"] = {**run.report(), **extra}
+            logger.info(f"프로파일 보고서 저장: {result['report_path']}")
+
+
+def _top_functions(profile, limit):
+    """cProfile 결과에서 누적 시간 상위 함수 목록"""
+    stats = pstats.Stats(profile, stream=io.StringIO())
+    rows = []
+    for (filename, line, function), (_, calls, total, cumulative, _) in stats.stats.items():
+        rows.append({
+            "function": f"{Path(filename).name}:{line}({function})",
+            "calls": calls,
+            "total_s": round(total, 6),
+            "cumulative_s": round(cumulative, 6),
+        })
+    rows.sort(key=lambda row: -row["cumulative_s"])
+    return rows[:limit]
+
+
+def timed_similarity_search(vectorstore, query, k=5, filter_dict=None, fetch_k=20, profiler=None):
+    """
+    LangChain FAISS.similarity_search와 같은 결과를 내되 하위 단계를 나누어 측정
+
+        search/embed    쿼리 임베딩
+        search/ann      FAISS 인덱스 검색
+        search/fetch    docstore 문서 조회
+        search/filter   메타데이터 필터 (filter_dict가 있을 때, patient_grouping.matches_filter)
+
+    스토어의 공개 속성(embeddings, index, index_to_docstore_id, docstore)만 사용한다.
+
+    Args:
+        fetch_k: 필터가 있을 때 필터 전에 가져올 후보 수 (k보다 작으면 k)
+
+    Returns:
+        [Document, ...] 최대 k개
+    """
+    from patient_grouping import matches_filter
+
+    profiler = profiler or StageProfiler(enabled=False)
+    # 핫 리로드 스토어는 인덱스와 docstore를 같은 버전에서 읽도록 고정
+    vectorstore = getattr(vectorstore, "current", vectorstore)
+
+    embeddings = getattr(vectorstore, "embeddings", None)
+    if embeddings is None:
+        # 임베딩 객체 대신 함수로 만든 스토어는 단계를 나누지 않음
+        with profiler.stage("search/store"):
+            return vectorstore.similarity_search(query, k=k, filter=filter_dict, fetch_k=max(fetch_k, k))
+
+    with profiler.stage("search/embed"):
+        vector = np.asarray([embeddings.embed_query(query)], dtype=np.float32)
+        if getattr(vectorstore, "_normalize_L2", False):
+            import faiss
+
+            faiss.normalize_L2(vector)
+
+    with profiler.stage("search/ann"):
+        _, indices = vectorstore.index.search(vector, max(fetch_k, k) if filter_dict else k)
+
+    docs = []
+    fetch_elapsed = filter_elapsed = 0.0
+    for position in indices[0]:
+        if position == -1:
+            continue
+        started = time.perf_counter()
+        doc_id = vectorstore.index_to_docstore_id[int(position)]
+        doc = vectorstore.docstore.search(doc_id)
+        fetched = time.perf_counter()
+        fetch_elapsed += fetched - started
+        if isinstance(doc, str):
+            # InMemoryDocstore는 없는 ID에 대해 오류 메시지 문자열을 반환 (LangChain과 같은 처리)
+            raise ValueError(f"Could not find document for id {doc_id}, got {doc}")
+        if filter_dict:
+            keep = matches_filter(doc.metadata, filter_dict)
+            filter_elapsed += time.perf_counter() - fetched
+            if not keep:
+                continue
+        docs.append(doc)
+        if len(docs) == k:
+            break
+
+    profiler.add("search/fetch", fetch_elapsed)
+    if filter_dict:
+        profiler.add("search/filter", filter_elapsed)
+    return docs
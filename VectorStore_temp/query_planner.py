@@ -0,0 +1,138 @@
+"""
+메타데이터 조건을 보고 가장 작은 하위 인덱스로 검색을 보내는 쿼리 계획기
+
+create_vector_indices는 전체 인덱스(general) 외에 문서 유형별(diagnosis, medication, lab_results, visits)과
+진료과별(dept_{진료과}) 인덱스를 만든다. 하위 인덱스마다 "어떤 문서만 들어 있는지"(포함 조건)를 두고,
+
+    포함 조건의 모든 필드를 필터가 같은 값 또는 그 부분집합으로 제한하면 그 인덱스가 조건을 완전히 포함
+
+하므로 해당 인덱스만 검색해도 결과가 같다. 포함하는 인덱스 중 벡터 수가 가장 적은 것을 고르고
+(없으면 general), 인덱스가 이미 보장하는 조건은 필터에서 뺀다. 필터 없이 검색하면 ANN 후보를
+사후 필터로 버리지 않으므로 선택적인 쿼리일수록 적은 벡터를 보고도 k개를 온전히 채운다.
+"""
+import logging
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+GENERAL_INDEX = "general"
+
+# 문서 유형별 인덱스 이름 -> (저장 디렉토리, document_type)
+DOCUMENT_TYPE_INDEXES = {
+    "diagnosis": ("diagnosis_index", "diagnosis"),
+    "medication": ("medication_index", "medication"),
+    "lab_results": ("lab_results_index", "lab_result"),
+    "visits": ("visits_index", "visit"),
+}
+
+DEPARTMENT_PREFIX = "dept_"
+
+
+def index_coverage(name):
+    """
+    create_vector_indices의 인덱스 이름 -> 포함 조건 {필드: 값 집합} (general은 빈 조건 = 모든 문서)
+    """
+    if name in DOCUMENT_TYPE_INDEXES:
+        return {"document_type": {DOCUMENT_TYPE_INDEXES[name][1]}}
+    if name.startswith(DEPARTMENT_PREFIX):
+        return {"department": {name[len(DEPARTMENT_PREFIX):]}}
+    return {}
+
+
+def stored_index_names(vector_store_path):
+    """
+    저장된 인덱스 디렉토리 -> {인덱스 이름: 저장 디렉토리 이름} (create_vector_indices의 이름 규칙)
+    """
+    vector_store_path = Path(vector_store_path)
+    names = {}
+    if (vector_store_path / "general_index").exists():
+        names[GENERAL_INDEX] = "general_index"
+    for name, (store_name, _) in DOCUMENT_TYPE_INDEXES.items():
+        if (vector_store_path / store_name).exists():
+            names[name] = store_name
+    for path in sorted(vector_store_path.glob("department_*_index")):
+        names[DEPARTMENT_PREFIX + path.name[len("department_"):-len("_index")]] = path.name
+    return names
+
+
+def _condition_values(condition):
+    """
+    필터 조건 -> 허용 값 집합 (값 하나, 리스트, $eq, $in만 해석 - 범위 조건 등은 None)
+    """
+    if isinstance(condition, dict):
+        if set(condition) == {"$eq"}:
+            return {condition["$eq"]}
+        if set(condition) == {"$in"}:
+            return set(condition["$in"])
+        return None
+    if isinstance(condition, (list, tuple, set)):
+        return set(condition)
+    return {condition}
+
+
+def _index_size(vectorstore):
+    # 핫 리로드 스토어는 현재 버전 기준
+    return getattr(vectorstore, "current", vectorstore).index.ntotal
+
+
+class QueryPlanner:
+    """
+    하위 인덱스 선택기
+
+    Args:
+        indices: {인덱스 이름: 벡터 스토어} (create_vector_indices 반환값 또는 load_vector_indices)
+        coverage: {인덱스 이름: {필드: 값 집합}} - 생략하면 인덱스 이름 규칙(index_coverage)으로 결정
+    """
+    def __init__(self, indices, coverage=None):
+        self.indices = {name: vectorstore for name, vectorstore in indices.items() if vectorstore is not None}
+        coverage = coverage or {}
+        self.coverage = {name: coverage.get(name, index_coverage(name)) for name in self.indices}
+
+    def __len__(self):
+        return len(self.indices)
+
+    @staticmethod
+    def covers(coverage, filter_dict):
+        """필터가 포함 조건의 모든 필드를 그 값 집합 안으로 제한하는지"""
+        for field, values in coverage.items():
+            if field not in filter_dict:
+                return False
+            allowed = _condition_values(filter_dict[field])
+            if allowed is None or not allowed or not allowed <= values:
+                return False
+        return True
+
+    def plan(self, filter_dict=None):
+        """
+        필터를 완전히 포함하는 가장 작은 인덱스 선택
+
+        Returns:
+            {"index", "vectorstore", "filter" (인덱스가 보장하는 조건을 뺀 나머지, 없으면 None),
+             "size" (선택한 인덱스 벡터 수), "total" (general 벡터 수), "fraction"}
+            포함하는 인덱스가 없으면 None
+        """
+        filter_dict = filter_dict or {}
+        candidates = [
+            (_index_size(vectorstore), name)
+            for name, vectorstore in self.indices.items()
+            if self.covers(self.coverage[name], filter_dict)
+        ]
+        if not candidates:
+            return None
+        size, name = min(candidates, key=lambda candidate: (candidate[0], candidate[1] == GENERAL_INDEX))
+
+        coverage = self.coverage[name]
+        residual = {
+            field: condition for field, condition in filter_dict.items()
+            if not (field in coverage and _condition_values(condition) == coverage[field])
+        }
+        general = self.indices.get(GENERAL_INDEX)
+        total = _index_size(general) if general is not None else max(size for size, _ in candidates)
+        return {
+            "index": name,
+            "vectorstore": self.indices[name],
+            "filter": residual or None,
+            "size": size,
+            "total": total,
+            "fraction": size / total if total else 1.0,
+        }
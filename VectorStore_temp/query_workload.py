@@ -0,0 +1,347 @@
+"""
+검색 부하 테스트용 질의 워크로드 생성 및 재생
+
+MedicalDataGenerator가 만든 환자 레코드에서 환자별 사실(진단, 처방 약물, 측정/비정상 검사 항목,
+내원 증상)을 모아, 템플릿 질의("{diagnosis} 환자의 최근 {lab} 결과")와 그 정답 환자 ID 집합을 함께 만든다.
+슬롯 값은 빈도 순위에 대한 Zipf 분포로 뽑으므로 실제 서비스처럼 인기 질의가 반복된다.
+
+워크로드 파일(JSONL) 한 줄:
+    {"query_id", "query", "template", "slots", "relevant_patient_ids", "filters"}
+
+replay_workload는 이 파일을 목표 QPS로(open-loop, 응답을 기다리지 않고 일정 간격으로) 검색 함수나
+A2A 에이전트에 재생하고 지연 시간 분위수와 recall@k를 보고한다.
+"""
+import json
+import logging
+import random
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+class QueryTemplate:
+    """
+    질의 템플릿
+
+    Args:
+        name: 템플릿 이름
+        text: 슬롯을 포함한 질의 문자열
+        slots: [(슬롯 이름, 사실 종류), ...] - 종류는 diagnosis, medication, lab, abnormal_lab, complaint, department
+        weight: 템플릿 선택 가중치
+    """
+    def __init__(self, name, text, slots, weight=1.0):
+        self.name = name
+        self.text = text
+        self.slots = tuple(slots)
+        self.weight = weight
+
+
+# 질의 문장에 쓰는 진료과 표시 이름 (slots/filters에는 원래 코드를 기록)
+DEPARTMENT_NAMES = {
+    "internal_medicine": "내과",
+    "surgery": "외과",
+    "cardiology": "심장내과",
+    "neurology": "신경과",
+    "emergency": "응급의학과",
+}
+
+DEFAULT_TEMPLATES = (
+    QueryTemplate("diagnosis", "{diagnosis} 진단을 받은 환자", (("diagnosis", "diagnosis"),), 3.0),
+    QueryTemplate("diagnosis_lab", "{diagnosis} 환자의 최근 {lab} 결과", (("diagnosis", "diagnosis"), ("lab", "lab")), 2.0),
+    QueryTemplate("abnormal_lab", "{lab} 수치가 비정상인 환자", (("lab", "abnormal_lab"),), 2.0),
+    QueryTemplate("medication", "{medication}을(를) 복용 중인 환자", (("medication", "medication"),), 2.0),
+    QueryTemplate(
+        "diagnosis_medication", "{diagnosis} 환자 중 {medication} 처방 기록",
+        (("diagnosis", "diagnosis"), ("medication", "medication")), 1.0
+    ),
+    QueryTemplate("complaint", "{complaint} 증상으로 내원한 환자", (("complaint", "complaint"),), 1.5),
+    QueryTemplate(
+        "department_diagnosis", "{department} {diagnosis} 환자 진료 기록",
+        (("department", "department"), ("diagnosis", "diagnosis")), 1.0
+    ),
+)
+
+
+def extract_patient_facts(patient, department=None):
+    """
+    환자 레코드 하나에서 질의 정답 판정에 쓰는 사실 집합 추출
+    """
+    facts = {
+        "diagnosis": {d["name"] for d in patient.get("diagnoses", [])},
+        "medication": {m["medication"] for m in patient.get("medications", [])},
+        "lab": set(),
+        "abnormal_lab": set(),
+        "complaint": {v["chief_complaint"] for v in patient.get("visits", []) if v.get("chief_complaint")},
+        "department": {patient.get("department") or department},
+    }
+    for lab in patient.get("lab_results", []):
+        for item, result in lab.get("results", {}).items():
+            facts["lab"].add(item)
+            if result.get("flag"):
+                facts["abnormal_lab"].add(item)
+    return facts
+
+
+class FactIndex:
+    """
+    사실 종류별 역색인 - (종류, 값) -> 환자 ID 집합
+    """
+    def __init__(self):
+        self.postings = defaultdict(lambda: defaultdict(set))
+        self.num_patients = 0
+
+    @classmethod
+    def from_records(cls, records):
+        """
+        Args:
+            records: (patient, department) 튜플의 iterable
+        """
+        index = cls()
+        for patient, department in records:
+            index.add(patient, department)
+        return index
+
+    def add(self, patient, department=None):
+        for kind, values in extract_patient_facts(patient, department).items():
+            for value in values:
+                if value:
+                    self.postings[kind][value].add(patient["id"])
+        self.num_patients += 1
+
+    def ranked_values(self, kind):
+        """빈도 내림차순 값 목록 (동률은 이름순) - Zipf 순위의 기준"""
+        postings = self.postings[kind]
+        return sorted(postings, key=lambda value: (-len(postings[value]), value))
+
+    def patients(self, kind, value):
+        return self.postings[kind].get(value, set())
+
+
+def zipf_weights(n, s):
+    """순위 1..n에 대한 Zipf 가중치 (s=0이면 균등)"""
+    return [1.0 / (rank ** s) for rank in range(1, n + 1)]
+
+
+class QueryWorkloadGenerator:
+    """
+    정답 레이블이 있는 질의 워크로드 생성기
+
+    Args:
+        fact_index: FactIndex
+        templates: QueryTemplate 목록
+        zipf_s: 인기도 편향 (클수록 상위 값에 질의가 몰림, 0이면 균등)
+        seed: 난수 시드
+        max_attempts: 정답이 빈 조합을 다시 뽑는 최대 횟수
+    """
+    def __init__(self, fact_index, templates=DEFAULT_TEMPLATES, zipf_s=1.1, seed=None, max_attempts=20):
+        self.fact_index = fact_index
+        self.templates = [t for t in templates if all(fact_index.postings[kind] for _, kind in t.slots)]
+        if not self.templates:
+            raise ValueError("워크로드를 만들 수 있는 템플릿이 없습니다. 환자 데이터가 비어 있는지 확인하세요.")
+        self.zipf_s = zipf_s
+        self.rng = random.Random(seed)
+        self.max_attempts = max_attempts
+
+        kinds = {kind for t in self.templates for _, kind in t.slots}
+        self._ranked = {kind: fact_index.ranked_values(kind) for kind in kinds}
+        self._weights = {kind: zipf_weights(len(values), zipf_s) for kind, values in self._ranked.items()}
+
+    def _draw(self, kind):
+        return self.rng.choices(self._ranked[kind], weights=self._weights[kind])[0]
+
+    @staticmethod
+    def _display(template, slots):
+        """슬롯 값을 질의 문장용 표시 이름으로 변환"""
+        return {
+            name: DEPARTMENT_NAMES.get(slots[name], slots[name]) if kind == "department" else slots[name]
+            for name, kind in template.slots
+        }
+
+    def generate_query(self, query_id):
+        """
+        질의 하나 생성 - 정답 환자가 없는 슬롯 조합은 다시 뽑음 (max_attempts 초과 시 None)
+        """
+        template = self.rng.choices(self.templates, weights=[t.weight for t in self.templates])[0]
+        for _ in range(self.max_attempts):
+            slots = {name: self._draw(kind) for name, kind in template.slots}
+            relevant = None
+            for name, kind in template.slots:
+                patients = self.fact_index.patients(kind, slots[name])
+                relevant = set(patients) if relevant is None else relevant & patients
+            if relevant:
+                filters = {"department": slots["department"]} if "department" in slots else {}
+                return {
+                    "query_id": f"q{query_id:06d}",
+                    "query": template.text.format(**self._display(template, slots)),
+                    "template": template.name,
+                    "slots": slots,
+                    "relevant_patient_ids": sorted(relevant),
+                    "filters": filters,
+                }
+        return None
+
+    def generate(self, num_queries):
+        """num_queries개의 질의를 순서대로 생성"""
+        produced = 0
+        attempts = 0
+        while produced < num_queries and attempts < num_queries * self.max_attempts:
+            attempts += 1
+            query = self.generate_query(produced)
+            if query is not None:
+                produced += 1
+                yield query
+
+
+def write_workload(queries, output_path):
+    """질의 목록을 JSONL로 저장 - 저장한 질의 수 반환"""
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    count = 0
+    with open(output_path, "w", encoding="utf-8") as f:
+        for query in queries:
+            f.write(json.dumps(query, ensure_ascii=False) + "\n")
+            count += 1
+    logger.info(f"질의 워크로드 {count}개 저장 완료: {output_path}")
+    return count
+
+
+def read_workload(path):
+    """워크로드 파일의 질의를 순서대로 읽음"""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def generate_workload_file(data_path, output_path, num_queries=1000, zipf_s=1.1, seed=None,
+                           templates=DEFAULT_TEMPLATES, file_pattern="*_patients*"):
+    """
+    생성된 환자 데이터 디렉토리로부터 워크로드 파일 생성
+    """
+    from dataset_io import iter_patient_records
+
+    fact_index = FactIndex.from_records(iter_patient_records(data_path, file_pattern))
+    generator = QueryWorkloadGenerator(fact_index, templates=templates, zipf_s=zipf_s, seed=seed)
+    return write_workload(generator.generate(num_queries), output_path)
+
+
+def a2a_task_payload(query, session_id=None):
+    """
+    질의를 A2A tasks/send 요청 파라미터로 변환 (A2AClient.send_task에 그대로 전달)
+    """
+    payload = {
+        "id": query["query_id"],
+        "message": {"role": "user", "parts": [{"type": "text", "text": query["query"]}]},
+        "metadata": {"template": query["template"], "filters": query.get("filters", {})},
+    }
+    if session_id:
+        payload["sessionId"] = session_id
+    return payload
+
+
+def _retrieved_patient_ids(result):
+    """검색 결과(환자 ID 목록, Document 목록, (Document, 점수) 목록)에서 순서를 유지한 환자 ID 목록"""
+    patient_ids = []
+    for item in result or []:
+        if isinstance(item, tuple):
+            item = item[0]
+        if isinstance(item, str):
+            patient_id = item
+        elif isinstance(item, dict):
+            patient_id = item.get("patient_id")
+        else:
+            patient_id = getattr(item, "metadata", {}).get("patient_id")
+        if patient_id and patient_id not in patient_ids:
+            patient_ids.append(patient_id)
+    return patient_ids
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def replay_workload(queries, handler, target_qps=10.0, max_workers=8, k=10, max_queries=None):
+    """
+    워크로드를 목표 QPS로 재생 (open-loop)
+
+    Args:
+        queries: 질의 iterable (read_workload 결과 등)
+        handler: 질의 dict를 받아 검색 결과를 반환하는 함수 (환자 ID/Document 목록이면 recall을 계산)
+        target_qps: 초당 질의 수 - 질의 i는 시작 후 i / target_qps 초에 발행
+        max_workers: 동시에 처리 중인 최대 질의 수
+        k: recall@k 계산 기준
+
+    Returns:
+        {"queries", "errors", "duration_s", "achieved_qps", "latency_ms": {p50, p95, p99, max},
+         "mean_recall_at_k", "per_template": {템플릿: {"count", "mean_recall_at_k", "p95_ms"}}}
+    """
+    interval = 1.0 / target_qps if target_qps and target_qps > 0 else 0.0
+
+    def run(query, scheduled_at):
+        started = time.perf_counter()
+        try:
+            result = handler(query)
+            error = None
+        except Exception as e:
+            result, error = None, str(e)
+        finished = time.perf_counter()
+
+        recall = None
+        relevant = set(query.get("relevant_patient_ids", []))
+        if error is None and relevant:
+            retrieved = _retrieved_patient_ids(result)[:k]
+            recall = len(relevant.intersection(retrieved)) / min(k, len(relevant))
+        # 지연 시간은 예정 발행 시각 기준 (부하로 인해 발행이 밀린 대기 시간 포함)
+        return query.get("template"), (finished - min(scheduled_at, started)) * 1000, recall, error
+
+    futures = []
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for i, query in enumerate(queries):
+            if max_queries is not None and i >= max_queries:
+                break
+            scheduled_at = start + i * interval
+            delay = scheduled_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            futures.append(executor.submit(run, query, scheduled_at))
+        results = [future.result() for future in futures]
+    duration = time.perf_counter() - start
+
+    latencies = sorted(latency for _, latency, _, error in results if error is None)
+    recalls = [recall for _, _, recall, _ in results if recall is not None]
+    errors = Counter(error for _, _, _, error in results if error is not None)
+
+    per_template = {}
+    for template in sorted({template for template, _, _, _ in results if template}):
+        rows = [(latency, recall) for name, latency, recall, error in results if name == template and error is None]
+        template_recalls = [recall for _, recall in rows if recall is not None]
+        per_template[template] = {
+            "count": len(rows),
+            "mean_recall_at_k": sum(template_recalls) / len(template_recalls) if template_recalls else None,
+            "p95_ms": _percentile(sorted(latency for latency, _ in rows), 0.95),
+        }
+
+    if errors:
+        logger.warning(f"워크로드 재생 중 오류 {sum(errors.values())}건: {dict(errors.most_common(3))}")
+
+    return {
+        "queries": len(results),
+        "errors": sum(errors.values()),
+        "duration_s": duration,
+        "achieved_qps": len(results) / duration if duration > 0 else None,
+        "latency_ms": {
+            "p50": _percentile(latencies, 0.50),
+            "p95": _percentile(latencies, 0.95),
+            "p99": _percentile(latencies, 0.99),
+            "max": latencies[-1] if latencies else None,
+        },
+        "mean_recall_at_k": sum(recalls) / len(recalls) if recalls else None,
+        "per_template": per_template,
+    }
@@ -0,0 +1,179 @@
+"""
+2단계 검색용 교차 인코더(cross-encoder) 재순위화
+
+1단계 벡터 검색(bi-encoder)의 상위 N개 후보를 (질의, 청크) 쌍으로 교차 인코더에 넣어 다시 점수화한다.
+
+    - 후보는 1단계 순위대로 배치 단위로 점수화하며, 배치 안의 쌍은 가장 긴 쌍 길이에 맞춰 패딩된다.
+    - (질의, 청크) 점수는 LRU 캐시에 보관하여 반복 질의는 모델을 거치지 않는다.
+    - 요청별 마감 시각(latency budget)이 주어지면, 측정된 쌍당 처리 시간으로 다음 배치가 마감 안에
+      끝날지 예측하여 끝나지 않을 것 같으면 중단한다 (추정치는 상한을 두고, 마감 전이면 한 쌍 이상은
+      점수화해 계속 갱신한다). 점수화된 후보는 교차 인코더 점수순,
+      나머지는 1단계 순서대로 뒤에 붙여 그 시점까지 가능한 최선의 순서를 반환한다.
+"""
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RERANKER_MODEL = "Dongjin-kr/ko-reranker"
+
+# 쌍당 처리 시간 추정치 상한 (초) - 일시적으로 느린 배치 하나가 이후 예산 계산을 막지 않도록
+MAX_SECONDS_PER_PAIR = 0.05
+
+# 추정치로는 한 쌍도 못 끝낸다고 나와도 마감 전이면 이만큼은 점수화해 추정치를 다시 측정
+PROBE_PAIRS = 1
+
+
+def _text_key(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class ScoreCache:
+    """
+    (질의, 청크) 점수 LRU 캐시 (스레드 안전)
+    """
+    def __init__(self, max_size=50_000):
+        self.max_size = max_size
+        self._scores = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            score = self._scores.get(key)
+            if score is None:
+                self.misses += 1
+                return None
+            self._scores.move_to_end(key)
+            self.hits += 1
+            return score
+
+    def put(self, key, score):
+        with self._lock:
+            self._scores[key] = score
+            self._scores.move_to_end(key)
+            while len(self._scores) > self.max_size:
+                self._scores.popitem(last=False)
+
+    def __len__(self):
+        return len(self._scores)
+
+
+class CrossEncoderReranker:
+    """
+    교차 인코더 재순위화기
+
+    Args:
+        model_name: 한국어 교차 인코더 모델 (sentence-transformers CrossEncoder로 로드)
+        batch_size: 한 번에 점수화할 최대 쌍 수 (후보 수 이하이면 한 번의 패딩 배치로 처리)
+        max_length: 쌍 토큰 최대 길이 (초과분은 잘라냄)
+        cache_size: 점수 캐시 크기
+        device: 모델 장치 (기본: 자동)
+        score_fn: 테스트나 다른 모델용 점수 함수 (list[(query, text)] -> list[float]); 주면 모델을 로드하지 않음
+    """
+    def __init__(self, model_name=DEFAULT_RERANKER_MODEL, batch_size=32, max_length=512,
+                 cache_size=50_000, device=None, score_fn=None):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.device = device
+        self.cache = ScoreCache(cache_size)
+        self._score_fn = score_fn
+        self._model = None
+        self._model_lock = threading.Lock()
+        # 쌍당 처리 시간 추정치 (초, 지수 이동 평균) - 마감 예측에 사용
+        self._seconds_per_pair = None
+
+    def _load_model(self):
+        with self._model_lock:
+            if self._model is None:
+                from sentence_transformers import CrossEncoder
+
+                logger.info(f"교차 인코더 로드 중: {self.model_name}")
+                self._model = CrossEncoder(self.model_name, max_length=self.max_length, device=self.device)
+        return self._model
+
+    def score_pairs(self, pairs):
+        """(질의, 청크 텍스트) 쌍 목록을 한 배치로 점수화"""
+        if self._score_fn is not None:
+            return [float(score) for score in self._score_fn(pairs)]
+        model = self._load_model()
+        scores = model.predict(pairs, batch_size=len(pairs), show_progress_bar=False, convert_to_numpy=True)
+        return [float(score) for score in scores]
+
+    def _record_timing(self, num_pairs, seconds):
+        per_pair = min(seconds / max(num_pairs, 1), MAX_SECONDS_PER_PAIR)
+        if self._seconds_per_pair is None:
+            self._seconds_per_pair = per_pair
+        else:
+            self._seconds_per_pair = 0.7 * self._seconds_per_pair + 0.3 * per_pair
+
+    def rerank(self, query, docs, top_k=None, deadline=None):
+        """
+        후보 문서 재순위화
+
+        Args:
+            query: 질의
+            docs: 1단계 순위대로 정렬된 후보 Document 목록
+            top_k: 반환 개수 (기본: 전체)
+            deadline: time.perf_counter() 기준 마감 시각 (None이면 모든 후보 점수화)
+
+        Returns:
+            [(Document, 점수 또는 None), ...] - 점수화된 후보는 점수 내림차순, 미점수 후보는 1단계 순서
+        """
+        if not docs:
+            return []
+
+        query_key = _text_key(query)
+        keys = [(query_key, _text_key(doc.page_content)) for doc in docs]
+        scores = [self.cache.get(key) for key in keys]
+
+        pending = [i for i, score in enumerate(scores) if score is None]
+        scored_now = 0
+        if pending and self._score_fn is None:
+            # 모델 로드 시간이 첫 배치의 쌍당 처리 시간에 섞이지 않도록 측정 전에 로드
+            self._load_model()
+
+        for start in range(0, len(pending), self.batch_size):
+            batch = pending[start:start + self.batch_size]
+
+            if deadline is not None:
+                remaining = deadline - time.perf_counter()
+                if self._seconds_per_pair is not None:
+                    # 남은 시간 안에 끝낼 수 있는 만큼만 점수화 (마감 전이면 추정치 갱신용으로 최소 PROBE_PAIRS개)
+                    affordable = max(int(remaining / self._seconds_per_pair), PROBE_PAIRS) if remaining > 0 else 0
+                    batch = batch[:affordable]
+                elif remaining <= 0:
+                    batch = []
+                if not batch:
+                    break
+
+            started = time.perf_counter()
+            batch_scores = self.score_pairs([(query, docs[i].page_content) for i in batch])
+            self._record_timing(len(batch), time.perf_counter() - started)
+
+            for i, score in zip(batch, batch_scores):
+                scores[i] = score
+                self.cache.put(keys[i], score)
+            scored_now += len(batch)
+
+            if len(batch) < self.batch_size and start + self.batch_size < len(pending):
+                # 시간 부족으로 배치를 줄였다면 다음 배치는 시도하지 않음
+                break
+
+        scored = sorted(
+            ((doc, score, rank) for rank, (doc, score) in enumerate(zip(docs, scores)) if score is not None),
+            key=lambda item: (-item[1], item[2])
+        )
+        unscored = [(doc, None) for doc, score in zip(docs, scores) if score is None]
+        ranked = [(doc, score) for doc, score, _ in scored] + unscored
+
+        logger.info(
+            f"재순위화: 후보 {len(docs)}개 중 캐시 {len(docs) - len(pending)}개, 새로 점수화 {scored_now}개"
+            + (f", 시간 예산 소진으로 {len(unscored)}개 미점수" if unscored else "")
+        )
+        return ranked[:top_k] if top_k else ranked
@@ -0,0 +1,299 @@
+"""
+다중 소스 의료 데이터 수집 - 소스별 어댑터로 스키마를 매핑하여 하나의 문서 모델로 정규화
+
+data/ 아래의 소스는 형태가 서로 다르다.
+    내과환자      {id, name, age, gender, diagnosis, prescription, blood_pressure, visit_date}
+    외과환자      {id, name, age, gender, diagnosis, surgery_date, surgeon, visit_date}
+    당일진료환자  {id, name, age, gender, symptoms, temperature, blood_pressure, visit_time}
+    약처방        {id, name, age, gender, medication, dosage, duration, prescribed_date}
+    *_patients.json, *_patients-00000.jsonl[.gz]/.parquet (MedicalDataGenerator가 생성한 중첩 구조)
+
+각 소스 계열은 어댑터로 등록되며, 파일은 디렉토리/파일 이름 또는 레코드의 필드 구성으로
+알맞은 어댑터에 배정된다. 모든 문서는 공통 메타데이터(patient_id, name, gender, age,
+department, document_type, source, source_type)를 가진다. 약물 정보는 생성 데이터의 약물 문서와
+같은 메타데이터 키(medication_name, medication_class)로 기록한다.
+"""
+import json
+import logging
+import re
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from dataset_io import department_of, find_dataset_files, read_patients
+
+logger = logging.getLogger(__name__)
+
+ADAPTERS = {}
+
+
+def register_adapter(adapter):
+    """어댑터 등록 (같은 이름이면 교체)"""
+    ADAPTERS[adapter.name] = adapter
+    return adapter
+
+
+def _date_part(value):
+    """'2025-05-10 10:00' -> '2025-05-10' (날짜 필터가 %Y-%m-%d 형식을 사용)"""
+    return str(value)[:10]
+
+
+def _medication_name(value):
+    """'메트포르민 500mg' -> '메트포르민' (용량 표기를 떼어 생성 데이터의 medication_name과 맞춤)"""
+    return re.sub(r"\s+\d[\d.,]*\s*(mg|g|mcg|μg|ml|mL|IU|단위|정|%)\b.*$", "", str(value).strip()) or str(value)
+
+
+def _document(page_content, metadata):
+    from langchain.schema import Document
+
+    return Document(page_content=page_content, metadata=metadata)
+
+
+class SchemaMappingAdapter:
+    """
+    평탄한 레코드용 선언적 스키마 매핑 어댑터
+
+    Args:
+        name: 소스 계열 이름 (source_type 메타데이터로 기록)
+        directories: 이 어댑터가 처리하는 디렉토리/파일 이름 접두사
+        department: 진료과 (메타데이터)
+        document_type: 문서 유형 (메타데이터)
+        title: 문서 제목 (예: "내과 진료 기록")
+        fields: [(필드, 표시 이름, 메타데이터 키 또는 None[, 메타데이터 값 변환 함수]), ...]
+        required_fields: 필드 구성으로 소스를 판별할 때 사용하는 필드
+    """
+    def __init__(self, name, directories, department, document_type, title, fields, required_fields):
+        self.name = name
+        self.directories = tuple(directories)
+        self.department = department
+        self.document_type = document_type
+        self.title = title
+        self.fields = fields
+        self.required_fields = frozenset(required_fields)
+
+    def matches_path(self, path):
+        path = Path(path)
+        return any(path.parent.name == d or path.stem.startswith(d) for d in self.directories)
+
+    def matches_record(self, record):
+        return self.required_fields.issubset(record)
+
+    def to_documents(self, record, source):
+        lines = [
+            f"환자 ID: {record.get('id', '정보 없음')}",
+            f"이름: {record.get('name', '정보 없음')}",
+            f"성별: {record.get('gender', '정보 없음')}",
+            f"나이: {record.get('age', '정보 없음')}",
+            "",
+            f"[{self.title}]",
+        ]
+        metadata = {
+            "patient_id": record.get("id"),
+            "name": record.get("name"),
+            "gender": record.get("gender"),
+            "age": record.get("age"),
+            "department": self.department,
+            "document_type": self.document_type,
+            "source": str(source),
+            "source_type": self.name,
+        }
+
+        for field, label, metadata_key, *convert in self.fields:
+            value = record.get(field)
+            if value in (None, ""):
+                continue
+            lines.append(f"{label}: {value}")
+            if metadata_key:
+                metadata[metadata_key] = convert[0](value) if convert else value
+
+        return [_document("\n".join(lines), metadata)]
+
+
+class GeneratedPatientsAdapter:
+    """
+    MedicalDataGenerator의 중첩 환자 레코드 어댑터 (*_patients.json과 스트리밍 저장된 jsonl/jsonl.gz/parquet 샤드)
+
+    변환은 MedicalVectorStore._convert_patient_to_documents처럼 (patient, department)를 받는
+    함수로 위임한다.
+    """
+    name = "generated_patients"
+
+    def __init__(self, converter):
+        self.converter = converter
+
+    _FILE_NAME = re.compile(r"_patients(-\d+)?(\.json|\.jsonl|\.jsonl\.gz|\.parquet)$")
+
+    def matches_path(self, path):
+        return bool(self._FILE_NAME.search(Path(path).name))
+
+    def matches_record(self, record):
+        return "id" in record and "diagnoses" in record and "visits" in record
+
+    def to_documents(self, record, source):
+        department = record.get("department") or department_of(source)
+        documents = self.converter(record, department)
+        for doc in documents:
+            doc.metadata.setdefault("source", str(source))
+            doc.metadata.setdefault("source_type", self.name)
+        return documents
+
+
+register_adapter(SchemaMappingAdapter(
+    name="internal_medicine_outpatient",
+    directories=("내과환자",),
+    department="internal_medicine",
+    document_type="visit",
+    title="내과 진료 기록",
+    fields=[
+        ("visit_date", "방문일", "visit_date"),
+        ("diagnosis", "진단명", "diagnosis_name"),
+        ("prescription", "처방", "medication_name", _medication_name),
+        ("blood_pressure", "혈압", "blood_pressure"),
+    ],
+    required_fields=("id", "diagnosis", "prescription", "visit_date"),
+))
+
+register_adapter(SchemaMappingAdapter(
+    name="surgery_outpatient",
+    directories=("외과환자",),
+    department="surgery",
+    document_type="procedure",
+    title="외과 수술 기록",
+    fields=[
+        ("diagnosis", "진단명", "diagnosis_name"),
+        ("surgery_date", "수술일", "procedure_date"),
+        ("surgeon", "집도의", "doctor"),
+        ("visit_date", "방문일", "visit_date"),
+    ],
+    required_fields=("id", "diagnosis", "surgery_date"),
+))
+
+register_adapter(SchemaMappingAdapter(
+    name="same_day_visit",
+    directories=("당일진료환자",),
+    department="emergency",
+    document_type="visit",
+    title="당일 진료 기록",
+    fields=[
+        ("visit_time", "방문 시각", "visit_date", _date_part),
+        ("symptoms", "증상", "chief_complaint"),
+        ("temperature", "체온", "temperature"),
+        ("blood_pressure", "혈압", "blood_pressure"),
+    ],
+    required_fields=("id", "symptoms", "visit_time"),
+))
+
+# 약처방 소스에는 진료과가 없으며, 처방 약물(만성질환 약물)에 맞춰 내과로 기록
+register_adapter(SchemaMappingAdapter(
+    name="prescription",
+    directories=("약처방",),
+    department="internal_medicine",
+    document_type="medication",
+    title="처방 정보",
+    fields=[
+        ("medication", "약물", "medication_name", _medication_name),
+        ("dosage", "용법", "dosage"),
+        ("duration", "기간", "duration"),
+        ("prescribed_date", "처방일", "prescription_date"),
+    ],
+    required_fields=("id", "medication", "prescribed_date"),
+))
+
+
+def _read_records(path):
+    """JSON 배열/객체, JSON Lines(.gz), Parquet 파일의 레코드 목록"""
+    path = Path(path)
+    if path.suffix != ".json":
+        return list(read_patients(path))
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return data if isinstance(data, list) else [data]
+
+
+def select_adapter(path, records, adapters):
+    """
+    파일 이름으로 어댑터를 고르고, 없으면 첫 레코드의 필드 구성으로 판별
+    """
+    for adapter in adapters:
+        if adapter.matches_path(path):
+            return adapter
+    if records:
+        for adapter in adapters:
+            if adapter.matches_record(records[0]):
+                return adapter
+    return None
+
+
+def load_source_file(path, adapters, medication_classes=None):
+    """
+    파일 하나를 어댑터로 변환 - (문서 리스트, 어댑터 이름) 반환
+
+    Args:
+        medication_classes: 약물명 -> 약물 계열 (medication_class 메타데이터가 없는 약물 문서에 채움)
+    """
+    try:
+        records = _read_records(path)
+    except Exception as e:
+        logger.error(f"Error loading {path}: {e}")
+        return [], None
+
+    adapter = select_adapter(path, records, adapters)
+    if adapter is None:
+        logger.warning(f"{path}에 맞는 어댑터가 없어 건너뜁니다.")
+        return [], None
+
+    documents = []
+    for record in records:
+        try:
+            documents.extend(adapter.to_documents(record, path))
+        except Exception as e:
+            logger.error(f"{path}의 레코드 변환 중 오류 발생 (id={record.get('id')}): {e}")
+
+    for doc in documents if medication_classes else ():
+        name = doc.metadata.get("medication_name")
+        if name in medication_classes and not doc.metadata.get("medication_class"):
+            doc.metadata["medication_class"] = medication_classes[name]
+    return documents, adapter.name
+
+
+def load_sources(paths, adapters=None, max_workers=4, medication_classes=None):
+    """
+    여러 소스 디렉토리/파일을 병렬로 읽어 정규화된 문서 목록으로 반환
+
+    Args:
+        paths: 디렉토리 또는 파일 경로 목록
+            (디렉토리는 하위의 *.json, *.jsonl과 생성기 데이터셋 파일 *_patients*.jsonl.gz/.parquet을 수집)
+        adapters: 사용할 어댑터 목록 (기본: 등록된 전체)
+        medication_classes: 약물명 -> 약물 계열 (load_source_file 참고)
+    """
+    adapters = list(adapters if adapters is not None else ADAPTERS.values())
+
+    files = []
+    for path in paths:
+        path = Path(path)
+        if path.is_dir():
+            # 원본 소스(*.json, *.jsonl)와 생성기 데이터셋 샤드(*_patients-00000.jsonl.gz/.parquet 등)
+            files.extend(sorted(
+                {p for p in path.rglob("*") if p.is_file() and p.suffix in (".json", ".jsonl")}
+                | set(find_dataset_files(path, "**/*_patients*"))
+            ))
+        elif path.exists():
+            files.append(path)
+        else:
+            logger.warning(f"소스 경로가 존재하지 않습니다: {path}")
+
+    if not files:
+        return []
+
+    documents = []
+    counts = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # map은 입력 순서를 유지하므로 결과 문서 순서가 실행마다 동일함
+        for file_documents, adapter_name in executor.map(
+            lambda p: load_source_file(p, adapters, medication_classes), files
+        ):
+            documents.extend(file_documents)
+            if adapter_name:
+                counts[adapter_name] = counts.get(adapter_name, 0) + len(file_documents)
+
+    logger.info(f"{len(files)}개 파일에서 {len(documents)}개 문서 수집: {counts}")
+    return documents
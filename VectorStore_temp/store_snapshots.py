@@ -0,0 +1,260 @@
+"""
+벡터 스토어 버전 스냅샷 및 무중단 핫 리로드
+
+디렉토리 구조:
+    {store_path}/
+        CURRENT                     # 현재 버전 이름 (원자적으로 교체)
+        versions/
+            v000001-20250521T012104/
+                index.faiss
+                index.pkl
+                manifest.json       # 버전, 생성 시각, 벡터 수, 차원, 파일 해시
+
+새 버전은 임시 디렉토리에 완전히 저장한 뒤 이름을 바꾸고, 마지막에 CURRENT 포인터를
+os.replace로 교체하므로 읽는 쪽에서 절반만 쓰인 인덱스를 보는 일이 없다.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+CURRENT_FILENAME = "CURRENT"
+VERSIONS_DIRNAME = "versions"
+MANIFEST_FILENAME = "manifest.json"
+
+
+def _fsync_path(path):
+    """파일 또는 디렉토리 내용을 디스크에 동기화 (디렉토리 fsync를 지원하지 않는 OS는 무시)"""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class VectorStoreSnapshots:
+    """
+    하나의 벡터 스토어 경로에 대한 버전 스냅샷 관리
+    """
+    def __init__(self, store_path):
+        self.store_path = Path(store_path)
+        self.versions_path = self.store_path / VERSIONS_DIRNAME
+        self.current_file = self.store_path / CURRENT_FILENAME
+
+    def list_versions(self):
+        """완성된 버전 목록 (오래된 순)"""
+        if not self.versions_path.exists():
+            return []
+        return sorted(
+            p.name for p in self.versions_path.iterdir()
+            if p.is_dir() and not p.name.startswith(".") and (p / MANIFEST_FILENAME).exists()
+        )
+
+    def current_version(self):
+        """CURRENT 포인터가 가리키는 버전 이름 (없으면 None)"""
+        try:
+            version = self.current_file.read_text(encoding="utf-8").strip()
+        except FileNotFoundError:
+            return None
+        return version or None
+
+    def version_path(self, version):
+        return self.versions_path / version
+
+    def read_manifest(self, version=None):
+        version = version or self.current_version()
+        if version is None:
+            return None
+        with open(self.version_path(version) / MANIFEST_FILENAME, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _next_version(self):
+        versions = self.list_versions()
+        last = int(versions[-1][1:7]) if versions else 0
+        return f"v{last + 1:06d}-{datetime.now().strftime('%Y%m%dT%H%M%S')}"
+
+    def publish(self, vectorstore, extra_manifest=None, keep=None):
+        """
+        새 버전 스냅샷 저장 후 CURRENT 포인터를 원자적으로 교체
+
+        Args:
+            vectorstore: LangChain FAISS 벡터 스토어
+            extra_manifest: 매니페스트에 추가할 정보 (예: 빌드 설정)
+            keep: 지정하면 현재 버전을 포함해 최근 keep개만 남기고 정리
+        """
+        self.versions_path.mkdir(parents=True, exist_ok=True)
+        version = self._next_version()
+        tmp_path = self.versions_path / f".tmp-{uuid.uuid4().hex}"
+
+        try:
+            vectorstore.save_local(str(tmp_path))
+
+            files = {}
+            for file_path in sorted(tmp_path.iterdir()):
+                _fsync_path(file_path)
+                files[file_path.name] = {
+                    "size": file_path.stat().st_size,
+                    "sha256": _file_sha256(file_path),
+                }
+
+            manifest = {
+                "version": version,
+                "created_at": datetime.now().isoformat(timespec="seconds"),
+                "num_vectors": int(vectorstore.index.ntotal),
+                "dimension": int(vectorstore.index.d),
+                "files": files,
+            }
+            if extra_manifest:
+                manifest.update(extra_manifest)
+
+            manifest_path = tmp_path / MANIFEST_FILENAME
+            with open(manifest_path, "w", encoding="utf-8") as f:
+                json.dump(manifest, f, ensure_ascii=False, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+
+            os.rename(tmp_path, self.version_path(version))
+            _fsync_path(self.versions_path)
+        except Exception:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            raise
+
+        self._switch_current(version)
+        logger.info(f"벡터 스토어 스냅샷 {version} 게시 완료 ({self.store_path})")
+
+        if keep:
+            self.prune(keep)
+        return version
+
+    def _switch_current(self, version):
+        """CURRENT 포인터를 임시 파일 + os.replace로 원자적으로 교체"""
+        tmp_file = self.store_path / f".{CURRENT_FILENAME}.{uuid.uuid4().hex}"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            f.write(version + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.current_file)
+        _fsync_path(self.store_path)
+
+    def rollback(self, version):
+        """이전 버전으로 CURRENT 포인터 되돌리기"""
+        if version not in self.list_versions():
+            raise ValueError(f"존재하지 않는 버전입니다: {version}")
+        self._switch_current(version)
+        logger.info(f"벡터 스토어를 {version} 버전으로 되돌렸습니다.")
+
+    def prune(self, keep=3):
+        """현재 버전을 제외하고 최근 keep개 이전의 버전 삭제"""
+        current = self.current_version()
+        versions = self.list_versions()
+        for version in versions[:-keep] if keep > 0 else versions:
+            if version != current:
+                shutil.rmtree(self.version_path(version), ignore_errors=True)
+                logger.info(f"오래된 스냅샷 삭제: {version}")
+
+    def load(self, embeddings, version=None, nprobe=None):
+        """
+        지정한 버전(기본: CURRENT)의 FAISS 벡터 스토어 로드
+
+        IVF 인덱스는 nprobe(생략하면 매니페스트의 빌드 설정)와 direct map을 준비한 뒤 반환한다.
+        """
+        from ondisk_index import load_faiss_store
+
+        version = version or self.current_version()
+        if version is None:
+            raise FileNotFoundError(f"스냅샷이 없습니다: {self.store_path}")
+
+        if nprobe is None:
+            nprobe = (self.read_manifest(version) or {}).get("nprobe")
+        return load_faiss_store(self.version_path(version), embeddings, nprobe)
+
+
+class HotReloadingVectorStore:
+    """
+    CURRENT 포인터를 감시하다가 새 버전이 게시되면 백그라운드에서 로드 후 교체하는 벡터 스토어
+
+    교체는 참조 하나를 바꾸는 것이므로, 이미 시작된 검색은 이전 인덱스로 끝까지 수행된다.
+    여러 단계로 스토어를 사용하는 작업은 current로 한 번 고정한 뒤 사용한다.
+    """
+    def __init__(self, snapshots, embeddings, poll_interval=5.0):
+        self.snapshots = snapshots
+        self.embeddings = embeddings
+        self.poll_interval = poll_interval
+        self.version = snapshots.current_version()
+        self._current = snapshots.load(embeddings, self.version)
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    @property
+    def current(self):
+        """현재 버전의 벡터 스토어"""
+        return self._current
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._watch, name="vector-store-reloader", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def check_for_update(self):
+        """
+        새 버전이 있으면 로드하여 교체 (교체되면 True)
+        """
+        version = self.snapshots.current_version()
+        if version is None or version == self.version:
+            return False
+
+        try:
+            vectorstore = self.snapshots.load(self.embeddings, version)
+        except Exception as e:
+            logger.error(f"새 벡터 스토어 버전 {version} 로드 실패, 기존 버전 유지: {e}")
+            return False
+
+        previous = self.version
+        self._current = vectorstore
+        self.version = version
+        logger.info(f"벡터 스토어 핫 리로드 완료: {previous} -> {version}")
+        return True
+
+    def _watch(self):
+        while not self._stop_event.wait(self.poll_interval):
+            self.check_for_update()
+
+    def __getattr__(self, name):
+        # similarity_search 등은 현재 버전 스토어로 위임
+        if name == "_current":
+            raise AttributeError(name)
+        return getattr(self._current, name)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
@@ -0,0 +1,386 @@
+"""
+환자별 시계열 인덱스 - "최근 3개월 혈압", "크레아티닌 악화" 같은 시간 조건 질의
+
+환자 기록의 검사 수치(lab_results), 활력징후(visits[].vital_signs), 방문 이벤트를 관측값 하나당 한 행으로
+모아 (항목, 환자, 날짜) 순으로 정렬한 NumPy 배열에 저장한다. 같은 항목의 관측값이 연속 구간에 모여 있으므로
+항목 하나에 대한 시간 구간/추세 조건은 그 구간만 벡터 연산으로 처리한다.
+
+시계열 = (환자, 항목) 한 쌍. 시계열마다 추세 통계를 미리 계산해 둔다.
+    count           관측 수
+    first_date, first_value, latest_date, latest_value
+    mean            평균값
+    slope_per_30d   최소제곱 기울기 (30일당 변화량, 관측 2개 미만이면 NaN)
+    abnormal_count  이상 관측 수 (검사: H/L 플래그, 활력징후: VITAL_NORMAL_RANGES 밖)
+
+시간 구간을 지정한 질의는 구간 안의 관측값만으로 같은 통계를 다시 계산한다.
+"""
+import logging
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+VISIT_ITEM = "visit"
+
+# 활력징후 정상 범위 (이 범위를 벗어나면 이상 관측)
+VITAL_NORMAL_RANGES = {
+    "systolic_bp": (90, 139),
+    "diastolic_bp": (60, 89),
+    "pulse": (60, 100),
+    "temperature": (35.5, 37.4),
+    "respiratory_rate": (12, 20),
+    "oxygen_saturation": (95, 100),
+    "blood_glucose": (70, 125),
+}
+
+# 질의 표현 -> 항목 이름
+ITEM_ALIASES = {
+    "혈압": "systolic_bp",
+    "수축기 혈압": "systolic_bp",
+    "이완기 혈압": "diastolic_bp",
+    "blood pressure": "systolic_bp",
+    "맥박": "pulse",
+    "심박수": "pulse",
+    "체온": "temperature",
+    "호흡수": "respiratory_rate",
+    "산소포화도": "oxygen_saturation",
+    "혈당": "blood_glucose",
+    "방문": VISIT_ITEM,
+    "creatinine": "크레아티닌",
+    "hemoglobin": "혈색소",
+    "glucose": "공복혈당",
+    "hba1c": "당화혈색소",
+    "troponin": "트로포닌 I",
+}
+
+# 값이 커질수록 나빠지는 항목 +1, 작아질수록 나빠지는 항목 -1 ("악화" 질의의 방향)
+WORSENING_DIRECTION = {
+    "systolic_bp": 1, "diastolic_bp": 1, "blood_glucose": 1, "respiratory_rate": 1, "oxygen_saturation": -1,
+    "크레아티닌": 1, "BUN": 1, "공복혈당": 1, "당화혈색소": 1, "총 콜레스테롤": 1, "LDL 콜레스테롤": 1,
+    "중성지방": 1, "HDL 콜레스테롤": -1, "혈색소": -1, "CRP": 1, "ESR": 1, "AST": 1, "ALT": 1, "ALP": 1,
+    "GGT": 1, "총 빌리루빈": 1, "직접 빌리루빈": 1, "BNP": 1, "NT-proBNP": 1, "트로포닌 I": 1, "CK-MB": 1,
+}
+
+# 문서 메타데이터의 날짜 키 (최근성 가중치 계산용)
+DOCUMENT_DATE_KEYS = ("visit_date", "lab_date", "study_date", "procedure_date", "diagnosis_date")
+
+STAT_COLUMNS = [
+    "patient_id", "count", "first_date", "first_value", "latest_date", "latest_value",
+    "mean", "slope_per_30d", "abnormal_count",
+]
+
+
+def _as_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_day(value):
+    """날짜 문자열/Timestamp/datetime64 -> numpy datetime64[D] (해석할 수 없으면 NaT)"""
+    timestamp = pd.to_datetime(value, errors="coerce") if value is not None else pd.NaT
+    return np.datetime64("NaT") if pd.isna(timestamp) else np.datetime64(timestamp.date(), "D")
+
+
+class TemporalIndex:
+    """
+    (항목, 환자, 날짜) 순으로 정렬된 관측값 배열과 시계열별 추세 통계
+
+    Attributes:
+        items: 항목 이름 -> (시작 시계열 번호, 끝 시계열 번호)
+        series_patient: 시계열 번호 -> 환자 ID
+        offsets: 시계열 번호 -> 관측값 시작 위치 (길이 = 시계열 수 + 1)
+        dates, values, abnormal: 관측값 배열 (datetime64[D], float64, bool)
+        stats: 시계열별 추세 통계 dict (키: STAT_COLUMNS에서 patient_id 제외)
+    """
+    def __init__(self, items, series_patient, offsets, dates, values, abnormal):
+        self.items = items
+        self.series_patient = series_patient
+        self.offsets = offsets
+        self.dates = dates
+        self.values = values
+        self.abnormal = abnormal
+        self.series_lookup = {}
+        for item, (start, end) in items.items():
+            for series in range(start, end):
+                self.series_lookup[(series_patient[series], item)] = series
+
+        self.max_date = dates.max() if len(dates) else np.datetime64("NaT")
+        self._days = (dates - dates.min()).astype(np.float64) if len(dates) else np.zeros(0)
+        self.stats = self._series_stats(0, len(series_patient))
+
+    @classmethod
+    def from_records(cls, records):
+        """
+        Args:
+            records: (patient, department) 튜플의 iterable
+        """
+        patient_col, item_col, date_col, value_col, abnormal_col = [], [], [], [], []
+
+        def add(patient_id, item, date, value, abnormal):
+            patient_col.append(patient_id)
+            item_col.append(item)
+            date_col.append(date)
+            value_col.append(value)
+            abnormal_col.append(abnormal)
+
+        for patient, _ in records:
+            patient_id = patient["id"]
+            for lab in patient.get("lab_results", []):
+                for item, result in (lab.get("results") or {}).items():
+                    value = _as_float(result.get("value"))
+                    if value is not None:
+                        add(patient_id, item, lab.get("date"), value, bool(result.get("flag")))
+            for visit in patient.get("visits", []):
+                add(patient_id, VISIT_ITEM, visit.get("date"), 1.0, False)
+                for item, raw in (visit.get("vital_signs") or {}).items():
+                    value = _as_float(raw)
+                    if value is None or (item == "blood_glucose" and value == 0):
+                        continue
+                    low, high = VITAL_NORMAL_RANGES.get(item, (-np.inf, np.inf))
+                    add(patient_id, item, visit.get("date"), value, not (low <= value <= high))
+
+        frame = pd.DataFrame({
+            "patient_id": pd.Series(patient_col, dtype=object),
+            "item": pd.Series(item_col, dtype=object),
+            "date": pd.to_datetime(pd.Series(date_col, dtype=object), errors="coerce"),
+            "value": pd.Series(value_col, dtype=np.float64),
+            "abnormal": pd.Series(abnormal_col, dtype=bool),
+        }).dropna(subset=["date"]).sort_values(["item", "patient_id", "date"], kind="stable")
+
+        series_codes = frame.groupby(["item", "patient_id"], sort=False).ngroup().to_numpy()
+        starts = np.flatnonzero(np.r_[True, series_codes[1:] != series_codes[:-1]]) if len(frame) else np.zeros(0, int)
+        offsets = np.r_[starts, len(frame)].astype(np.int64)
+        series_items = frame["item"].to_numpy(dtype=object)[starts]
+        series_patient = frame["patient_id"].to_numpy(dtype=object)[starts]
+
+        items = {}
+        for series, item in enumerate(series_items):
+            start, _ = items.get(item, (series, series))
+            items[item] = (start, series + 1)
+
+        index = cls(
+            items,
+            series_patient,
+            offsets,
+            frame["date"].to_numpy().astype("datetime64[D]"),
+            frame["value"].to_numpy(),
+            frame["abnormal"].to_numpy(),
+        )
+        logger.info(
+            f"시계열 인덱스 생성 완료: 항목 {len(items)}개, 시계열 {len(series_patient)}개, 관측값 {len(frame)}개"
+        )
+        return index
+
+    @classmethod
+    def from_json_files(cls, data_path, file_pattern="*_patients*"):
+        from dataset_io import iter_patient_records
+
+        return cls.from_records(iter_patient_records(data_path, file_pattern))
+
+    def resolve_item(self, name):
+        """질의 표현 -> 항목 이름 (별칭, 대소문자 무시)"""
+        if name in self.items:
+            return name
+        alias = ITEM_ALIASES.get(str(name).strip().lower()) or ITEM_ALIASES.get(str(name).strip())
+        if alias in self.items:
+            return alias
+        for item in self.items:
+            if item.lower() == str(name).strip().lower():
+                return item
+        raise ValueError(f"시계열 인덱스에 없는 항목입니다: {name}")
+
+    def _series_stats(self, first_series, end_series, start_date=None, end_date=None):
+        """
+        시계열 구간 [first_series, end_series)의 추세 통계 - 날짜 구간이 있으면 그 안의 관측값만 사용
+        """
+        series_count = end_series - first_series
+        lo, hi = self.offsets[first_series], self.offsets[end_series]
+        owners = np.repeat(np.arange(series_count), np.diff(self.offsets[first_series:end_series + 1]))
+
+        mask = np.ones(hi - lo, dtype=bool)
+        if start_date is not None:
+            mask &= self.dates[lo:hi] >= start_date
+        if end_date is not None:
+            mask &= self.dates[lo:hi] <= end_date
+
+        positions = np.flatnonzero(mask)
+        owners = owners[positions]
+        days = self._days[lo:hi][positions]
+        values = self.values[lo:hi][positions]
+
+        count = np.bincount(owners, minlength=series_count)
+        sum_t = np.bincount(owners, weights=days, minlength=series_count)
+        sum_v = np.bincount(owners, weights=values, minlength=series_count)
+        sum_tt = np.bincount(owners, weights=days * days, minlength=series_count)
+        sum_tv = np.bincount(owners, weights=days * values, minlength=series_count)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            denominator = count * sum_tt - sum_t * sum_t
+            slope = np.where(
+                (count >= 2) & (denominator > 0), (count * sum_tv - sum_t * sum_v) / denominator * 30, np.nan
+            )
+            mean = np.where(count > 0, sum_v / np.maximum(count, 1), np.nan)
+
+        # 관측값은 시계열 안에서 날짜순이므로 첫/마지막 위치가 가장 이른/최근 관측
+        first = np.full(series_count, len(positions), dtype=np.int64)
+        last = np.full(series_count, -1, dtype=np.int64)
+        np.minimum.at(first, owners, np.arange(len(positions)))
+        np.maximum.at(last, owners, np.arange(len(positions)))
+        has = count > 0
+        dates = self.dates[lo:hi][positions]
+
+        def pick(source, where, fill):
+            result = np.full(series_count, fill, dtype=source.dtype)
+            result[has] = source[where[has]]
+            return result
+
+        return {
+            "count": count,
+            "first_date": pick(dates, first, np.datetime64("NaT")),
+            "first_value": pick(values, first, np.nan),
+            "latest_date": pick(dates, last, np.datetime64("NaT")),
+            "latest_value": pick(values, last, np.nan),
+            "mean": mean,
+            "slope_per_30d": slope,
+            "abnormal_count": np.bincount(
+                owners, weights=self.abnormal[lo:hi][positions], minlength=series_count
+            ).astype(np.int64),
+        }
+
+    def window_bounds(self, days=None, start=None, end=None, reference_date=None):
+        """최근 days일 또는 [start, end] 날짜 구간 (기준일 기본값: 인덱스의 마지막 관측일)"""
+        end_date = _to_day(end) if end is not None else None
+        start_date = _to_day(start) if start is not None else None
+        if days is not None:
+            reference = _to_day(reference_date) if reference_date is not None else self.max_date
+            end_date = end_date if end_date is not None else reference
+            start_date = reference - np.timedelta64(int(days), "D")
+        return start_date, end_date
+
+    def trend(self, item, days=None, start=None, end=None, reference_date=None):
+        """
+        항목 하나의 환자별 추세 통계 표
+
+        Args:
+            days: 기준일로부터 최근 days일 안의 관측값만 사용 (예: 90 -> 최근 3개월)
+
+        Returns:
+            DataFrame (columns: STAT_COLUMNS, 구간 안에 관측값이 있는 환자만)
+        """
+        patient_ids, stats = self._item_stats(item, days, start, end, reference_date)
+        return pd.DataFrame({"patient_id": patient_ids, **stats})[STAT_COLUMNS]
+
+    def _item_stats(self, item, days=None, start=None, end=None, reference_date=None):
+        """항목 하나의 (환자 ID 배열, 통계 배열 dict) - 구간 안에 관측값이 있는 환자만"""
+        first_series, end_series = self.items[self.resolve_item(item)]
+        start_date, end_date = self.window_bounds(days, start, end, reference_date)
+        if start_date is None and end_date is None:
+            stats = {name: column[first_series:end_series] for name, column in self.stats.items()}
+        else:
+            stats = self._series_stats(first_series, end_series, start_date, end_date)
+
+        present = stats["count"] > 0
+        return (
+            self.series_patient[first_series:end_series][present],
+            {name: column[present] for name, column in stats.items()},
+        )
+
+    def series(self, patient_id, item, days=None, start=None, end=None, reference_date=None):
+        """
+        환자 한 명의 항목 시계열
+
+        Returns:
+            (날짜 배열, 값 배열, 이상 여부 배열) - 날짜순
+        """
+        item = self.resolve_item(item)
+        series = self.series_lookup.get((patient_id, item))
+        if series is None:
+            return np.array([], dtype="datetime64[D]"), np.array([]), np.array([], dtype=bool)
+
+        lo, hi = self.offsets[series], self.offsets[series + 1]
+        mask = np.ones(hi - lo, dtype=bool)
+        start_date, end_date = self.window_bounds(days, start, end, reference_date)
+        if start_date is not None:
+            mask &= self.dates[lo:hi] >= start_date
+        if end_date is not None:
+            mask &= self.dates[lo:hi] <= end_date
+        return self.dates[lo:hi][mask], self.values[lo:hi][mask], self.abnormal[lo:hi][mask]
+
+    def query(self, item, days=None, start=None, end=None, reference_date=None, worsening=False, improving=False,
+              min_slope=None, max_slope=None, min_abnormal=None, latest_min=None, latest_max=None, min_count=None,
+              patient_ids=None):
+        """
+        시간 구간/추세 조건을 모두 만족하는 환자 ID 목록
+
+        Args:
+            worsening / improving: WORSENING_DIRECTION 기준으로 나빠지는/좋아지는 추세 (관측 2개 이상)
+            min_slope, max_slope: 30일당 변화량 범위
+            min_abnormal: 구간 안 이상 관측 최소 횟수
+            latest_min, latest_max: 구간 안 가장 최근 값 범위
+            min_count: 구간 안 최소 관측 수
+            patient_ids: 지정하면 이 환자들 중에서만 선택
+
+        예: query("크레아티닌", days=180, worsening=True) -> 최근 6개월 크레아티닌이 상승 추세인 환자
+        """
+        item = self.resolve_item(item)
+        candidates, stats = self._item_stats(item, days, start, end, reference_date)
+        mask = np.ones(len(candidates), dtype=bool)
+        slope = stats["slope_per_30d"]
+
+        if worsening or improving:
+            direction = WORSENING_DIRECTION.get(item)
+            if direction is None:
+                raise ValueError(f"악화 방향이 정의되지 않은 항목입니다: {item}")
+            mask &= (slope * direction > 0) if worsening else (slope * direction < 0)
+        if min_slope is not None:
+            mask &= slope >= min_slope
+        if max_slope is not None:
+            mask &= slope <= max_slope
+        if min_abnormal is not None:
+            mask &= stats["abnormal_count"] >= min_abnormal
+        if latest_min is not None:
+            mask &= stats["latest_value"] >= latest_min
+        if latest_max is not None:
+            mask &= stats["latest_value"] <= latest_max
+        if min_count is not None:
+            mask &= stats["count"] >= min_count
+        if patient_ids is not None:
+            mask &= np.isin(candidates, list(patient_ids))
+
+        return candidates[mask].tolist()
+
+
+def document_date(doc):
+    """문서 날짜 - DOCUMENT_DATE_KEYS 중 메타데이터에 있는 첫 번째 값 (없으면 NaT)"""
+    return _to_day(next((doc.metadata[key] for key in DOCUMENT_DATE_KEYS if doc.metadata.get(key)), None))
+
+
+def recency_weight(day, half_life_days, reference_date):
+    """반감기 half_life_days의 지수 감쇠 가중치 (날짜를 모르면 1.0)"""
+    if np.isnat(day) or np.isnat(reference_date):
+        return 1.0
+    age = max(float((reference_date - day) / np.timedelta64(1, "D")), 0.0)
+    return float(0.5 ** (age / half_life_days))
+
+
+def recency_rescore(scored_docs, half_life_days, reference_date):
+    """
+    (Document, 코사인 점수) 목록에 문서 날짜의 최근성 가중치를 곱해 다시 정렬
+
+    음수 점수에 가중치를 곱하면 오래된 문서일수록 0에 가까워져 오히려 순위가 오르므로,
+    점수를 (1 + 점수) / 2로 [0, 1]에 옮긴 뒤 곱한다. 날짜가 없는 문서(기본 정보, 통합 기록 등)는
+    후보 중 날짜가 있는 문서 가중치의 중앙값을 받는다 (1.0을 주면 모든 최근 기록보다 앞서므로).
+    """
+    reference_date = _to_day(reference_date)
+    days = [document_date(doc) for doc, _ in scored_docs]
+    dated_weights = [recency_weight(day, half_life_days, reference_date) for day in days if not np.isnat(day)]
+    undated_weight = float(np.median(dated_weights)) if dated_weights else 1.0
+
+    rescored = []
+    for (doc, score), day in zip(scored_docs, days):
+        similarity = (1 + min(max(score, -1.0), 1.0)) / 2
+        weight = undated_weight if np.isnat(day) else recency_weight(day, half_life_days, reference_date)
+        rescored.append((doc, similarity * weight))
+    return sorted(rescored, key=lambda pair: -pair[1])
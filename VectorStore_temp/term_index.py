@@ -0,0 +1,336 @@
+"""
+의료 용어 자동완성 / 오타 교정 인덱스 (접두사 트라이 + SymSpell 삭제 인덱스)
+
+MedicalDataGenerator 사전의 진단명(동의어 포함), 약물명/약물 계열, 검사 항목을 모아
+사용자가 입력한 부분 표기("메트포", "아토르바")와 오타("메트포르빈")를 사전 용어로 바꾼다.
+
+    자모 키       한글 음절을 초성/중성/종성 자모로 분해한 정규화 키 ("메트" -> "ㅁㅔㅌㅡ")
+                  입력 중인 음절("메트ㅍ")도 접두사로 찾을 수 있고, 오타 거리를 자모(키 입력) 단위로 잰다.
+    접두사 트라이  자모 키 -> 용어 (자동완성)
+    삭제 인덱스    자모 키에서 최대 max_edit_distance개 문자를 지운 문자열 -> 원래 키 (SymSpell)
+                  질의도 같은 방식으로 지운 문자열만 조회하므로 후보 탐색이 사전 크기와 무관하고,
+                  후보만 Damerau-Levenshtein(OSA) 거리로 검증한다.
+
+임베딩 계산 없이 문자열 연산만 하므로 자동완성/교정 한 번이 1ms 이내이며, UI 입력 보조와
+검색 전 쿼리 정규화(normalize_query)에 함께 쓴다.
+"""
+import logging
+import re
+from collections import OrderedDict
+
+from concept_index import PrefixTrie, normalize_term
+
+logger = logging.getLogger(__name__)
+
+_CHOSEONG = "ㄱㄲㄴㄷㄸㄹㅁㅂㅃㅅㅆㅇㅈㅉㅊㅋㅌㅍㅎ"
+_JUNGSEONG = "ㅏㅐㅑㅒㅓㅔㅕㅖㅗㅘㅙㅚㅛㅜㅝㅞㅟㅠㅡㅢㅣ"
+_JONGSEONG = ("", "ㄱ", "ㄲ", "ㄳ", "ㄴ", "ㄵ", "ㄶ", "ㄷ", "ㄹ", "ㄺ", "ㄻ", "ㄼ", "ㄽ", "ㄾ", "ㄿ", "ㅀ",
+              "ㅁ", "ㅂ", "ㅄ", "ㅅ", "ㅆ", "ㅇ", "ㅈ", "ㅊ", "ㅋ", "ㅌ", "ㅍ", "ㅎ")
+_HANGUL_FIRST, _HANGUL_COUNT = 0xAC00, 11172
+
+_TOKEN_EDGES = re.compile(r"^([\"'(\[]*)(.*?)([\"'.,?!)\]]*)$")
+
+# 용어 종류별 자동완성 순서 (같은 접두사면 진단 > 약물 > 검사 > 약물 계열 > 검사 묶음)
+KIND_ORDER = ("diagnosis", "medication", "lab", "drug_class", "lab_panel")
+
+# 쿼리 정규화 시 용어 뒤에서 떼어 볼 조사 ("메트포르민을" -> "메트포르민" + "을", 긴 조사부터)
+# 조사가 아닌 글자는 떼지 않는다 ("뇌졸중후유증"을 "뇌졸중후" + "유증"으로 보지 않도록)
+JOSA_SUFFIXES = tuple(sorted((
+    "을", "를", "이", "가", "은", "는", "의", "에", "와", "과", "도", "만", "로", "으로", "에서", "에게",
+    "까지", "부터", "처럼", "보다", "하고", "이나", "나", "랑", "이랑",
+), key=len, reverse=True))
+
+# 이 음절 수 이상인 부분 표기만 쿼리 정규화에서 자동완성으로 채움 ("메트포" -> "메트포르민")
+MIN_COMPLETION_SYLLABLES = 3
+
+
+def to_jamo(text):
+    """한글 음절을 호환 자모로 분해 (그 외 문자는 그대로)"""
+    chars = []
+    for char in text:
+        offset = ord(char) - _HANGUL_FIRST
+        if 0 <= offset < _HANGUL_COUNT:
+            chars.append(_CHOSEONG[offset // 588])
+            chars.append(_JUNGSEONG[offset % 588 // 28])
+            chars.append(_JONGSEONG[offset % 28])
+        else:
+            chars.append(char)
+    return "".join(chars)
+
+
+def term_key(text):
+    """용어 -> 자모 키 (normalize_term 후 자모 분해)"""
+    return to_jamo(normalize_term(text))
+
+
+def deletes(key, max_distance):
+    """key에서 최대 max_distance개 문자를 지운 모든 문자열 (key 포함)"""
+    result, frontier = {key}, {key}
+    for _ in range(max_distance):
+        frontier = {word[:i] + word[i + 1:] for word in frontier if len(word) > 1 for i in range(len(word))}
+        result |= frontier
+    return result
+
+
+def edit_distance(left, right, max_distance):
+    """
+    OSA(인접 문자 교환 포함) 편집 거리 - max_distance를 넘으면 max_distance + 1 반환
+    """
+    if abs(len(left) - len(right)) > max_distance:
+        return max_distance + 1
+    previous_previous, previous = None, list(range(len(right) + 1))
+    for i in range(1, len(left) + 1):
+        current = [i] + [0] * len(right)
+        for j in range(1, len(right) + 1):
+            cost = 0 if left[i - 1] == right[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if (previous_previous is not None and i > 1 and j > 1
+                    and left[i - 1] == right[j - 2] and left[i - 2] == right[j - 1]):
+                current[j] = min(current[j], previous_previous[j - 2] + 1)
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous_previous, previous = previous, current
+    return min(previous[-1], max_distance + 1)
+
+
+def _syllable_count(text):
+    return sum(1 for char in text if 0 <= ord(char) - _HANGUL_FIRST < _HANGUL_COUNT)
+
+
+class MedicalTermIndex:
+    """
+    의료 용어 자동완성 / 오타 교정 인덱스
+
+    Attributes:
+        entries: [{"term", "canonical", "kind", "key"}, ...] - canonical은 동의어의 대표 진단명 (그 외에는 term)
+        trie: 자모 키 -> 용어 번호 트라이
+        delete_index: 삭제 문자열 -> 자모 키 집합
+    """
+    def __init__(self, diagnosis_dict, medications, lab_tests, lab_panels=None, max_edit_distance=2,
+                 cache_size=4096):
+        self.max_edit_distance = max_edit_distance
+        self.entries = []
+        self.entries_by_key = {}
+        self.trie = PrefixTrie()
+        self.delete_index = {}
+        self._token_cache = OrderedDict()
+        self._cache_size = cache_size
+
+        for diseases in diagnosis_dict.values():
+            for disease in diseases:
+                for term in [disease["name"], *disease.get("synonyms", [])]:
+                    self._add(term, disease["name"], "diagnosis")
+        for name, info in medications.items():
+            self._add(name, name, "medication")
+            if info.get("class"):
+                self._add(info["class"], info["class"], "drug_class")
+        for name in lab_tests:
+            self._add(name, name, "lab")
+        for panel, items in (lab_panels or {}).items():
+            self._add(panel, panel, "lab_panel")
+            for name in items:
+                self._add(name, name, "lab")
+
+        for key in self.entries_by_key:
+            for deleted in deletes(key, max_edit_distance):
+                self.delete_index.setdefault(deleted, set()).add(key)
+
+        logger.info(
+            f"용어 자동완성 인덱스 생성: 용어 {len(self.entries)}개, 삭제 문자열 {len(self.delete_index)}개"
+        )
+
+    @classmethod
+    def from_generator(cls, generator, max_edit_distance=2):
+        """MedicalDataGenerator의 진단/약물/검사 사전으로 생성"""
+        return cls(generator.diagnosis_dict, generator.medications, generator.lab_tests,
+                   generator.lab_panels, max_edit_distance)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _add(self, term, canonical, kind):
+        key = term_key(term)
+        if not key:
+            return
+        ids = self.entries_by_key.setdefault(key, [])
+        if any(self.entries[i]["term"] == term and self.entries[i]["kind"] == kind for i in ids):
+            return
+        ids.append(len(self.entries))
+        self.trie.insert(key, len(self.entries))
+        self.entries.append({"term": term, "canonical": canonical, "kind": kind, "key": key})
+
+    def _rank(self, entry):
+        """대표 용어 > 종류 순서 > 짧은 용어"""
+        kind = KIND_ORDER.index(entry["kind"]) if entry["kind"] in KIND_ORDER else len(KIND_ORDER)
+        return (entry["term"] != entry["canonical"], kind, len(entry["key"]), entry["term"])
+
+    def distance_limit(self, key):
+        """키 길이별 허용 편집 거리 (짧은 키는 오타 교정이 다른 용어로 잘못 바뀌기 쉬움)"""
+        if len(key) < 5:
+            return 0
+        if len(key) < 9:
+            return min(1, self.max_edit_distance)
+        return self.max_edit_distance
+
+    def _result(self, entry, distance=0):
+        return {"term": entry["term"], "canonical": entry["canonical"], "kind": entry["kind"], "distance": distance}
+
+    def lookup(self, term):
+        """정확히 일치하는 용어 (정규화/자모 키 기준)"""
+        entries = [self.entries[i] for i in self.entries_by_key.get(term_key(term), ())]
+        return [self._result(entry) for entry in sorted(entries, key=self._rank)]
+
+    def autocomplete(self, prefix, limit=10, fuzzy=True):
+        """
+        접두사로 시작하는 용어 (입력 중인 음절 "메트ㅍ"도 허용)
+
+        Args:
+            fuzzy: 접두사로 찾은 용어가 없으면 접두사에 오타가 있다고 보고 편집 거리 1 이내의 접두사를 가진 용어
+
+        Returns:
+            [{"term", "canonical", "kind", "distance"}, ...] 최대 limit개
+        """
+        key = term_key(prefix)
+        if not key:
+            return []
+        entries = sorted((self.entries[i] for i in self.trie.with_prefix(key)), key=self._rank)
+        if entries or not fuzzy or self.distance_limit(key) == 0:
+            return [self._result(entry) for entry in entries[:limit]]
+
+        # 첫 자모가 같은 용어 중 키 앞부분과의 거리가 1 이하인 용어
+        scored = []
+        for i in self.trie.with_prefix(key[0]):
+            entry = self.entries[i]
+            distance = min(
+                edit_distance(key, entry["key"][:length], 1)
+                for length in range(max(len(key) - 1, 1), len(key) + 2)
+            )
+            if distance <= 1:
+                scored.append((distance, self._rank(entry), entry))
+        scored.sort(key=lambda item: item[:2])
+        return [self._result(entry, distance) for distance, _, entry in scored[:limit]]
+
+    def correct(self, term, max_distance=None, limit=5):
+        """
+        오타 교정 후보 (SymSpell) - 가장 가까운 편집 거리의 용어들, 같은 거리면 대표 용어/종류 순
+
+        지우는 문자 수를 0부터 늘려 가며 조회하고, d개를 지운 단계까지 조회하면 거리 d 이하의 용어는
+        모두 찾은 것이므로 그 안에서 후보가 나오면 더 먼 단계는 조회하지 않는다.
+
+        Args:
+            max_distance: 허용 편집 거리 (None이면 키 길이에 따라 0~max_edit_distance)
+
+        Returns:
+            [{"term", "canonical", "kind", "distance"}, ...] 최대 limit개 (정확히 일치하면 거리 0)
+        """
+        key = term_key(term)
+        if not key:
+            return []
+        if max_distance is None:
+            max_distance = self.distance_limit(key)
+        max_distance = min(max_distance, self.max_edit_distance)
+
+        scored, seen, frontier = [], set(), {key}
+        for level in range(max_distance + 1):
+            if level:
+                frontier = {word[:i] + word[i + 1:] for word in frontier if len(word) > 1 for i in range(len(word))}
+            for deleted in frontier:
+                for candidate in self.delete_index.get(deleted, ()):
+                    if candidate in seen:
+                        continue
+                    seen.add(candidate)
+                    distance = 0 if candidate == key else edit_distance(key, candidate, max_distance)
+                    if distance <= max_distance:
+                        scored.extend((distance, self._rank(self.entries[i]), self.entries[i])
+                                      for i in self.entries_by_key[candidate])
+            if any(distance <= level for distance, _, _ in scored):
+                break
+
+        closest = min((distance for distance, _, _ in scored), default=None)
+        scored = sorted((item for item in scored if item[0] == closest), key=lambda item: item[1])
+        return [self._result(entry, distance) for distance, _, entry in scored[:limit]]
+
+    def _normalize_token(self, token):
+        """
+        단어 하나 정규화 - 단어 전체와 JOSA_SUFFIXES 조사를 뗀 어간을 후보로 정확 일치, 오타 교정,
+        부분 표기 자동완성 순으로 시도
+
+        후보 중 하나라도 사전 용어와 정확히 일치하면 바꾸지 않는다 ("고혈압으로"). 교정/자동완성은
+        조사를 뗀 어간을 먼저 보고(조사를 보존), 자동완성은 한 단어로 된 용어로만 채운다.
+
+        Returns:
+            (바뀐 단어, 교정 정보 또는 None)
+        """
+        cached = self._token_cache.get(token)
+        if cached is not None:
+            self._token_cache.move_to_end(token)
+            return cached
+
+        result = (token, None)
+        lead, core, trail = _TOKEN_EDGES.match(token).groups()
+        candidates = [
+            (core[:-len(josa)], josa) for josa in JOSA_SUFFIXES if core.endswith(josa) and len(core) > len(josa)
+        ]
+        candidates.append((core, ""))
+        if core and not any(self.entries_by_key.get(term_key(stem)) for stem, _ in candidates):
+            for stem, suffix in candidates:
+                matches = self.correct(stem, limit=1)
+                method = "typo"
+                if not matches and (_syllable_count(stem) >= MIN_COMPLETION_SYLLABLES or
+                                    (stem.isascii() and len(stem) >= 4)):
+                    matches = [
+                        match for match in self.autocomplete(stem, limit=len(self.entries), fuzzy=False)
+                        if len(match["term"].split()) == 1
+                    ]
+                    method = "completion"
+                if matches:
+                    match = matches[0]
+                    result = (lead + match["term"] + suffix + trail, {
+                        "original": stem, "term": match["term"], "canonical": match["canonical"],
+                        "kind": match["kind"], "method": method, "distance": match["distance"],
+                    })
+                    break
+
+        self._token_cache[token] = result
+        if len(self._token_cache) > self._cache_size:
+            self._token_cache.popitem(last=False)
+        return result
+
+    def normalize_query(self, query):
+        """
+        쿼리 안의 오타/부분 표기 용어를 사전 용어로 바꿈 (임베딩 전 정규화)
+
+        여러 단어로 된 용어("총 콜레스테롤")가 그대로 있거나, 단어가 뒤 단어들과 이어져 여러 단어 용어의
+        앞부분이 되면("알레르기 응급") 그 단어는 건드리지 않는다.
+
+        Returns:
+            (정규화된 쿼리, [{"original", "term", "canonical", "kind", "method", "distance"}, ...])
+        """
+        tokens = query.split()
+        normalized, corrections = [], []
+        i = 0
+        while i < len(tokens):
+            span = next(
+                (n for n in (3, 2) if i + n <= len(tokens) and self.entries_by_key.get(term_key("".join(tokens[i:i + n])))),
+                None,
+            )
+            if span:
+                normalized.extend(tokens[i:i + span])
+                i += span
+                continue
+            if any(i + n <= len(tokens) and self.trie.with_prefix(term_key("".join(tokens[i:i + n])))
+                   for n in (3, 2)):
+                normalized.append(tokens[i])
+                i += 1
+                continue
+            token, correction = self._normalize_token(tokens[i])
+            normalized.append(token)
+            if correction:
+                corrections.append(correction)
+            i += 1
+
+        if corrections:
+            logger.info(
+                "쿼리 용어 정규화: " + ", ".join(f"{c['original']} -> {c['term']}" for c in corrections)
+            )
+        return " ".join(normalized), corrections
@@ -0,0 +1,117 @@
+"""
+검사 값과 활력징후의 NumPy 벡터화 샘플링
+
+MedicalDataGenerator의 검사 결과/활력징후 분포를 그대로 따르되, 환자 블록 전체의 값을
+한 번의 배열 연산으로 생성한다. 검사 정상 범위 문자열("13-17", "<40")은 LabReferenceTable에서
+한 번만 숫자 배열로 파싱한다.
+"""
+import numpy as np
+
+GENDERS = ("남", "여")
+
+
+def parse_normal_range(normal_range):
+    """
+    정상 범위 문자열 파싱 - "13-17" -> (13, 17), "<40" -> (0, 40), 그 외 (0, 0)
+    """
+    try:
+        if "-" in normal_range:
+            low, high = map(float, normal_range.split("-"))
+            return low, high
+        if "<" in normal_range:
+            return 0.0, float(normal_range.replace("<", ""))
+    except ValueError:
+        pass
+    return 0.0, 0.0
+
+
+class LabReferenceTable:
+    """
+    검사 항목 기준표 - 항목 x 성별 정상 범위를 미리 파싱한 배열
+
+    Attributes:
+        names: 검사 항목 이름 목록
+        index: 항목 이름 -> 행 번호
+        low, high: (항목 수, 성별 수) 정상 범위 하한/상한
+        range_text: 항목별 성별 정상 범위 원문 (결과 레코드에 그대로 기록)
+        units: 항목별 단위
+    """
+    def __init__(self, lab_tests):
+        self.names = list(lab_tests)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.units = [lab_tests[name]["unit"] for name in self.names]
+        self.range_text = [
+            [lab_tests[name]["normal_range"].get(gender, "0-0") for gender in GENDERS]
+            for name in self.names
+        ]
+
+        bounds = np.array([[parse_normal_range(text) for text in row] for row in self.range_text], dtype=np.float64)
+        self.low = bounds[:, :, 0]
+        self.high = bounds[:, :, 1]
+
+
+def gender_index(gender):
+    """성별 -> 기준표 열 번호 (알 수 없으면 첫 열)"""
+    return GENDERS.index(gender) if gender in GENDERS else 0
+
+
+def sample_lab_values(table, item_idx, gender_idx, abnormal_prob, rng):
+    """
+    검사 값 일괄 샘플링
+
+    분포 (항목별):
+        - abnormal_prob 확률로 비정상: 70%는 상한 x U(1.1, 2.0), 30%는 하한 x U(0.5, 0.9)
+        - 그 외 정상 범위 내 U(하한, 상한)
+        - 값은 소수 둘째 자리 반올림, 플래그는 상한 초과 "H", 비정상 중 나머지 "L", 정상 ""
+
+    Returns:
+        (values, flags, is_abnormal) - values는 float 배열, flags는 문자열 배열
+    """
+    item_idx = np.asarray(item_idx, dtype=np.int64)
+    n = len(item_idx)
+    low = table.low[item_idx, gender_idx]
+    high = table.high[item_idx, gender_idx]
+
+    is_abnormal = rng.random(n) < np.asarray(abnormal_prob, dtype=np.float64)
+    is_high = rng.random(n) < 0.7
+
+    high_values = high * rng.uniform(1.1, 2.0, n)
+    low_values = low * rng.uniform(0.5, 0.9, n)
+    normal_values = rng.uniform(low, high)
+
+    values = np.round(np.where(is_abnormal, np.where(is_high, high_values, low_values), normal_values), 2)
+    flags = np.where(is_abnormal, np.where(values > high, "H", "L"), "")
+    return values, flags, is_abnormal
+
+
+def sample_vitals(age, bp_boost_count, diabetic, rng):
+    """
+    활력징후 일괄 샘플링 (방문 단위)
+
+    Args:
+        age: 방문별 환자 나이
+        bp_boost_count: 방문별 치료 전(관해/완치가 아닌) 고혈압 진단 수 - 진단마다 수축기 +20, 이완기 +10
+        diabetic: 방문별 당뇨병 여부 (공복혈당 추가)
+
+    Returns:
+        {활력징후 이름: 배열}
+    """
+    age_factor = np.asarray(age, dtype=np.float64) / 60
+    boost = np.asarray(bp_boost_count, dtype=np.float64)
+    n = len(age_factor)
+
+    systolic_base = 120 + (age_factor - 1) * 20 + boost * 20
+    diastolic_base = 80 + (age_factor - 1) * 5 + boost * 10
+
+    return {
+        "systolic_bp": np.clip(np.rint(systolic_base + rng.uniform(-15, 15, n)), 90, 200).astype(np.int64),
+        "diastolic_bp": np.clip(np.rint(diastolic_base + rng.uniform(-10, 10, n)), 60, 110).astype(np.int64),
+        "pulse": np.rint(rng.uniform(60, 100, n)).astype(np.int64),
+        "temperature": np.round(rng.uniform(36.0, 37.5, n), 1),
+        "respiratory_rate": np.rint(rng.uniform(12, 20, n)).astype(np.int64),
+        "oxygen_saturation": np.rint(rng.uniform(95, 100, n)).astype(np.int64),
+        # 당뇨 환자가 아닌 방문은 0 (레코드에 포함하지 않음)
+        "blood_glucose": np.where(
+            np.asarray(diabetic, dtype=bool), np.rint(rng.uniform(100, 250, n)), 0
+        ).astype(np.int64),
+    }